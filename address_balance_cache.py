@@ -0,0 +1,139 @@
+"""
+链上地址余额缓存 - 钱包列表页面渲染后并发预取所有地址的余额，列表原地显示TRX/能量，详情页直接读取缓存
+每个地址的查询包含3~5次同步上游请求，放到线程中执行并限制并发；同一地址的并发查询合并为一次
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+from telegram.error import BadRequest
+from tron_api import TronAPI, AccountBalance
+
+logger = logging.getLogger(__name__)
+
+ADDRESS_BALANCE_TTL = float(os.getenv("ADDRESS_BALANCE_TTL", "60"))  # 余额缓存有效期（秒）
+ADDRESS_BALANCE_ERROR_TTL = float(os.getenv("ADDRESS_BALANCE_ERROR_TTL", "15"))  # 查询失败（未激活或网络异常）的缓存时间（秒）
+ADDRESS_PREFETCH_CONCURRENCY = int(os.getenv("ADDRESS_PREFETCH_CONCURRENCY", "4"))  # 同时查询的地址数
+ADDRESS_BALANCE_MAX_SIZE = int(os.getenv("ADDRESS_BALANCE_MAX_SIZE", "5000"))
+
+class AddressBalanceCache:
+    """地址余额缓存（LRU，容量有上限）"""
+
+    def __init__(self, fetcher: Callable[[str], Optional[AccountBalance]] = None,
+                 ttl: float = ADDRESS_BALANCE_TTL, error_ttl: float = ADDRESS_BALANCE_ERROR_TTL,
+                 concurrency: int = ADDRESS_PREFETCH_CONCURRENCY, max_size: int = ADDRESS_BALANCE_MAX_SIZE):
+        self._fetcher = fetcher  # 同步查询函数，默认使用 TronAPI.get_account_balance
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.concurrency = concurrency
+        self.max_size = max_size
+        self._entries = OrderedDict()  # 地址 -> (余额或None, 过期时间)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._semaphore = None
+        self._tasks = set()
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+
+    @property
+    def fetcher(self) -> Callable[[str], Optional[AccountBalance]]:
+        if self._fetcher is None:
+            from config import TRON_NETWORK  # 部署配置，只有使用默认查询函数时才需要
+
+            self._fetcher = TronAPI(network=TRON_NETWORK, api_key=os.getenv('TRON_API_KEY')).get_account_balance
+        return self._fetcher
+
+    def _fresh(self, address: str):
+        entry = self._entries.get(address)
+        if entry is not None and time.monotonic() < entry[1]:
+            return entry
+        return None
+
+    def get(self, address: str) -> Optional[AccountBalance]:
+        """读取缓存中未过期的余额（不查询上游）"""
+        entry = self._fresh(address)
+        return entry[0] if entry is not None else None
+
+    def is_fresh(self, address: str) -> bool:
+        return self._fresh(address) is not None
+
+    async def fetch(self, address: str, refresh: bool = False) -> Optional[AccountBalance]:
+        """查询余额：缓存未过期时直接返回，否则查询上游（refresh=True 时强制查询）"""
+        entry = None if refresh else self._fresh(address)
+        if entry is not None:
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        task = self._inflight.get(address)
+        if task is None or task.done():
+            task = asyncio.create_task(self._load(address))
+            self._inflight[address] = task
+            task.add_done_callback(lambda done: self._inflight.pop(address, None) if self._inflight.get(address) is done else None)
+        return await asyncio.shield(task)
+
+    async def prefetch(self, addresses: List[str]) -> Dict[str, Optional[AccountBalance]]:
+        """并发查询缓存已过期的地址（并发数受限），返回所有地址的余额"""
+        await asyncio.gather(*[self.fetch(address) for address in addresses if not self.is_fresh(address)])
+        return {address: self.get(address) for address in addresses}
+
+    async def _load(self, address: str) -> Optional[AccountBalance]:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            try:
+                balance = await asyncio.to_thread(self.fetcher, address)
+            except Exception as e:
+                logger.warning(f"查询地址余额失败 {address}: {e}")
+                balance = None
+
+        if balance is None:
+            self.failures += 1
+        self._entries[address] = (balance, time.monotonic() + (self.ttl if balance else self.error_ttl))
+        self._entries.move_to_end(address)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return balance
+
+    def start_prefetch(self, session, message, addresses: List[str], build_keyboard: Callable):
+        """后台预取地址余额，完成后原地更新列表按钮；用户已切换到其他页面时不更新"""
+        if not addresses or all(self.is_fresh(address) for address in addresses):
+            return None
+
+        view_seq = session.view_seq
+
+        async def run():
+            await self.prefetch(addresses)
+            if session.view_seq != view_seq:
+                return
+            try:
+                await message.edit_reply_markup(reply_markup=build_keyboard())
+            except BadRequest:
+                pass  # 内容未变化或消息已删除
+
+        task = asyncio.create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "failures": self.failures,
+            "inflight": len(self._inflight)
+        }
+
+def balance_label(balance: Optional[AccountBalance]) -> str:
+    """列表按钮中的余额摘要"""
+    if balance is None:
+        return ""
+    return f" · {balance.trx_balance:.2f} TRX · {balance.energy_available:,}⚡"
+
+# 全局地址余额缓存实例
+address_balance_cache = AddressBalanceCache()
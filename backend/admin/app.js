@@ -61,29 +61,50 @@ async function apiCall(endpoint, options = {}) {
     }
 }
 
+// 游标分页API调用：返回当前页数据和下一页游标（X-Next-Cursor响应头）
+async function apiPage(endpoint, cursor = null) {
+    const separator = endpoint.includes('?') ? '&' : '?';
+    const url = cursor ? `${endpoint}${separator}cursor=${encodeURIComponent(cursor)}` : endpoint;
+    
+    try {
+        const response = await fetch(`${API_BASE_URL}${url}`, {
+            headers: {'Content-Type': 'application/json'}
+        });
+        
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        
+        return {
+            items: await response.json(),
+            nextCursor: response.headers.get('X-Next-Cursor')
+        };
+    } catch (error) {
+        console.error('API call failed:', error);
+        return null;
+    }
+}
+
 // 仪表板数据加载
 async function loadDashboardData() {
     try {
-        // 加载钱包数据
+        // 统计数据来自预汇总表，与订单总量无关
+        const stats = await apiCall('/stats/');
+        if (stats) {
+            updateOrderMetrics(stats);
+            initOrdersChart(stats.daily);
+        }
+
+        // 钱包池列表（钱包数量很少）
         const wallets = await apiCall('/supplier-wallets/');
         if (wallets) {
-            updateWalletMetrics(wallets);
             updateWalletList(wallets);
         }
-
-        // 模拟加载其他数据（实际应该调用相应API）
-        updateOrderMetrics();
-        initOrdersChart();
     } catch (error) {
         console.error('Error loading dashboard data:', error);
     }
 }
 
-function updateWalletMetrics(wallets) {
-    const activeWallets = wallets.filter(w => w.is_active).length;
-    document.getElementById('active-wallets').textContent = activeWallets;
-}
-
 function updateWalletList(wallets) {
     const walletList = document.getElementById('wallet-list');
     
@@ -111,37 +132,40 @@ function updateWalletList(wallets) {
     walletList.innerHTML = listHTML;
 }
 
-function updateOrderMetrics() {
-    // 模拟数据，实际应该调用API获取
-    document.getElementById('today-orders').textContent = '12';
-    document.getElementById('success-rate').textContent = '95.8%';
-    document.getElementById('total-users').textContent = '248';
+function updateOrderMetrics(stats) {
+    document.getElementById('today-orders').textContent = stats.today.orders;
+    document.getElementById('success-rate').textContent = `${stats.today.success_rate.toFixed(1)}%`;
+    document.getElementById('active-wallets').textContent = stats.pool.active_wallets;
+    document.getElementById('total-users').textContent = stats.total_users;
 }
 
 // 订单图表
 let ordersChart;
 
-function initOrdersChart() {
+function initOrdersChart(daily) {
     const ctx = document.getElementById('ordersChart').getContext('2d');
     
-    // 模拟数据，实际应该从API获取
     const data = {
-        labels: ['今天', '昨天', '前天', '3天前', '4天前', '5天前', '6天前'],
+        labels: daily.map(day => day.date.substring(5)),
         datasets: [{
             label: '成功订单',
-            data: [12, 15, 8, 22, 18, 25, 20],
+            data: daily.map(day => day.completed),
             borderColor: '#28a745',
             backgroundColor: 'rgba(40, 167, 69, 0.1)',
             tension: 0.4
         }, {
             label: '失败订单',
-            data: [1, 0, 2, 1, 0, 1, 0],
+            data: daily.map(day => day.failed),
             borderColor: '#dc3545',
             backgroundColor: 'rgba(220, 53, 69, 0.1)',
             tension: 0.4
         }]
     };
     
+    if (ordersChart) {
+        ordersChart.destroy();
+    }
+    
     ordersChart = new Chart(ctx, {
         type: 'line',
         data: data,
@@ -163,51 +187,80 @@ function initOrdersChart() {
 }
 
 // 订单管理
+const ORDERS_PAGE_SIZE = 50;
+let ordersNextCursor = null;
+
 async function loadOrdersData() {
     const ordersTable = document.getElementById('orders-table');
+    ordersNextCursor = null;
     
     try {
-        // 调用真实的API获取订单数据
-        const orders = await apiCall('/orders/?limit=50');
+        // 调用真实的API获取订单数据（第一页）
+        const page = await apiPage(`/orders/?limit=${ORDERS_PAGE_SIZE}`);
         
-        if (!orders || orders.length === 0) {
+        if (!page || page.items.length === 0) {
             ordersTable.innerHTML = '<tr><td colspan="7" class="text-center text-muted">暂无订单数据</td></tr>';
+            updateLoadMoreButton(null);
             return;
         }
         
-        const tableHTML = orders.map(order => `
-            <tr>
-                <td>
-                    <code>${order.id.substring(0, 8)}...</code>
-                </td>
-                <td>${order.user_id}</td>
-                <td>${order.energy_amount.toLocaleString()}</td>
-                <td>${parseFloat(order.cost_trx).toFixed(6)}</td>
-                <td>
-                    <span class="badge ${getStatusBadgeClass(order.status)}">
-                        ${getStatusText(order.status)}
-                    </span>
-                </td>
-                <td>${formatDateTime(order.created_at)}</td>
-                <td>
-                    <button class="btn btn-sm btn-outline-primary" onclick="viewOrder('${order.id}')">
-                        <i class="bi bi-eye"></i>
-                    </button>
-                    ${order.status === 'pending' || order.status === 'processing' ? 
-                        `<button class="btn btn-sm btn-outline-danger ms-1" onclick="cancelOrder('${order.id}')">
-                            <i class="bi bi-x-circle"></i>
-                        </button>` : ''}
-                </td>
-            </tr>
-        `).join('');
-        
-        ordersTable.innerHTML = tableHTML;
+        ordersTable.innerHTML = renderOrderRows(page.items);
+        updateLoadMoreButton(page.nextCursor);
     } catch (error) {
         console.error('Error loading orders:', error);
         ordersTable.innerHTML = '<tr><td colspan="7" class="text-center text-danger">加载失败</td></tr>';
     }
 }
 
+async function loadMoreOrders() {
+    if (!ordersNextCursor) {
+        return;
+    }
+    
+    // 按游标加载下一页，追加到表格末尾
+    const page = await apiPage(`/orders/?limit=${ORDERS_PAGE_SIZE}`, ordersNextCursor);
+    if (!page) {
+        showToast('加载失败', 'error');
+        return;
+    }
+    
+    document.getElementById('orders-table').insertAdjacentHTML('beforeend', renderOrderRows(page.items));
+    updateLoadMoreButton(page.nextCursor);
+}
+
+function updateLoadMoreButton(nextCursor) {
+    ordersNextCursor = nextCursor;
+    document.getElementById('orders-load-more').style.display = nextCursor ? 'block' : 'none';
+}
+
+function renderOrderRows(orders) {
+    return orders.map(order => `
+        <tr>
+            <td>
+                <code>${order.id.substring(0, 8)}...</code>
+            </td>
+            <td>${order.user_id}</td>
+            <td>${order.energy_amount.toLocaleString()}</td>
+            <td>${parseFloat(order.cost_trx).toFixed(6)}</td>
+            <td>
+                <span class="badge ${getStatusBadgeClass(order.status)}">
+                    ${getStatusText(order.status)}
+                </span>
+            </td>
+            <td>${formatDateTime(order.created_at)}</td>
+            <td>
+                <button class="btn btn-sm btn-outline-primary" onclick="viewOrder('${order.id}')">
+                    <i class="bi bi-eye"></i>
+                </button>
+                ${order.status === 'pending' || order.status === 'processing' ? 
+                    `<button class="btn btn-sm btn-outline-danger ms-1" onclick="cancelOrder('${order.id}')">
+                        <i class="bi bi-x-circle"></i>
+                    </button>` : ''}
+            </td>
+        </tr>
+    `).join('');
+}
+
 function getStatusBadgeClass(status) {
     const statusClasses = {
         'pending': 'bg-warning',
@@ -0,0 +1,55 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.schemas import BalanceTransactionResponse
+from app.services.user_service import UserService
+from app.services.export_service import EXPORT_FORMATS, stream_export
+from app.utils.pagination import NEXT_CURSOR_HEADER, next_cursor
+from typing import List
+from datetime import datetime
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/", response_model=List[BalanceTransactionResponse])
+async def get_balance_transactions(
+    response: Response,
+    user_id: int = None,
+    transaction_type: str = None,
+    limit: int = 100,
+    cursor: str = None,
+    db: Session = Depends(get_db)
+):
+    """获取余额变动记录（游标分页，下一页游标见 X-Next-Cursor 响应头）"""
+    try:
+        user_service = UserService(db)
+        transactions = user_service.get_balance_transactions(
+            user_id=user_id, transaction_type=transaction_type, cursor=cursor, limit=limit
+        )
+        
+        cursor_value = next_cursor(transactions, limit)
+        if cursor_value:
+            response.headers[NEXT_CURSOR_HEADER] = cursor_value
+        return transactions
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"查询余额变动记录失败: {e}")
+        raise HTTPException(status_code=500, detail="内部服务器错误")
+
+@router.get("/export")
+async def export_balance_transactions(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    user_id: int = None,
+    transaction_type: str = None,
+    start: datetime = None,
+    end: datetime = None
+):
+    """流式导出余额变动记录（NDJSON或CSV，按创建时间 [start, end) 筛选，用于对账）"""
+    return StreamingResponse(
+        stream_export("balance_transactions", format, user_id=user_id, transaction_type=transaction_type, start=start, end=end),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="balance_transactions.{format}"'}
+    )
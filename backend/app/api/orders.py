@@ -1,27 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.schemas import CreateOrderRequest, OrderResponse, ApiResponse
 from app.services.order_service import OrderService
-from typing import List
+from app.services.idempotency_service import IdempotencyConflictError
+from app.services.quote_service import StaleQuoteError
+from app.services.export_service import EXPORT_FORMATS, stream_export
+from app.utils.pagination import NEXT_CURSOR_HEADER, next_cursor
+from app.utils.fast_json import FastJSONResponse, is_fast_json_enabled, rows_to_dicts
+from typing import List, Optional
+from datetime import datetime
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 @router.post("/", response_model=OrderResponse)
-async def create_order(order_request: CreateOrderRequest, db: Session = Depends(get_db)):
-    """创建新订单"""
+async def create_order(
+    order_request: CreateOrderRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    db: Session = Depends(get_db)
+):
+    """创建新订单（支持 Idempotency-Key 请求头，重试时返回首次创建的订单；quoted_cost 与当前报价不一致时返回409）"""
     try:
         order_service = OrderService(db)
-        order = await order_service.create_order(order_request)
+        order = await order_service.create_order(order_request, idempotency_key=idempotency_key)
         return order
+    except IdempotencyConflictError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except StaleQuoteError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"创建订单失败: {e}")
         raise HTTPException(status_code=500, detail="内部服务器错误")
 
+@router.get("/export")
+async def export_orders(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    user_id: int = None,
+    status: str = None,
+    start: datetime = None,
+    end: datetime = None
+):
+    """流式导出订单（NDJSON或CSV，按创建时间 [start, end) 筛选，用于对账）"""
+    return StreamingResponse(
+        stream_export("orders", format, user_id=user_id, status=status, start=start, end=end),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="orders.{format}"'}
+    )
+
 @router.get("/{order_id}", response_model=OrderResponse)
 async def get_order(order_id: str, db: Session = Depends(get_db)):
     """查询订单详情"""
@@ -39,22 +69,44 @@ async def get_order(order_id: str, db: Session = Depends(get_db)):
 
 @router.get("/", response_model=List[OrderResponse])
 async def get_orders(
+    response: Response,
     user_id: int = None, 
     status: str = None,
     skip: int = 0, 
     limit: int = 100, 
+    cursor: str = None,
     db: Session = Depends(get_db)
 ):
-    """获取订单列表（支持管理后台）"""
+    """获取订单列表（支持管理后台）
+    
+    下一页游标通过 X-Next-Cursor 响应头返回，作为cursor参数传入即可翻页
+    """
     try:
         order_service = OrderService(db)
+        if is_fast_json_enabled():
+            # 快速路径：只查询响应字段并直接序列化
+            if user_id:
+                rows = order_service.get_user_order_rows(user_id, skip=skip, limit=limit, cursor=cursor)
+            else:
+                rows = order_service.get_all_order_rows(status=status, skip=skip, limit=limit, cursor=cursor)
+            
+            cursor_value = next_cursor(rows, limit)
+            headers = {NEXT_CURSOR_HEADER: cursor_value} if cursor_value else None
+            return FastJSONResponse(rows_to_dicts(rows), headers=headers)
+        
         if user_id:
             # 获取指定用户的订单
-            orders = order_service.get_user_orders(user_id, skip=skip, limit=limit)
+            orders = order_service.get_user_orders(user_id, skip=skip, limit=limit, cursor=cursor)
         else:
             # 获取所有订单（管理后台用）
-            orders = order_service.get_all_orders(status=status, skip=skip, limit=limit)
+            orders = order_service.get_all_orders(status=status, skip=skip, limit=limit, cursor=cursor)
+        
+        cursor_value = next_cursor(orders, limit)
+        if cursor_value:
+            response.headers[NEXT_CURSOR_HEADER] = cursor_value
         return orders
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"查询订单失败: {e}")
         raise HTTPException(status_code=500, detail="内部服务器错误")
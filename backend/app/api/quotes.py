@@ -0,0 +1,44 @@
+from fastapi import APIRouter, HTTPException, Header, Query, Response
+from app.services.quote_service import quote_service
+from app.services.exchange_rate_service import exchange_rate_service
+from pricing import PRICING_RELOAD_INTERVAL
+from typing import Optional
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def _cache_headers(version: str) -> dict:
+    return {"ETag": f'"{version}"', "Cache-Control": f"public, max-age={int(PRICING_RELOAD_INTERVAL)}"}
+
+@router.get("/")
+async def get_quotes(if_none_match: Optional[str] = Header(None)):
+    """获取报价矩阵（标准档位×时长；费率版本未变化时返回304）"""
+    version, body = quote_service.get_quotes_json()
+    headers = _cache_headers(version)
+    if if_none_match == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.get("/quote")
+async def get_quote(
+    energy_amount: int = Query(..., ge=1000, le=10000000),
+    duration: str = Query(...)
+):
+    """单笔报价（非标准数量按相邻档位插值）"""
+    try:
+        cost = quote_service.quote(energy_amount, duration)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "version": quote_service.version,
+        "energy_amount": energy_amount,
+        "duration": duration,
+        "cost_trx": str(cost)
+    }
+
+@router.get("/exchange-rate")
+async def get_exchange_rate():
+    """当前TRX/USDT汇率快照（读取缓存，不查询来源）"""
+    snapshot = exchange_rate_service.current()
+    return dict(snapshot.to_dict(), trx_per_usdt=str(snapshot.trx_per_usdt), valid=snapshot.is_valid())
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.schemas import StatsResponse
+from app.services.stats_service import StatsService
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/", response_model=StatsResponse)
+async def get_stats(days: int = Query(7, ge=1, le=90), db: Session = Depends(get_db)):
+    """获取管理后台统计数据（读取预汇总表，耗时与订单总量无关）"""
+    try:
+        return StatsService(db).get_stats(days=days)
+    except Exception as e:
+        logger.error(f"查询统计数据失败: {e}")
+        raise HTTPException(status_code=500, detail="内部服务器错误")
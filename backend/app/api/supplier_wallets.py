@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.services.tron_service import TronTransactionService
 from app.models import SupplierWallet
+from app.utils.fast_json import FastJSONResponse, is_fast_json_enabled
 from pydantic import BaseModel
 from typing import List
 import logging
@@ -52,6 +53,18 @@ async def add_supplier_wallet(
 @router.get("/", response_model=List[WalletResponse])
 async def get_supplier_wallets(db: Session = Depends(get_db)):
     """获取所有供应商钱包列表"""
+    if is_fast_json_enabled():
+        rows = db.query(
+            SupplierWallet.id, SupplierWallet.wallet_address, SupplierWallet.trx_balance,
+            SupplierWallet.energy_available, SupplierWallet.energy_limit,
+            SupplierWallet.is_active, SupplierWallet.last_balance_check
+        ).all()
+        return FastJSONResponse([{
+            **row._asdict(),
+            "trx_balance": str(row.trx_balance),
+            "last_balance_check": row.last_balance_check.isoformat() if row.last_balance_check else None
+        } for row in rows])
+    
     wallets = db.query(SupplierWallet).all()
     
     return [WalletResponse(
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.schemas import UserBalanceResponse, UserBalanceDeductRequest, UserDepositRequest, ApiResponse
 from app.services.user_service import UserService
+from app.services.exchange_rate_service import ExchangeRateUnavailable
 import logging
 
 router = APIRouter()
@@ -47,6 +48,8 @@ async def confirm_deposit(user_id: int, request: UserDepositRequest, db: Session
             raise HTTPException(status_code=400, detail="充值确认失败")
     except HTTPException:
         raise
+    except ExchangeRateUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"确认充值失败: {e}")
         raise HTTPException(status_code=500, detail="内部服务器错误")
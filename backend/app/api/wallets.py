@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.schemas import AddWalletRequest, UserWalletResponse, ApiResponse
 from app.services.wallet_service import WalletService
+from app.utils.fast_json import FastJSONResponse, is_fast_json_enabled, rows_to_dicts
 from typing import List
 import logging
 
@@ -14,6 +15,8 @@ async def get_user_wallets(user_id: int, db: Session = Depends(get_db)):
     """获取用户钱包地址列表"""
     try:
         wallet_service = WalletService(db)
+        if is_fast_json_enabled():
+            return FastJSONResponse(rows_to_dicts(wallet_service.get_user_wallet_rows(user_id)))
         wallets = wallet_service.get_user_wallets(user_id)
         return wallets
     except Exception as e:
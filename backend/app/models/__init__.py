@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, BigInteger, String, DECIMAL, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, DECIMAL, DateTime, Boolean, Text, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
+from datetime import datetime
 import uuid
 
 class User(Base):
@@ -47,13 +48,15 @@ class Order(Base):
     energy_amount = Column(Integer, nullable=False)
     duration_hours = Column(Integer, nullable=False)
     cost_trx = Column(DECIMAL(18, 6), nullable=False)
-    status = Column(String(20), default="pending")  # pending/processing/completed/failed/cancelled
+    status = Column(String(20), default="pending")  # pending/processing/completed/failed/cancelled/expired
     supplier_wallet = Column(String(42))
     tx_hash = Column(String(66))
     error_message = Column(Text)
     retry_count = Column(Integer, default=0)
+    lease_owner = Column(String(64))  # 认领订单的处理器标识
+    lease_expires_at = Column(DateTime(timezone=True))  # 认领租约到期时间，过期后可被其他处理器重新认领
     expires_at = Column(DateTime(timezone=True))
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow, server_default=func.now())  # 应用侧写入，保证游标分页比较精度一致
     completed_at = Column(DateTime(timezone=True))
     
     # 关联关系
@@ -70,7 +73,18 @@ class BalanceTransaction(Base):
     balance_after = Column(DECIMAL(18, 6), nullable=False)
     reference_id = Column(String(255))  # 关联的订单ID或充值交易哈希
     description = Column(String(500))
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    exchange_rate = Column(DECIMAL(18, 8))  # USDT充值入账所用汇率（1 TRX = ? USDT）
+    exchange_rate_version = Column(String(20))  # 所用汇率快照的版本号
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow, server_default=func.now())  # 应用侧写入，保证游标分页比较精度一致
+    
+    # 同一笔充值交易只能入账一次（手动确认与充值监听并发时由数据库保证）
+    __table_args__ = (
+        Index(
+            'uq_balance_transactions_deposit_reference', 'reference_id', unique=True,
+            postgresql_where=text("transaction_type = 'deposit'"),
+            sqlite_where=text("transaction_type = 'deposit'")
+        ),
+    )
     
     # 关联关系
     user = relationship("User", back_populates="balance_transactions")
@@ -88,4 +102,116 @@ class SupplierWallet(Base):
     bandwidth_available = Column(Integer, default=0)
     is_active = Column(Boolean, default=True)
     last_balance_check = Column(DateTime(timezone=True))
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class OrderOutbox(Base):
+    """订单派发发件箱表（与订单在同一事务内写入）"""
+    __tablename__ = "order_outbox"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    order_id = Column(String(36), ForeignKey("orders.id"), nullable=False)
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow, server_default=func.now())
+    dispatched_at = Column(DateTime(timezone=True))  # 为空表示尚未派发
+
+class IdempotencyKey(Base):
+    """幂等键表：缓存首次请求的响应，重放请求直接返回"""
+    __tablename__ = "idempotency_keys"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    key = Column(String(255), unique=True, nullable=False)
+    request_hash = Column(String(64), nullable=False)  # 请求体摘要，防止同一键用于不同请求
+    order_id = Column(String(36), ForeignKey("orders.id"))
+    response_body = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow, server_default=func.now())
+
+class OrderArchive(Base):
+    """订单归档表：已结束且超过保留期的订单，结构与订单表一致"""
+    __tablename__ = "orders_archive"
+    
+    id = Column(String(36), primary_key=True)
+    user_id = Column(BigInteger, ForeignKey("users.id"))
+    receive_address = Column(String(42), nullable=False)
+    energy_amount = Column(Integer, nullable=False)
+    duration_hours = Column(Integer, nullable=False)
+    cost_trx = Column(DECIMAL(18, 6), nullable=False)
+    status = Column(String(20), nullable=False)  # completed/failed/cancelled/expired
+    supplier_wallet = Column(String(42))
+    tx_hash = Column(String(66))
+    error_message = Column(Text)
+    retry_count = Column(Integer, default=0)
+    expires_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True))
+    completed_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), default=datetime.utcnow, server_default=func.now())
+
+class BalanceTransactionArchive(Base):
+    """余额变动归档表：已归档订单对应的余额变动记录"""
+    __tablename__ = "balance_transactions_archive"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)  # 沿用原记录ID
+    user_id = Column(BigInteger, ForeignKey("users.id"))
+    transaction_type = Column(String(20), nullable=False)
+    amount = Column(DECIMAL(18, 6), nullable=False)
+    balance_after = Column(DECIMAL(18, 6), nullable=False)
+    reference_id = Column(String(255))
+    description = Column(String(500))
+    created_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), default=datetime.utcnow, server_default=func.now())
+
+class OrderStatsHourly(Base):
+    """订单小时汇总表：按订单创建小时与最终状态汇总"""
+    __tablename__ = "order_stats_hourly"
+    
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)  # 整点（UTC）
+    status = Column(String(20), primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    energy_amount = Column(BigInteger, nullable=False, default=0)
+    cost_trx = Column(DECIMAL(18, 6), nullable=False, default=0)
+
+class UserStatsHourly(Base):
+    """新增用户小时汇总表"""
+    __tablename__ = "user_stats_hourly"
+    
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    new_users = Column(Integer, nullable=False, default=0)
+
+class WalletPoolSnapshot(Base):
+    """钱包池快照表：定时记录能量池使用情况"""
+    __tablename__ = "wallet_pool_snapshots"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    active_wallets = Column(Integer, nullable=False, default=0)
+    energy_available = Column(BigInteger, nullable=False, default=0)
+    energy_limit = Column(BigInteger, nullable=False, default=0)
+    trx_balance = Column(DECIMAL(18, 6), nullable=False, default=0)
+    captured_at = Column(DateTime(timezone=True), default=datetime.utcnow, server_default=func.now())
+
+class StatsWatermark(Base):
+    """汇总进度表：记录各汇总已处理到的时间点（高水位）"""
+    __tablename__ = "stats_watermarks"
+    
+    name = Column(String(50), primary_key=True)
+    rolled_up_to = Column(DateTime(timezone=True), nullable=False)  # 此时间之前的数据已汇总
+
+class ChainDeposit(Base):
+    """链上充值记录表：充值监听器识别到的每笔转入交易（交易哈希唯一，保证只入账一次）"""
+    __tablename__ = "chain_deposits"
+    
+    tx_hash = Column(String(66), primary_key=True)
+    currency = Column(String(10), nullable=False)  # TRX/USDT
+    amount = Column(DECIMAL(18, 6), nullable=False)
+    from_address = Column(String(42), nullable=False)
+    user_id = Column(BigInteger, ForeignKey("users.id"))  # 未匹配到用户时为空
+    status = Column(String(20), nullable=False)  # credited/duplicate/unmatched/below_minimum
+    block_timestamp = Column(BigInteger, nullable=False)  # 区块时间（毫秒）
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow, server_default=func.now())
+
+class ChainCursor(Base):
+    """链上监听进度表：各数据流已处理到的区块时间"""
+    __tablename__ = "chain_cursors"
+    
+    name = Column(String(50), primary_key=True)
+    last_timestamp = Column(BigInteger, nullable=False)  # 区块时间（毫秒），下次从此时间继续读取
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -10,6 +10,7 @@ class OrderStatus(str, Enum):
     COMPLETED = "completed"
     FAILED = "failed"
     CANCELLED = "cancelled"
+    EXPIRED = "expired"
 
 class TransactionType(str, Enum):
     DEPOSIT = "deposit"
@@ -22,6 +23,7 @@ class CreateOrderRequest(BaseModel):
     energy_amount: int = Field(..., ge=1000, le=10000000, description="能量数量")
     duration: str = Field(..., description="租用时长：1h/1d/3d/7d/14d")
     receive_address: str = Field(..., min_length=34, max_length=42, description="接收地址")
+    quoted_cost: Optional[Decimal] = Field(None, description="下单时展示给用户的费用，与当前报价不一致时拒绝下单")
 
 class UserBalanceDeductRequest(BaseModel):
     amount: Decimal = Field(..., gt=0, description="扣减金额")
@@ -56,12 +58,51 @@ class OrderResponse(BaseModel):
     created_at: datetime
     completed_at: Optional[datetime] = None
 
+class BalanceTransactionResponse(BaseModel):
+    id: int
+    user_id: int
+    transaction_type: TransactionType
+    amount: Decimal
+    balance_after: Decimal
+    reference_id: Optional[str] = None
+    description: Optional[str] = None
+    exchange_rate: Optional[Decimal] = None
+    exchange_rate_version: Optional[str] = None
+    created_at: datetime
+
 class UserWalletResponse(BaseModel):
     id: int
     wallet_address: str
     is_active: bool
     created_at: datetime
 
+class OrderStatsSummary(BaseModel):
+    orders: int = 0
+    completed: int = 0
+    failed: int = 0
+    revenue_trx: Decimal = Decimal("0")
+    energy_delegated: int = 0
+    success_rate: float = 0.0
+
+class DailyOrderStats(OrderStatsSummary):
+    date: str
+
+class WalletPoolStats(BaseModel):
+    active_wallets: int = 0
+    energy_available: int = 0
+    energy_limit: int = 0
+    utilisation: float = 0.0
+    trx_balance: Decimal = Decimal("0")
+    captured_at: Optional[datetime] = None
+
+class StatsResponse(BaseModel):
+    today: OrderStatsSummary
+    totals: OrderStatsSummary
+    total_users: int
+    daily: List[DailyOrderStats]
+    pool: WalletPoolStats
+    rolled_up_to: Optional[datetime] = None
+
 class ApiResponse(BaseModel):
     success: bool
     message: str
@@ -0,0 +1,80 @@
+from sqlalchemy import select, insert, delete
+from sqlalchemy.orm import Session
+from app.models import (
+    Order, OrderArchive, BalanceTransaction, BalanceTransactionArchive,
+    OrderOutbox, IdempotencyKey
+)
+from datetime import datetime, timedelta
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# 归档配置：已结束订单保留在热表的天数与每批归档数量
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '30'))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '500'))
+
+TERMINAL_ORDER_STATUSES = ["completed", "failed", "cancelled", "expired"]
+
+ORDER_ARCHIVE_COLUMNS = [
+    "id", "user_id", "receive_address", "energy_amount", "duration_hours", "cost_trx",
+    "status", "supplier_wallet", "tx_hash", "error_message", "retry_count",
+    "expires_at", "created_at", "completed_at"
+]
+TRANSACTION_ARCHIVE_COLUMNS = [
+    "id", "user_id", "transaction_type", "amount", "balance_after",
+    "reference_id", "description", "created_at"
+]
+
+class ArchiveService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def archive_orders(self, older_than_days: int = ARCHIVE_AFTER_DAYS,
+                       batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+        """分批将超过保留期的已结束订单及其余额变动移入归档表，返回归档订单数"""
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        total = 0
+
+        while True:
+            order_ids = list(self.db.execute(
+                select(Order.id).where(
+                    Order.status.in_(TERMINAL_ORDER_STATUSES),
+                    Order.created_at < cutoff
+                ).order_by(Order.created_at.asc()).limit(batch_size).with_for_update(skip_locked=True)
+            ).scalars())
+
+            if not order_ids:
+                break
+
+            self._move_batch(order_ids)
+            self.db.commit()
+
+            total += len(order_ids)
+            logger.info(f"已归档 {len(order_ids)} 个订单")
+            if len(order_ids) < batch_size:
+                break
+
+        return total
+
+    def _move_batch(self, order_ids: list[str]):
+        """复制一批订单与余额变动到归档表并从热表删除（调用方负责提交）"""
+        self.db.execute(insert(OrderArchive).from_select(
+            ORDER_ARCHIVE_COLUMNS,
+            select(*[getattr(Order, column) for column in ORDER_ARCHIVE_COLUMNS]).where(Order.id.in_(order_ids))
+        ))
+        self.db.execute(insert(BalanceTransactionArchive).from_select(
+            TRANSACTION_ARCHIVE_COLUMNS,
+            select(*[getattr(BalanceTransaction, column) for column in TRANSACTION_ARCHIVE_COLUMNS]).where(
+                BalanceTransaction.reference_id.in_(order_ids)
+            )
+        ))
+
+        # 发件箱记录与幂等键只在订单生命周期内有用，随订单一起清理
+        for statement in (
+            delete(OrderOutbox).where(OrderOutbox.order_id.in_(order_ids)),
+            delete(IdempotencyKey).where(IdempotencyKey.order_id.in_(order_ids)),
+            delete(BalanceTransaction).where(BalanceTransaction.reference_id.in_(order_ids)),
+            delete(Order).where(Order.id.in_(order_ids)),
+        ):
+            self.db.execute(statement.execution_options(synchronize_session=False))
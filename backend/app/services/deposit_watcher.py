@@ -0,0 +1,244 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from tronpy.keys import to_base58check_address
+from app.models import ChainCursor, ChainDeposit, UserWallet
+from app.services.user_service import UserService
+from tron_api import TronAPI
+from decimal import Decimal
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+import httpx
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# 充值监听配置
+DEPOSIT_ADDRESS = os.getenv('DEPOSIT_ADDRESS', 'TYwv7C4Fik2tYuHBwuNSzrnJ4Bw7NukyRb')  # 平台充值地址
+DEPOSIT_MIN_AMOUNT = Decimal(os.getenv('DEPOSIT_MIN_AMOUNT', '10'))  # 低于该金额不入账（TRX或USDT）
+DEPOSIT_POLL_INTERVAL = float(os.getenv('DEPOSIT_POLL_INTERVAL', '30'))  # 轮询间隔（秒）
+DEPOSIT_PAGE_SIZE = int(os.getenv('DEPOSIT_PAGE_SIZE', '200'))  # 每页交易数（TronGrid上限200）
+DEPOSIT_MAX_PAGES = int(os.getenv('DEPOSIT_MAX_PAGES', '50'))  # 每次轮询每个数据流最多读取的页数，积压时下次继续
+DEPOSIT_LOOKBACK_HOURS = float(os.getenv('DEPOSIT_LOOKBACK_HOURS', '24'))  # 首次运行时从多久之前开始读取
+
+TRON_NETWORK = os.getenv('TRON_NETWORK', 'mainnet')
+TRON_API_URL = os.getenv('TRON_API_URL') or {
+    'shasta': 'https://api.shasta.trongrid.io',
+    'nile': 'https://nile.trongrid.io'
+}.get(TRON_NETWORK, 'https://api.trongrid.io')
+
+SUN_PER_TRX = Decimal(1000000)
+
+class Transfer(NamedTuple):
+    """转入平台地址的一笔交易"""
+    tx_hash: str
+    currency: str
+    amount: Decimal
+    from_address: str
+    block_timestamp: int
+
+class TronGridClient:
+    """TronGrid v1 账户交易查询：只读取已确认的转入交易，按区块时间升序分页"""
+
+    def __init__(self, api_url: str = TRON_API_URL, api_key: str = None,
+                 usdt_contract: str = None, fetch: Callable[[str, dict], Awaitable[dict]] = None):
+        self.api_url = api_url.rstrip('/')
+        self.headers = {'TRON-PRO-API-KEY': api_key} if api_key else {}
+        self.usdt_contract = usdt_contract or TronAPI.USDT_CONTRACT_ADDRESS.get(
+            TRON_NETWORK, TronAPI.USDT_CONTRACT_ADDRESS['mainnet']
+        )
+        self._fetch = fetch  # 测试时注入
+        self._client = None
+
+    async def fetch(self, path: str, params: dict) -> dict:
+        if self._fetch is not None:
+            return await self._fetch(path, params)
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.api_url, headers=self.headers, timeout=15)
+        response = await self._client.get(path, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def transfers(self, stream: str, address: str, since: int,
+                        page_size: int = DEPOSIT_PAGE_SIZE) -> AsyncIterator[Tuple[List[Transfer], int]]:
+        """逐页返回 (转入交易, 本页最大区块时间)；since 为起始区块时间（毫秒，包含）"""
+        if stream == "usdt":
+            path = f"/v1/accounts/{address}/transactions/trc20"
+            params = {"contract_address": self.usdt_contract}
+            parse = self._parse_trc20
+        else:
+            path = f"/v1/accounts/{address}/transactions"
+            params = {}
+            parse = self._parse_trx
+        params.update({
+            "only_to": "true", "only_confirmed": "true", "min_timestamp": since,
+            "order_by": "block_timestamp,asc", "limit": page_size
+        })
+
+        while True:
+            data = await self.fetch(path, params)
+            items = data.get("data") or []
+            if not items:
+                return
+            transfers = [transfer for transfer in (parse(item, address) for item in items) if transfer]
+            yield transfers, max(int(item["block_timestamp"]) for item in items)
+
+            fingerprint = (data.get("meta") or {}).get("fingerprint")
+            if not fingerprint:
+                return
+            params["fingerprint"] = fingerprint
+
+    @staticmethod
+    def _parse_trx(item: dict, address: str) -> Optional[Transfer]:
+        """TRX转账（TransferContract，地址为十六进制）"""
+        contract = item["raw_data"]["contract"][0]
+        if contract.get("type") != "TransferContract":
+            return None
+        if (item.get("ret") or [{}])[0].get("contractRet") != "SUCCESS":
+            return None
+        value = contract["parameter"]["value"]
+        if to_base58check_address(value["to_address"]) != address:
+            return None
+        return Transfer(
+            item["txID"], "TRX", Decimal(value["amount"]) / SUN_PER_TRX,
+            to_base58check_address(value["owner_address"]), int(item["block_timestamp"])
+        )
+
+    @staticmethod
+    def _parse_trc20(item: dict, address: str) -> Optional[Transfer]:
+        """USDT TRC20转账"""
+        if item.get("type") != "Transfer" or item.get("to") != address:
+            return None
+        decimals = int(item["token_info"]["decimals"])
+        return Transfer(
+            item["transaction_id"], "USDT", Decimal(item["value"]).scaleb(-decimals),
+            item["from"], int(item["block_timestamp"])
+        )
+
+class DepositWatcher:
+    """链上充值监听：从持久化的游标增量读取转入交易，按发送地址匹配用户并入账（每笔交易只入账一次）"""
+
+    STREAMS = ("trx", "usdt")
+
+    def __init__(self, db: Session, client: TronGridClient = None, address: str = DEPOSIT_ADDRESS,
+                 min_amount: Decimal = DEPOSIT_MIN_AMOUNT, page_size: int = DEPOSIT_PAGE_SIZE,
+                 max_pages: int = DEPOSIT_MAX_PAGES):
+        self.db = db
+        self.client = client or TronGridClient(api_key=os.getenv('TRON_API_KEY'))
+        self.address = address
+        self.min_amount = min_amount
+        self.page_size = page_size
+        self.max_pages = max_pages
+
+    async def poll(self) -> Dict[str, Dict[str, int]]:
+        """处理各数据流自游标以来的新交易，返回各状态的数量"""
+        return {stream: await self.poll_stream(stream) for stream in self.STREAMS}
+
+    async def poll_stream(self, stream: str) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        since = self._cursor(stream).last_timestamp
+        pages = 0
+        async for transfers, page_timestamp in self.client.transfers(stream, self.address, since, self.page_size):
+            failed_at = await self._process_page(transfers, counts)
+            # 游标只前进到已全部处理的位置（起始时间包含在内，边界交易会重新读取，按交易哈希去重）
+            self._advance(stream, failed_at if failed_at is not None else page_timestamp)
+            pages += 1
+            if failed_at is not None or pages >= self.max_pages:
+                break
+
+        if counts:
+            logger.info(f"充值监听 {stream}: {counts}")
+        return counts
+
+    def _cursor(self, stream: str) -> ChainCursor:
+        cursor = self.db.query(ChainCursor).filter(ChainCursor.name == f"deposits:{stream}").first()
+        if cursor is None:
+            start = int((time.time() - DEPOSIT_LOOKBACK_HOURS * 3600) * 1000)
+            cursor = ChainCursor(name=f"deposits:{stream}", last_timestamp=start)
+            self.db.add(cursor)
+            self.db.commit()
+        return cursor
+
+    def _advance(self, stream: str, timestamp: int):
+        cursor = self._cursor(stream)
+        if timestamp > cursor.last_timestamp:
+            cursor.last_timestamp = timestamp
+        self.db.commit()
+
+    async def _process_page(self, transfers: List[Transfer], counts: Dict[str, int]) -> Optional[int]:
+        """处理一页交易：一次查询已处理的交易和发送地址对应的用户；入账失败时返回该交易的区块时间"""
+        tx_hashes = [transfer.tx_hash for transfer in transfers]
+        seen = {row[0] for row in self.db.query(ChainDeposit.tx_hash).filter(ChainDeposit.tx_hash.in_(tx_hashes))}
+        owners = self._match_users({transfer.from_address for transfer in transfers})
+        user_service = UserService(self.db)
+
+        for transfer in transfers:
+            if transfer.tx_hash in seen:
+                continue
+            seen.add(transfer.tx_hash)
+
+            user_id = owners.get(transfer.from_address)
+            if transfer.amount < self.min_amount:
+                status = "below_minimum"
+            elif user_id is None:
+                status = "unmatched"
+            else:
+                status = "credited"
+            deposit = ChainDeposit(
+                tx_hash=transfer.tx_hash, currency=transfer.currency, amount=transfer.amount,
+                from_address=transfer.from_address, user_id=user_id if status == "credited" else None,
+                status=status, block_timestamp=transfer.block_timestamp
+            )
+            self.db.add(deposit)
+
+            try:
+                if status == "credited":
+                    # 充值记录与余额变动在同一事务内提交；已通过接口手动入账的交易不会重复入账
+                    if not await user_service.confirm_deposit(
+                        user_id, transfer.tx_hash, transfer.amount, transfer.currency
+                    ):
+                        # 并发入账冲突时 confirm_deposit 已回滚，充值记录随之移出会话，重新加入
+                        status = deposit.status = "duplicate"
+                        self.db.add(deposit)
+                        self.db.commit()
+                else:
+                    self.db.commit()
+                    logger.warning(f"充值未入账（{status}）: {transfer.tx_hash} {transfer.amount} {transfer.currency} 来自 {transfer.from_address}")
+            except IntegrityError:
+                # 另一个监听实例已处理该交易
+                self.db.rollback()
+                continue
+            except Exception as e:
+                self.db.rollback()
+                logger.error(f"充值入账失败，稍后重试: {transfer.tx_hash}: {e}")
+                return transfer.block_timestamp
+            counts[status] = counts.get(status, 0) + 1
+        return None
+
+    def _match_users(self, addresses: set) -> Dict[str, int]:
+        """发送地址 -> 绑定该地址的唯一用户（多个用户绑定同一地址时不匹配）"""
+        owners: Dict[str, set] = {}
+        if addresses:
+            rows = self.db.query(UserWallet.wallet_address, UserWallet.user_id).filter(
+                UserWallet.wallet_address.in_(addresses), UserWallet.is_active == True
+            )
+            for address, user_id in rows:
+                owners.setdefault(address, set()).add(user_id)
+        return {address: next(iter(users)) for address, users in owners.items() if len(users) == 1}
+
+async def watch_deposits(db: Session, client: TronGridClient = None) -> Dict[str, Dict[str, int]]:
+    """执行一次充值监听"""
+    watcher = DepositWatcher(db, client)
+    try:
+        return await watcher.poll()
+    finally:
+        if client is None:
+            await watcher.client.close()
@@ -0,0 +1,50 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+
+from exchange_rates import ExchangeRateService, ExchangeRateUnavailable, exchange_rate_service
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 汇率刷新间隔（秒），应小于汇率有效期 EXCHANGE_RATE_TTL
+EXCHANGE_RATE_REFRESH_INTERVAL = float(os.getenv('EXCHANGE_RATE_REFRESH_INTERVAL', '300'))
+
+class ExchangeRateRefresher:
+    """汇率刷新器：后台线程按固定间隔从来源刷新汇率（与机器人共用缓存文件）"""
+
+    def __init__(self, service: ExchangeRateService = exchange_rate_service,
+                 interval: float = EXCHANGE_RATE_REFRESH_INTERVAL):
+        self.service = service
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """启动刷新线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="exchange-rate", daemon=True)
+        self._thread.start()
+        logger.info("汇率刷新器已启动")
+
+    def stop(self):
+        """停止刷新线程"""
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.service.refresh()
+            except Exception as e:
+                # 保留缓存中的汇率，过期后充值入账将等待刷新成功
+                logger.error(f"刷新汇率失败: {e}")
+            self._stopped.wait(self.interval)
+
+# 全局汇率刷新器实例
+exchange_rate_refresher = ExchangeRateRefresher()
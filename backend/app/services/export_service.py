@@ -0,0 +1,116 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models import Order, OrderArchive, BalanceTransaction, BalanceTransactionArchive
+from datetime import datetime
+from decimal import Decimal
+import csv
+import io
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# 导出配置：服务端游标每次读取的行数
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '1000'))
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+ORDER_EXPORT_COLUMNS = [
+    "id", "user_id", "receive_address", "energy_amount", "duration_hours", "cost_trx",
+    "status", "supplier_wallet", "tx_hash", "error_message", "created_at", "completed_at"
+]
+TRANSACTION_EXPORT_COLUMNS = [
+    "id", "user_id", "transaction_type", "amount", "balance_after",
+    "reference_id", "description", "created_at"
+]
+
+def _format_value(value):
+    """导出字段格式化：金额保留原始精度，时间使用ISO格式"""
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+class ExportService:
+    def __init__(self, db: Session, chunk_size: int = EXPORT_CHUNK_SIZE):
+        self.db = db
+        self.chunk_size = chunk_size
+
+    def iter_orders(self, fmt: str = "ndjson", user_id: int = None, status: str = None,
+                    start: datetime = None, end: datetime = None):
+        """按条件流式导出订单（热表在前，归档表在后）"""
+        statements = []
+        for model in (Order, OrderArchive):
+            statement = self._filtered(model, ORDER_EXPORT_COLUMNS, start, end)
+            if user_id:
+                statement = statement.where(model.user_id == user_id)
+            if status:
+                statement = statement.where(model.status == status)
+            statements.append(statement)
+        return self._stream(statements, ORDER_EXPORT_COLUMNS, fmt)
+
+    def iter_balance_transactions(self, fmt: str = "ndjson", user_id: int = None, transaction_type: str = None,
+                                  start: datetime = None, end: datetime = None):
+        """按条件流式导出余额变动记录（热表在前，归档表在后）"""
+        statements = []
+        for model in (BalanceTransaction, BalanceTransactionArchive):
+            statement = self._filtered(model, TRANSACTION_EXPORT_COLUMNS, start, end)
+            if user_id:
+                statement = statement.where(model.user_id == user_id)
+            if transaction_type:
+                statement = statement.where(model.transaction_type == transaction_type)
+            statements.append(statement)
+        return self._stream(statements, TRANSACTION_EXPORT_COLUMNS, fmt)
+
+    def _filtered(self, model, columns: list[str], start: datetime = None, end: datetime = None):
+        """按创建时间范围筛选，只查询导出列（不构造ORM对象）"""
+        statement = select(*[getattr(model, column) for column in columns])
+        if start:
+            statement = statement.where(model.created_at >= start)
+        if end:
+            statement = statement.where(model.created_at < end)
+        return statement.order_by(model.created_at.asc(), model.id.asc())
+
+    def _stream(self, statements: list, columns: list[str], fmt: str):
+        """逐批读取服务端游标并输出NDJSON或CSV文本块，内存占用与总行数无关"""
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+
+        if fmt == "csv":
+            yield self._csv_chunk([columns])
+
+        for statement in statements:
+            result = self.db.execute(statement.execution_options(yield_per=self.chunk_size))
+            for rows in result.partitions():
+                if fmt == "csv":
+                    yield self._csv_chunk([[_format_value(value) for value in row] for row in rows])
+                else:
+                    yield "".join(
+                        json.dumps(
+                            {column: _format_value(value) for column, value in zip(columns, row)},
+                            ensure_ascii=False
+                        ) + "\n"
+                        for row in rows
+                    )
+
+    def _csv_chunk(self, rows: list) -> str:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
+
+def stream_export(kind: str, fmt: str, **filters):
+    """使用独立会话流式导出（响应流结束前会话一直有效，结束后关闭）"""
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        service = ExportService(db)
+        rows = service.iter_orders(fmt, **filters) if kind == "orders" else service.iter_balance_transactions(fmt, **filters)
+        yield from rows
+    finally:
+        db.close()
@@ -0,0 +1,42 @@
+from sqlalchemy.orm import Session
+from app.models import IdempotencyKey
+from pydantic import BaseModel
+import hashlib
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+class IdempotencyConflictError(ValueError):
+    """同一幂等键被用于不同的请求内容"""
+
+class IdempotencyService:
+    def __init__(self, db: Session):
+        self.db = db
+    
+    @staticmethod
+    def request_hash(request: BaseModel, exclude: set = None) -> str:
+        """计算请求体摘要（exclude 中的字段不参与比较）"""
+        payload = json.dumps(request.model_dump(mode="json", exclude=exclude), sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode()).hexdigest()
+    
+    def get_cached_response(self, key: str, request_hash: str, response_model):
+        """查询幂等键对应的缓存响应，不存在时返回None"""
+        record = self.db.query(IdempotencyKey).filter(IdempotencyKey.key == key).first()
+        if not record:
+            return None
+        
+        if record.request_hash != request_hash:
+            raise IdempotencyConflictError("幂等键已被用于不同的请求")
+        
+        logger.info(f"幂等请求重放: {key}")
+        return response_model.model_validate_json(record.response_body)
+    
+    def save_response(self, key: str, request_hash: str, response: BaseModel, order_id: str = None):
+        """记录幂等键与响应（由调用方与业务数据一起提交）"""
+        self.db.add(IdempotencyKey(
+            key=key,
+            request_hash=request_hash,
+            order_id=order_id,
+            response_body=response.model_dump_json()
+        ))
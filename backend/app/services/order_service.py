@@ -1,7 +1,13 @@
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from app.models import Order, User, BalanceTransaction
+from app.models import Order, OrderArchive, User, BalanceTransaction
 from app.schemas import CreateOrderRequest, OrderResponse
-from app.utils.task_launcher import safely_start_order_task
+from app.services.user_service import UserService
+from app.services.outbox_service import OutboxService, outbox_relay
+from app.services.idempotency_service import IdempotencyService
+from app.services.quote_service import StaleQuoteError, quote_service
+from app.utils.order_signal import publish_new_order
+from app.utils.pagination import apply_keyset, merge_pages
 from decimal import Decimal
 from datetime import datetime, timedelta
 import logging
@@ -9,12 +15,26 @@ import uuid
 
 logger = logging.getLogger(__name__)
 
+# 订单响应字段（与 OrderResponse 一致，快速路径按此投影）
+ORDER_RESPONSE_COLUMNS = [
+    "id", "user_id", "receive_address", "energy_amount", "duration_hours", "cost_trx",
+    "status", "supplier_wallet", "tx_hash", "error_message", "created_at", "completed_at"
+]
+
 class OrderService:
     def __init__(self, db: Session):
         self.db = db
     
-    async def create_order(self, order_request: CreateOrderRequest) -> OrderResponse:
-        """创建新订单"""
+    async def create_order(self, order_request: CreateOrderRequest, idempotency_key: str = None) -> OrderResponse:
+        """创建新订单（携带幂等键的重复请求直接返回首次创建的订单）"""
+        idempotency = IdempotencyService(self.db)
+        # 展示费用随报价刷新而变化，不属于订单内容：报价刷新后重试同一次购买仍返回首次创建的订单
+        request_hash = idempotency.request_hash(order_request, exclude={"quoted_cost"})
+        if idempotency_key:
+            cached = idempotency.get_cached_response(idempotency_key, request_hash, OrderResponse)
+            if cached:
+                return cached
+        
         # 验证用户存在
         user = self.db.query(User).filter(User.id == order_request.user_id).first()
         if not user:
@@ -25,6 +45,8 @@ class OrderService:
         
         # 计算订单费用
         cost = self._calculate_cost(order_request.energy_amount, order_request.duration)
+        if order_request.quoted_cost is not None and order_request.quoted_cost != cost:
+            raise StaleQuoteError(f"报价已变化：当前费用 {cost} TRX，下单时 {order_request.quoted_cost} TRX")
         
         # 检查用户余额
         if user.balance_trx < cost:
@@ -45,41 +67,90 @@ class OrderService:
         )
         
         self.db.add(order)
-        self.db.commit()
+        # 派发记录与订单在同一事务内写入，由发件箱中继异步派发
+        OutboxService(self.db).add_order_event(order.id)
+        # 唤醒独立运行的交易处理器（随事务提交后送达）
+        publish_new_order(self.db, order.id)
+        self.db.flush()
         self.db.refresh(order)
+        response = self._order_to_response(order)
         
-        # 触发后台任务立即处理订单（如果可用）
-        task_started = safely_start_order_task(order.id)
-        if not task_started:
-            logger.info(f"订单 {order.id} 将通过定时任务处理")
+        # 幂等键与订单在同一事务内提交
+        if idempotency_key:
+            idempotency.save_response(idempotency_key, request_hash, response, order_id=order.id)
+        try:
+            self.db.commit()
+        except IntegrityError:
+            # 并发的重复请求已先提交同一幂等键，放弃本次订单并返回已缓存的响应
+            self.db.rollback()
+            if not idempotency_key:
+                raise
+            cached = idempotency.get_cached_response(idempotency_key, request_hash, OrderResponse)
+            if cached is None:
+                raise
+            return cached
+        
+        outbox_relay.notify()
         
         logger.info(f"订单创建成功: {order.id}, 用户: {order_request.user_id}")
-        return self._order_to_response(order)
+        return response
     
     def get_order(self, order_id: str) -> OrderResponse:
-        """查询订单详情"""
+        """查询订单详情（热表未命中时查询归档表）"""
         order = self.db.query(Order).filter(Order.id == order_id).first()
+        if not order:
+            order = self.db.query(OrderArchive).filter(OrderArchive.id == order_id).first()
         if not order:
             return None
         return self._order_to_response(order)
     
-    def get_user_orders(self, user_id: int, skip: int = 0, limit: int = 100) -> list[OrderResponse]:
-        """获取用户订单列表"""
-        orders = self.db.query(Order).filter(
-            Order.user_id == user_id
-        ).order_by(Order.created_at.desc()).offset(skip).limit(limit).all()
-        
+    def get_user_orders(self, user_id: int, skip: int = 0, limit: int = 100, cursor: str = None) -> list[OrderResponse]:
+        """获取用户订单列表（传入cursor时使用游标分页，热表与归档表合并返回）"""
+        orders = self._user_orders(user_id, skip, limit, cursor)
         return [self._order_to_response(order) for order in orders]
     
-    def get_all_orders(self, status: str = None, skip: int = 0, limit: int = 100) -> list[OrderResponse]:
-        """获取所有订单列表（管理后台用）"""
-        query = self.db.query(Order)
-        
+    def get_user_order_rows(self, user_id: int, skip: int = 0, limit: int = 100, cursor: str = None) -> list:
+        """获取用户订单列表（快速路径：只查询响应字段，返回行对象）"""
+        return self._user_orders(user_id, skip, limit, cursor, columns_only=True)
+    
+    def get_all_orders(self, status: str = None, skip: int = 0, limit: int = 100, cursor: str = None) -> list[OrderResponse]:
+        """获取所有订单列表（管理后台用，传入cursor时使用游标分页，仅查询热表）"""
+        orders = self._all_orders(status, skip, limit, cursor)
+        return [self._order_to_response(order) for order in orders]
+    
+    def get_all_order_rows(self, status: str = None, skip: int = 0, limit: int = 100, cursor: str = None) -> list:
+        """获取所有订单列表（快速路径：只查询响应字段，返回行对象）"""
+        return self._all_orders(status, skip, limit, cursor, columns_only=True)
+    
+    def _order_query(self, model, columns_only: bool = False):
+        """订单查询：快速路径只查询响应所需的列，不构造ORM对象"""
+        if columns_only:
+            return self.db.query(*[getattr(model, column) for column in ORDER_RESPONSE_COLUMNS])
+        return self.db.query(model)
+    
+    def _user_orders(self, user_id: int, skip: int, limit: int, cursor: str = None, columns_only: bool = False) -> list:
+        query = self._order_query(Order, columns_only).filter(Order.user_id == user_id)
+        if skip and not cursor:
+            return self._paginate(query, skip, limit).all()
+        
+        archived = self._order_query(OrderArchive, columns_only).filter(OrderArchive.user_id == user_id)
+        return merge_pages(
+            apply_keyset(query, Order.created_at, Order.id, cursor, limit).all(),
+            apply_keyset(archived, OrderArchive.created_at, OrderArchive.id, cursor, limit).all(),
+            limit=limit
+        )
+    
+    def _all_orders(self, status: str, skip: int, limit: int, cursor: str = None, columns_only: bool = False) -> list:
+        query = self._order_query(Order, columns_only)
         if status:
             query = query.filter(Order.status == status)
-        
-        orders = query.order_by(Order.created_at.desc()).offset(skip).limit(limit).all()
-        return [self._order_to_response(order) for order in orders]
+        return self._paginate(query, skip, limit, cursor).all()
+    
+    def _paginate(self, query, skip: int, limit: int, cursor: str = None):
+        """按 (created_at, id) 倒序分页；旧客户端仍可使用skip"""
+        if skip and not cursor:
+            return query.order_by(Order.created_at.desc(), Order.id.desc()).offset(skip).limit(limit)
+        return apply_keyset(query, Order.created_at, Order.id, cursor, limit)
     
     async def cancel_order(self, order_id: str) -> bool:
         """取消订单"""
@@ -90,8 +161,8 @@ class OrderService:
         if order.status not in ["pending", "processing"]:
             return False
         
-        # 如果已扣减余额，需要退款
-        if order.status == "processing":
+        # 如果已扣减余额，需要退款（处理中的订单不一定已扣款）
+        if order.status == "processing" and UserService(self.db).is_order_charged(order.id):
             user = self.db.query(User).filter(User.id == order.user_id).first()
             if user:
                 user.balance_trx += order.cost_trx
@@ -114,23 +185,14 @@ class OrderService:
         return True
     
     def _calculate_cost(self, energy_amount: int, duration: str) -> Decimal:
-        """计算订单费用"""
-        # 基础定价策略
-        duration_map = {"1h": 1/24, "1d": 1, "3d": 3, "7d": 7, "14d": 14}
-        duration_val = duration_map.get(duration, 1)
-        
-        base_price = Decimal(energy_amount) * Decimal("0.00001")  # 基础价格
-        time_multiplier = Decimal(str(duration_val * 0.8))        # 时间倍数
-        total_cost = base_price * time_multiplier
-        
-        return round(total_cost, 6)
+        """计算订单费用（与机器人展示的报价一致，见 pricing.py）"""
+        return quote_service.quote(energy_amount, duration)
     
     def _parse_duration(self, duration: str) -> int:
         """解析duration为小时数"""
-        duration_map = {"1h": 1, "1d": 24, "3d": 72, "7d": 168, "14d": 336}
-        return duration_map.get(duration, 24)
+        return quote_service.engine.matrix.durations.get(duration, 24)
     
-    def _order_to_response(self, order: Order) -> OrderResponse:
+    def _order_to_response(self, order) -> OrderResponse:
         """转换订单模型为响应格式"""
         return OrderResponse(
             id=order.id,
@@ -0,0 +1,110 @@
+from sqlalchemy.orm import Session
+from app.models import OrderOutbox
+from app.utils.task_launcher import get_order_dispatcher
+from datetime import datetime
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 发件箱配置：每批派发数量与兜底轮询间隔（秒）
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '100'))
+OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', '5'))
+
+class OutboxService:
+    def __init__(self, db: Session, dispatcher=None):
+        self.db = db
+        self.dispatcher = dispatcher
+
+    def add_order_event(self, order_id: str) -> OrderOutbox:
+        """写入订单派发记录（由调用方与订单一起提交）"""
+        event = OrderOutbox(order_id=order_id)
+        self.db.add(event)
+        return event
+
+    def drain(self, batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+        """批量派发未派发的订单，返回成功派发的数量"""
+        dispatcher = self.dispatcher or get_order_dispatcher()
+        total = 0
+
+        while True:
+            events = self.db.query(OrderOutbox).filter(
+                OrderOutbox.dispatched_at.is_(None)
+            ).order_by(OrderOutbox.id.asc()).limit(batch_size).with_for_update(skip_locked=True).all()
+
+            if not events:
+                break
+
+            try:
+                dispatcher.dispatch([event.order_id for event in events])
+            except Exception as e:
+                # 派发失败保留记录，下一轮重试
+                for event in events:
+                    event.attempts += 1
+                    event.last_error = str(e)[:500]
+                self.db.commit()
+                logger.warning(f"订单派发失败，{len(events)} 条记录等待重试: {e}")
+                break
+
+            now = datetime.utcnow()
+            for event in events:
+                event.attempts += 1
+                event.dispatched_at = now
+            self.db.commit()
+
+            total += len(events)
+            if len(events) < batch_size:
+                break
+
+        return total
+
+class OutboxRelay:
+    """发件箱中继：后台线程在新订单提交后立即派发，并定期兜底轮询"""
+
+    def __init__(self, poll_interval: float = OUTBOX_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """启动中继线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox-relay", daemon=True)
+        self._thread.start()
+        logger.info("订单发件箱中继已启动")
+
+    def stop(self):
+        """停止中继线程"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def notify(self):
+        """通知中继有新的发件箱记录"""
+        self._wakeup.set()
+
+    def _run(self):
+        from app.database import SessionLocal
+
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+
+            db = SessionLocal()
+            try:
+                OutboxService(db).drain()
+            except Exception as e:
+                logger.error(f"发件箱中继异常: {e}")
+            finally:
+                db.close()
+
+# 全局发件箱中继实例
+outbox_relay = OutboxRelay()
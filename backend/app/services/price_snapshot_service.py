@@ -0,0 +1,86 @@
+from sqlalchemy.orm import Session
+from app.services.quote_service import quote_service
+from app.services.stats_service import StatsService
+from pricing import QuoteEngine, surge_multiplier, write_snapshot
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 价格快照发布间隔（秒）
+PRICING_SNAPSHOT_INTERVAL = float(os.getenv('PRICING_SNAPSHOT_INTERVAL', '60'))
+
+class PriceSnapshotService:
+    def __init__(self, db: Session, engine: QuoteEngine = None):
+        self.db = db
+        self.engine = engine or quote_service.engine
+
+    def build_snapshot(self) -> dict:
+        """按供应商钱包池的剩余能量计算价格系数"""
+        pool = StatsService(self.db).current_pool()
+        utilisation = None
+        if pool["energy_limit"]:
+            utilisation = round(1 - pool["energy_available"] / pool["energy_limit"], 4)
+
+        settings = self.engine.matrix.rates.get("dynamic_pricing") or {}
+        return {
+            "multiplier": str(surge_multiplier(utilisation, settings)),
+            "utilisation": utilisation,
+            "energy_available": pool["energy_available"],
+            "energy_limit": pool["energy_limit"],
+            "active_wallets": pool["active_wallets"],
+            "published_at": time.time()
+        }
+
+    def publish(self) -> dict:
+        """发布价格快照（机器人与后端按快照报价）"""
+        snapshot = self.build_snapshot()
+        write_snapshot(self.engine.snapshot_path, snapshot)
+        self.engine.reload(force=True)
+        return snapshot
+
+class PriceSnapshotPublisher:
+    """价格快照发布器：后台线程按固定间隔发布快照"""
+
+    def __init__(self, interval: float = PRICING_SNAPSHOT_INTERVAL):
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+        self._last_multiplier = None
+
+    def start(self):
+        """启动发布线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="price-snapshot", daemon=True)
+        self._thread.start()
+        logger.info("价格快照发布器已启动")
+
+    def stop(self):
+        """停止发布线程"""
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        from app.database import SessionLocal
+
+        while not self._stopped.is_set():
+            db = SessionLocal()
+            try:
+                snapshot = PriceSnapshotService(db).publish()
+                if snapshot["multiplier"] != self._last_multiplier:
+                    logger.info(f"价格系数: {snapshot['multiplier']}（钱包池利用率 {snapshot['utilisation']}）")
+                    self._last_multiplier = snapshot["multiplier"]
+            except Exception as e:
+                logger.error(f"发布价格快照失败: {e}")
+            finally:
+                db.close()
+            self._stopped.wait(self.interval)
+
+# 全局价格快照发布器实例
+price_snapshot_publisher = PriceSnapshotPublisher()
@@ -0,0 +1,39 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+
+from decimal import Decimal
+from typing import Dict, Tuple
+from pricing import QuoteEngine, quote_engine
+from app.utils.fast_json import dumps
+
+class StaleQuoteError(ValueError):
+    """下单时展示的费用与当前报价不一致（费率或动态定价系数已变化）"""
+
+class QuoteService:
+    """报价服务（与机器人共用项目根目录的 pricing.py，保证展示价格与扣费一致）"""
+
+    def __init__(self, engine: QuoteEngine = quote_engine):
+        self.engine = engine
+        self._serialized: Tuple[str, bytes] = ("", b"")  # (版本号, 序列化后的报价矩阵)
+
+    @property
+    def version(self) -> str:
+        return self.engine.version
+
+    def quote(self, energy_amount: int, duration: str) -> Decimal:
+        """单笔报价"""
+        return self.engine.quote(energy_amount, duration)
+
+    def get_quotes(self) -> Dict:
+        return self.engine.matrix.to_dict()
+
+    def get_quotes_json(self) -> Tuple[str, bytes]:
+        """序列化后的报价矩阵（每个费率版本只序列化一次）"""
+        matrix = self.engine.matrix
+        if self._serialized[0] != matrix.version:
+            self._serialized = (matrix.version, dumps(matrix.to_dict()))
+        return self._serialized
+
+# 全局报价服务实例
+quote_service = QuoteService()
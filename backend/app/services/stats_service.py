@@ -0,0 +1,237 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models import (
+    Order, OrderArchive, User, SupplierWallet,
+    OrderStatsHourly, UserStatsHourly, WalletPoolSnapshot, StatsWatermark
+)
+from app.schemas import StatsResponse, OrderStatsSummary, DailyOrderStats, WalletPoolStats
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# 汇总配置：订单创建多久后视为状态已确定（分钟）、每个事务汇总的小时数、钱包池快照保留天数
+STATS_SETTLE_MINUTES = int(os.getenv('STATS_SETTLE_MINUTES', '60'))
+STATS_ROLLUP_CHUNK_HOURS = int(os.getenv('STATS_ROLLUP_CHUNK_HOURS', '24'))
+STATS_SNAPSHOT_RETENTION_DAYS = int(os.getenv('STATS_SNAPSHOT_RETENTION_DAYS', '30'))
+
+ORDER_WATERMARK = "orders"
+USER_WATERMARK = "users"
+
+def floor_hour(value: datetime) -> datetime:
+    """截断到整点"""
+    return value.replace(minute=0, second=0, microsecond=0)
+
+def _naive_utc(value) -> datetime:
+    """统一为不带时区的UTC时间（SQLite分组结果为字符串）"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+class StatsService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _hour_bucket(self, column):
+        """按小时分组的表达式"""
+        if self.db.get_bind().dialect.name == "postgresql":
+            return func.date_trunc("hour", column)
+        return func.strftime("%Y-%m-%d %H:00:00", column)
+
+    def _aggregate_orders(self, start: datetime, end: datetime = None) -> dict:
+        """按 (小时, 状态) 汇总时间段内创建的订单（含已归档订单）"""
+        result = {}
+        for model in (Order, OrderArchive):
+            bucket = self._hour_bucket(model.created_at)
+            query = self.db.query(
+                bucket,
+                model.status,
+                func.count(),
+                func.coalesce(func.sum(model.energy_amount), 0),
+                func.coalesce(func.sum(model.cost_trx), 0)
+            ).filter(model.created_at >= start)
+            if end:
+                query = query.filter(model.created_at < end)
+
+            for bucket_start, status, count, energy, cost in query.group_by(bucket, model.status):
+                totals = result.setdefault((_naive_utc(bucket_start), status), [0, 0, Decimal("0")])
+                totals[0] += count
+                totals[1] += int(energy)
+                totals[2] += Decimal(str(cost))
+        return result
+
+    def _aggregate_users(self, start: datetime, end: datetime = None) -> dict:
+        """按小时汇总时间段内新增的用户"""
+        bucket = self._hour_bucket(User.created_at)
+        query = self.db.query(bucket, func.count()).filter(User.created_at >= start)
+        if end:
+            query = query.filter(User.created_at < end)
+        return {_naive_utc(bucket_start): count for bucket_start, count in query.group_by(bucket)}
+
+    def _initial_watermark(self, name: str, upper: datetime) -> datetime:
+        """首次汇总的起点：最早一条数据所在的整点"""
+        if name == ORDER_WATERMARK:
+            candidates = [
+                self.db.query(func.min(Order.created_at)).scalar(),
+                self.db.query(func.min(OrderArchive.created_at)).scalar()
+            ]
+        else:
+            candidates = [self.db.query(func.min(User.created_at)).scalar()]
+        candidates = [_naive_utc(value) for value in candidates if value is not None]
+        return floor_hour(min(candidates)) if candidates else upper
+
+    def _write_chunk(self, name: str, start: datetime, end: datetime):
+        """写入一个时间段的汇总行（调用方负责提交）"""
+        if name == ORDER_WATERMARK:
+            self.db.add_all([
+                OrderStatsHourly(
+                    bucket_start=bucket_start, status=status,
+                    order_count=count, energy_amount=energy, cost_trx=cost
+                )
+                for (bucket_start, status), (count, energy, cost) in self._aggregate_orders(start, end).items()
+            ])
+        else:
+            self.db.add_all([
+                UserStatsHourly(bucket_start=bucket_start, new_users=count)
+                for bucket_start, count in self._aggregate_users(start, end).items()
+            ])
+
+    def roll_up(self, settle_minutes: int = STATS_SETTLE_MINUTES) -> int:
+        """从高水位起增量汇总已结束的整点时段，返回新汇总的小时数"""
+        upper = floor_hour(datetime.utcnow() - timedelta(minutes=settle_minutes))
+        rolled_hours = 0
+
+        for name in (ORDER_WATERMARK, USER_WATERMARK):
+            mark = self.db.query(StatsWatermark).filter(StatsWatermark.name == name).with_for_update().first()
+            if not mark:
+                mark = StatsWatermark(name=name, rolled_up_to=self._initial_watermark(name, upper))
+                self.db.add(mark)
+
+            start = _naive_utc(mark.rolled_up_to)
+            while start < upper:
+                # 分段提交，首次汇总大量历史数据时不会占用一个长事务
+                end = min(start + timedelta(hours=STATS_ROLLUP_CHUNK_HOURS), upper)
+                self._write_chunk(name, start, end)
+                mark.rolled_up_to = end
+                self.db.commit()
+                mark = self.db.query(StatsWatermark).filter(StatsWatermark.name == name).with_for_update().first()
+                rolled_hours += int((end - start).total_seconds() // 3600)
+                start = end
+            self.db.commit()
+
+        if rolled_hours:
+            logger.info(f"统计汇总完成: {rolled_hours} 小时，已汇总至 {upper}")
+        return rolled_hours
+
+    def snapshot_wallet_pool(self) -> WalletPoolSnapshot:
+        """记录钱包池快照并清理过期快照"""
+        snapshot = WalletPoolSnapshot(**self.current_pool())
+        self.db.add(snapshot)
+        self.db.query(WalletPoolSnapshot).filter(
+            WalletPoolSnapshot.captured_at < datetime.utcnow() - timedelta(days=STATS_SNAPSHOT_RETENTION_DAYS)
+        ).delete(synchronize_session=False)
+        self.db.commit()
+        return snapshot
+
+    def current_pool(self) -> dict:
+        """汇总活跃供应商钱包"""
+        active_wallets, energy_available, energy_limit, trx_balance = self.db.query(
+            func.count(),
+            func.coalesce(func.sum(SupplierWallet.energy_available), 0),
+            func.coalesce(func.sum(SupplierWallet.energy_limit), 0),
+            func.coalesce(func.sum(SupplierWallet.trx_balance), 0)
+        ).filter(SupplierWallet.is_active == True).one()
+        return {
+            "active_wallets": active_wallets,
+            "energy_available": int(energy_available),
+            "energy_limit": int(energy_limit),
+            "trx_balance": Decimal(str(trx_balance))
+        }
+
+    def _watermark(self, name: str):
+        mark = self.db.query(StatsWatermark.rolled_up_to).filter(StatsWatermark.name == name).scalar()
+        return _naive_utc(mark)
+
+    def get_stats(self, days: int = 7) -> StatsResponse:
+        """读取统计数据：汇总表 + 高水位之后尚未汇总的少量新数据"""
+        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        window_start = today_start - timedelta(days=days - 1)
+
+        order_mark = self._watermark(ORDER_WATERMARK)
+        live = self._aggregate_orders(order_mark or datetime(1970, 1, 1))
+
+        # 近N天按小时的汇总行与未汇总部分合并
+        recent = [
+            (_naive_utc(row.bucket_start), row.status, row.order_count, row.energy_amount, row.cost_trx)
+            for row in self.db.query(OrderStatsHourly).filter(OrderStatsHourly.bucket_start >= window_start)
+        ]
+        recent += [
+            (bucket_start, status, count, energy, cost)
+            for (bucket_start, status), (count, energy, cost) in live.items()
+            if bucket_start >= window_start
+        ]
+
+        daily = []
+        for offset in range(days):
+            day_start = window_start + timedelta(days=offset)
+            day_end = day_start + timedelta(days=1)
+            summary = self._summarize(entry for entry in recent if day_start <= entry[0] < day_end)
+            daily.append(DailyOrderStats(date=day_start.date().isoformat(), **summary.model_dump()))
+
+        # 全部时间按状态汇总（行数与时间跨度有关，与订单量无关）
+        totals = [
+            (None, status, count or 0, energy or 0, cost or 0)
+            for status, count, energy, cost in self.db.query(
+                OrderStatsHourly.status,
+                func.sum(OrderStatsHourly.order_count),
+                func.sum(OrderStatsHourly.energy_amount),
+                func.sum(OrderStatsHourly.cost_trx)
+            ).group_by(OrderStatsHourly.status)
+        ]
+        totals += [(None, status, count, energy, cost) for (_, status), (count, energy, cost) in live.items()]
+
+        user_mark = self._watermark(USER_WATERMARK)
+        total_users = (self.db.query(func.sum(UserStatsHourly.new_users)).scalar() or 0) + sum(
+            self._aggregate_users(user_mark or datetime(1970, 1, 1)).values()
+        )
+
+        snapshot = self.db.query(WalletPoolSnapshot).order_by(WalletPoolSnapshot.id.desc()).first()
+        pool = {
+            "active_wallets": snapshot.active_wallets,
+            "energy_available": snapshot.energy_available,
+            "energy_limit": snapshot.energy_limit,
+            "trx_balance": snapshot.trx_balance,
+            "captured_at": snapshot.captured_at
+        } if snapshot else self.current_pool()
+        if pool["energy_limit"]:
+            pool["utilisation"] = round(1 - pool["energy_available"] / pool["energy_limit"], 4)
+
+        return StatsResponse(
+            today=OrderStatsSummary(**daily[-1].model_dump(exclude={"date"})),
+            totals=self._summarize(totals),
+            total_users=total_users,
+            daily=daily,
+            pool=WalletPoolStats(**pool),
+            rolled_up_to=order_mark
+        )
+
+    def _summarize(self, entries) -> OrderStatsSummary:
+        """将 (小时, 状态, 数量, 能量, 金额) 汇总为订单统计；收入与能量只计已完成订单"""
+        summary = OrderStatsSummary()
+        for _, status, count, energy, cost in entries:
+            summary.orders += count
+            if status == "completed":
+                summary.completed += count
+                summary.revenue_trx += Decimal(str(cost))
+                summary.energy_delegated += int(energy)
+            elif status == "failed":
+                summary.failed += count
+
+        finished = summary.completed + summary.failed
+        if finished:
+            summary.success_rate = round(summary.completed / finished * 100, 2)
+        return summary
@@ -4,23 +4,36 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from tronpy import Tron, keys
 from tronpy.keys import PrivateKey
+from sqlalchemy import select, update, and_, or_, func, case
 from sqlalchemy.orm import Session
 from app.models import Order, SupplierWallet, User, BalanceTransaction
+from app.services.user_service import UserService
 from decimal import Decimal
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
 import asyncio
+import socket
 from cryptography.fernet import Fernet
 import base64
 
 # 导入网络配置
 TRON_NETWORK = os.getenv('TRON_NETWORK', 'mainnet')
 
+# 订单认领配置：租约时长（秒）与每批认领数量
+ORDER_LEASE_SECONDS = int(os.getenv('ORDER_LEASE_SECONDS', '300'))
+ORDER_CLAIM_BATCH_SIZE = int(os.getenv('ORDER_CLAIM_BATCH_SIZE', '10'))
+
 logger = logging.getLogger(__name__)
 
+def default_worker_id() -> str:
+    """当前处理器的租约标识（主机名:进程号）"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
 class TronTransactionService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, worker_id: str = None):
         self.db = db
+        self.worker_id = worker_id or default_worker_id()
+        self.user_service = UserService(db)
         
         # 根据网络配置初始化Tron客户端
         if TRON_NETWORK.lower() == "shasta":
@@ -112,14 +125,182 @@ class TronTransactionService:
         # 返回能量最多的钱包
         return wallets[0]
     
+    def _unclaimed_condition(self, now: datetime):
+        """无人处理的订单：待处理，或租约已过期且尚未上链的处理中订单"""
+        return or_(
+            Order.status == "pending",
+            and_(
+                Order.status == "processing",
+                Order.lease_expires_at < now,
+                Order.tx_hash.is_(None)
+            )
+        )
+    
+    def _claimable_condition(self, now: datetime):
+        """可认领订单条件：无人处理且未过期（过期订单由过期清理统一处理）"""
+        return and_(
+            self._unclaimed_condition(now),
+            or_(Order.expires_at.is_(None), Order.expires_at >= now)
+        )
+    
+    def claim_orders(self, limit: int = ORDER_CLAIM_BATCH_SIZE, lease_seconds: int = ORDER_LEASE_SECONDS) -> list[str]:
+        """原子认领一批订单，返回认领到的订单ID列表
+        
+        PostgreSQL 使用 FOR UPDATE SKIP LOCKED，多个处理器并发认领互不阻塞；
+        SQLite 没有行锁，但单条 UPDATE 语句在数据库写锁内执行，同样不会重复认领。
+        """
+        now = datetime.utcnow()
+        lease_expires_at = now + timedelta(seconds=lease_seconds)
+        
+        candidates = select(Order.id).where(
+            self._claimable_condition(now)
+        ).order_by(Order.created_at.asc()).limit(limit).with_for_update(skip_locked=True)
+        
+        stmt = update(Order).where(Order.id.in_(candidates.scalar_subquery())).values(
+            status="processing",
+            lease_owner=self.worker_id,
+            lease_expires_at=lease_expires_at
+        ).execution_options(synchronize_session=False)
+        
+        if self.db.get_bind().dialect.update_returning:
+            order_ids = list(self.db.execute(stmt.returning(Order.id)).scalars())
+        else:
+            self.db.execute(stmt)
+            order_ids = list(self.db.execute(
+                select(Order.id).where(
+                    Order.lease_owner == self.worker_id,
+                    Order.lease_expires_at == lease_expires_at
+                )
+            ).scalars())
+        self.db.commit()
+        
+        if order_ids:
+            logger.info(f"处理器 {self.worker_id} 认领 {len(order_ids)} 个订单")
+        return order_ids
+    
+    def claim_order(self, order_id: str, lease_seconds: int = ORDER_LEASE_SECONDS) -> bool:
+        """认领单个订单（已由当前处理器持有的租约会被续期）"""
+        now = datetime.utcnow()
+        result = self.db.execute(
+            update(Order).where(
+                Order.id == order_id,
+                or_(
+                    self._claimable_condition(now),
+                    and_(Order.status == "processing", Order.lease_owner == self.worker_id)
+                )
+            ).values(
+                status="processing",
+                lease_owner=self.worker_id,
+                lease_expires_at=now + timedelta(seconds=lease_seconds)
+            ).execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return result.rowcount == 1
+    
+    def expire_overdue_orders(self) -> int:
+        """批量将所有已过期且无人处理的订单标记为expired，已扣款的批量退款，返回过期数量"""
+        now = datetime.utcnow()
+        
+        overdue = select(Order.id).where(
+            self._unclaimed_condition(now),
+            Order.expires_at < now
+        ).with_for_update(skip_locked=True)
+        
+        # 租约字段记录清理者，便于不支持RETURNING的数据库回查本次过期的订单
+        stmt = update(Order).where(Order.id.in_(overdue.scalar_subquery())).values(
+            status="expired",
+            lease_owner=self.worker_id,
+            lease_expires_at=now
+        ).execution_options(synchronize_session=False)
+        
+        if self.db.get_bind().dialect.update_returning:
+            order_ids = list(self.db.execute(stmt.returning(Order.id)).scalars())
+        else:
+            self.db.execute(stmt)
+            order_ids = list(self.db.execute(
+                select(Order.id).where(
+                    Order.status == "expired",
+                    Order.lease_owner == self.worker_id,
+                    Order.lease_expires_at == now
+                )
+            ).scalars())
+        
+        if order_ids:
+            self._refund_orders_bulk(order_ids, "订单过期自动退款")
+        self.db.commit()
+        
+        if order_ids:
+            logger.info(f"过期清理: {len(order_ids)} 个订单已过期")
+        return len(order_ids)
+    
+    def _refund_orders_bulk(self, order_ids: list[str], description: str):
+        """对已扣款未退款的订单批量退款（调用方负责提交）"""
+        net_charges = func.sum(case(
+            (BalanceTransaction.transaction_type == "deduct", 1),
+            else_=-1
+        ))
+        charged_ids = select(BalanceTransaction.reference_id).where(
+            BalanceTransaction.reference_id.in_(order_ids),
+            BalanceTransaction.transaction_type.in_(["deduct", "refund"])
+        ).group_by(BalanceTransaction.reference_id).having(net_charges > 0)
+        
+        charged_orders = self.db.query(Order).filter(
+            Order.id.in_(charged_ids)
+        ).order_by(Order.user_id, Order.created_at).all()
+        if not charged_orders:
+            return
+        
+        users = {
+            user.id: user for user in self.db.query(User).filter(
+                User.id.in_({order.user_id for order in charged_orders})
+            ).with_for_update().all()
+        }
+        
+        refunds = []
+        for order in charged_orders:
+            user = users.get(order.user_id)
+            if not user:
+                continue
+            user.balance_trx += order.cost_trx
+            refunds.append(BalanceTransaction(
+                user_id=order.user_id,
+                transaction_type="refund",
+                amount=order.cost_trx,
+                balance_after=user.balance_trx,
+                reference_id=order.id,
+                description=description
+            ))
+        self.db.add_all(refunds)
+        logger.info(f"批量退款: {len(refunds)} 个订单")
+    
+    def _refund_order(self, order: Order, description: str):
+        """订单退款（调用方负责提交）"""
+        user = self.db.query(User).filter(User.id == order.user_id).first()
+        if not user:
+            return
+        
+        user.balance_trx += order.cost_trx
+        refund_tx = BalanceTransaction(
+            user_id=order.user_id,
+            transaction_type="refund",
+            amount=order.cost_trx,
+            balance_after=user.balance_trx,
+            reference_id=order.id,
+            description=description
+        )
+        self.db.add(refund_tx)
+    
     async def execute_energy_delegate(self, order_id: str) -> bool:
         """执行能量委托交易"""
         try:
+            # 认领订单，防止多个处理器重复执行
+            if not self.claim_order(order_id):
+                logger.error(f"订单不存在、状态异常或已被其他处理器认领: {order_id}")
+                return False
+            
             # 获取订单信息
             order = self.db.query(Order).filter(Order.id == order_id).first()
-            if not order or order.status != "pending":
-                logger.error(f"订单不存在或状态异常: {order_id}")
-                return False
+            charged = self.user_service.is_order_charged(order_id)
             
             # 获取可用的供应商钱包
             supplier_wallet = self.get_available_supplier_wallet(order.energy_amount)
@@ -127,34 +308,36 @@ class TronTransactionService:
                 logger.error(f"没有可用的供应商钱包处理订单: {order_id}")
                 order.status = "failed"
                 order.error_message = "暂无可用钱包资源"
+                if charged:
+                    self._refund_order(order, "暂无可用钱包资源自动退款")
                 self.db.commit()
                 return False
             
-            # 更新订单状态为处理中
-            order.status = "processing"
+            # 记录处理订单的供应商钱包
             order.supplier_wallet = supplier_wallet.wallet_address
             self.db.commit()
             
-            # 扣减用户余额
+            # 扣减用户余额（租约过期重新认领的订单已扣款则跳过）
             user = self.db.query(User).filter(User.id == order.user_id).first()
-            if user.balance_trx < order.cost_trx:
-                order.status = "failed"
-                order.error_message = "用户余额不足"
-                self.db.commit()
-                return False
-            
-            user.balance_trx -= order.cost_trx
-            
-            # 记录余额扣减
-            balance_tx = BalanceTransaction(
-                user_id=order.user_id,
-                transaction_type="deduct",
-                amount=order.cost_trx,
-                balance_after=user.balance_trx,
-                reference_id=order.id,
-                description=f"能量租赁扣款 - 订单{order.id[:8]}"
-            )
-            self.db.add(balance_tx)
+            if not charged:
+                if user.balance_trx < order.cost_trx:
+                    order.status = "failed"
+                    order.error_message = "用户余额不足"
+                    self.db.commit()
+                    return False
+                
+                user.balance_trx -= order.cost_trx
+                
+                # 记录余额扣减
+                balance_tx = BalanceTransaction(
+                    user_id=order.user_id,
+                    transaction_type="deduct",
+                    amount=order.cost_trx,
+                    balance_after=user.balance_trx,
+                    reference_id=order.id,
+                    description=f"能量租赁扣款 - 订单{order.id[:8]}"
+                )
+                self.db.add(balance_tx)
             
             # 解密私钥并创建交易
             private_key = self.decrypt_private_key(supplier_wallet.private_key_encrypted)
@@ -194,16 +377,7 @@ class TronTransactionService:
                 order.error_message = f"交易失败: {result.get('message', 'Unknown error')}"
                 
                 # 退款
-                user.balance_trx += order.cost_trx
-                refund_tx = BalanceTransaction(
-                    user_id=order.user_id,
-                    transaction_type="refund",
-                    amount=order.cost_trx,
-                    balance_after=user.balance_trx,
-                    reference_id=order.id,
-                    description="交易失败自动退款"
-                )
-                self.db.add(refund_tx)
+                self._refund_order(order, "交易失败自动退款")
                 
                 logger.error(f"能量委托交易失败: {order_id}, 错误: {order.error_message}")
             
@@ -214,24 +388,15 @@ class TronTransactionService:
             logger.error(f"执行能量委托交易异常: {order_id}, 错误: {str(e)}")
             
             # 异常处理，订单标记失败并退款
+            self.db.rollback()
             order = self.db.query(Order).filter(Order.id == order_id).first()
-            if order and order.status == "processing":
+            if order and order.status == "processing" and order.lease_owner == self.worker_id:
                 order.status = "failed"
                 order.error_message = f"交易执行异常: {str(e)}"
                 
-                # 退款给用户
-                user = self.db.query(User).filter(User.id == order.user_id).first()
-                if user:
-                    user.balance_trx += order.cost_trx
-                    refund_tx = BalanceTransaction(
-                        user_id=order.user_id,
-                        transaction_type="refund",
-                        amount=order.cost_trx,
-                        balance_after=user.balance_trx,
-                        reference_id=order.id,
-                        description="系统异常自动退款"
-                    )
-                    self.db.add(refund_tx)
+                # 已扣款则退款给用户
+                if self.user_service.is_order_charged(order_id):
+                    self._refund_order(order, "系统异常自动退款")
                 
                 self.db.commit()
             
@@ -271,26 +436,18 @@ class TronTransactionService:
         self.db.commit()
     
     async def process_pending_orders(self):
-        """处理待处理的订单"""
-        pending_orders = self.db.query(Order).filter(
-            Order.status == "pending"
-        ).order_by(Order.created_at.asc()).limit(10).all()
+        """认领并处理待处理的订单"""
+        order_ids = self.claim_orders()
         
-        for order in pending_orders:
+        # 认领的批次只包含未过期订单，过期订单由 expire_overdue_orders 批量处理
+        for order_id in order_ids:
             try:
-                # 检查订单是否过期
-                if order.expires_at and order.expires_at < datetime.utcnow():
-                    order.status = "expired"
-                    self.db.commit()
-                    logger.info(f"订单已过期: {order.id}")
-                    continue
-                
                 # 执行能量委托
-                await self.execute_energy_delegate(order.id)
+                await self.execute_energy_delegate(order_id)
                 
                 # 处理间隔，避免频繁交易
                 await asyncio.sleep(2)
                 
             except Exception as e:
-                logger.error(f"处理订单异常: {order.id}, 错误: {str(e)}")
+                logger.error(f"处理订单异常: {order_id}, 错误: {str(e)}")
                 continue
\ No newline at end of file
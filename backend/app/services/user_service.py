@@ -1,6 +1,9 @@
 from sqlalchemy.orm import Session
-from app.models import User, BalanceTransaction
-from app.schemas import UserBalanceResponse
+from sqlalchemy.exc import IntegrityError
+from app.models import User, BalanceTransaction, BalanceTransactionArchive
+from app.schemas import UserBalanceResponse, BalanceTransactionResponse
+from app.services.exchange_rate_service import exchange_rate_service
+from app.utils.pagination import apply_keyset, merge_pages
 from decimal import Decimal
 import logging
 
@@ -26,6 +29,40 @@ class UserService:
             balance_usdt=user.balance_usdt
         )
     
+    def get_balance_transactions(self, user_id: int = None, transaction_type: str = None,
+                                 cursor: str = None, limit: int = 100) -> list[BalanceTransactionResponse]:
+        """获取余额变动记录（游标分页；按用户查询时合并归档表中的历史记录）"""
+        query = self.db.query(BalanceTransaction)
+        
+        if user_id:
+            query = query.filter(BalanceTransaction.user_id == user_id)
+        if transaction_type:
+            query = query.filter(BalanceTransaction.transaction_type == transaction_type)
+        
+        transactions = apply_keyset(
+            query, BalanceTransaction.created_at, BalanceTransaction.id, cursor, limit
+        ).all()
+        
+        if user_id:
+            archived = self.db.query(BalanceTransactionArchive).filter(BalanceTransactionArchive.user_id == user_id)
+            if transaction_type:
+                archived = archived.filter(BalanceTransactionArchive.transaction_type == transaction_type)
+            transactions = merge_pages(transactions, apply_keyset(
+                archived, BalanceTransactionArchive.created_at, BalanceTransactionArchive.id, cursor, limit
+            ).all(), limit=limit)
+        return [BalanceTransactionResponse(
+            id=tx.id,
+            user_id=tx.user_id,
+            transaction_type=tx.transaction_type,
+            amount=tx.amount,
+            balance_after=tx.balance_after,
+            reference_id=tx.reference_id,
+            description=tx.description,
+            exchange_rate=getattr(tx, "exchange_rate", None),  # 归档表没有汇率字段
+            exchange_rate_version=getattr(tx, "exchange_rate_version", None),
+            created_at=tx.created_at
+        ) for tx in transactions]
+    
     def deduct_balance(self, user_id: int, amount: Decimal, order_id: str, description: str = None) -> bool:
         """扣减用户余额"""
         user = self.db.query(User).filter(User.id == user_id).first()
@@ -52,6 +89,16 @@ class UserService:
         logger.info(f"用户 {user_id} 余额扣减 {amount} TRX，订单: {order_id}")
         return True
     
+    def is_order_charged(self, order_id: str) -> bool:
+        """订单是否已扣款且未退款"""
+        transaction_types = [
+            row[0] for row in self.db.query(BalanceTransaction.transaction_type).filter(
+                BalanceTransaction.reference_id == order_id,
+                BalanceTransaction.transaction_type.in_(["deduct", "refund"])
+            ).all()
+        ]
+        return transaction_types.count("deduct") > transaction_types.count("refund")
+    
     async def confirm_deposit(self, user_id: int, tx_hash: str, amount: Decimal, currency: str) -> bool:
         """确认用户充值"""
         # 检查充值是否已处理
@@ -68,10 +115,11 @@ class UserService:
             self.db.add(user)
             self.db.flush()
         
-        # 转换为TRX（如果是USDT）
+        # 转换为TRX（如果是USDT），按有效期内的汇率快照入账
+        rate = None
         if currency.upper() == "USDT":
-            # USDT转TRX汇率 (1 TRX = 0.38826 USDT)
-            trx_amount = amount / Decimal("0.38826")
+            rate = exchange_rate_service.rate_for_deposit()
+            trx_amount = rate.usdt_to_trx(amount)
         else:
             trx_amount = amount
         
@@ -85,11 +133,18 @@ class UserService:
             amount=trx_amount,
             balance_after=user.balance_trx,
             reference_id=tx_hash,
-            description=f"{currency}充值: {amount} -> {trx_amount} TRX"
+            description=f"{currency}充值: {amount} -> {trx_amount} TRX",
+            exchange_rate=rate.usdt_per_trx if rate else None,
+            exchange_rate_version=rate.version if rate else None
         )
         
         self.db.add(transaction)
-        self.db.commit()
+        try:
+            self.db.commit()
+        except IntegrityError:
+            # 同一交易已由手动确认或充值监听并发入账（充值交易哈希唯一索引）
+            self.db.rollback()
+            return False
         
         logger.info(f"用户 {user_id} 充值确认: {amount} {currency} -> {trx_amount} TRX")
         return True
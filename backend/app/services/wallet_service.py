@@ -11,13 +11,21 @@ class WalletService:
     
     def get_user_wallets(self, user_id: int) -> list[UserWalletResponse]:
         """获取用户钱包地址列表"""
-        wallets = self.db.query(UserWallet).filter(
-            UserWallet.user_id == user_id,
-            UserWallet.is_active == True
-        ).order_by(UserWallet.created_at.desc()).all()
+        wallets = self._active_wallets(self.db.query(UserWallet), user_id).all()
         
         return [self._wallet_to_response(wallet) for wallet in wallets]
     
+    def get_user_wallet_rows(self, user_id: int) -> list:
+        """获取用户钱包地址列表（快速路径：只查询响应字段，返回行对象）"""
+        query = self.db.query(UserWallet.id, UserWallet.wallet_address, UserWallet.is_active, UserWallet.created_at)
+        return self._active_wallets(query, user_id).all()
+    
+    def _active_wallets(self, query, user_id: int):
+        return query.filter(
+            UserWallet.user_id == user_id,
+            UserWallet.is_active == True
+        ).order_by(UserWallet.created_at.desc())
+    
     def add_user_wallet(self, user_id: int, wallet_address: str) -> bool:
         """添加用户钱包地址"""
         # 验证TRON地址格式
@@ -0,0 +1,77 @@
+"""
+余额变动事件 - 余额流水提交后通过Redis发布受影响的用户ID，机器人据此使余额缓存失效
+在会话提交时统一发布，API、Celery Worker与交易处理器的所有记账路径都会覆盖；发布失败只记录日志
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.models import BalanceTransaction
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+BALANCE_EVENTS_ENABLED = os.getenv("BALANCE_EVENTS_ENABLED", "false").lower() == "true"
+BALANCE_EVENTS_CHANNEL = os.getenv("BALANCE_EVENTS_CHANNEL", "trx_energy:balance_changed")
+BALANCE_EVENTS_TIMEOUT = float(os.getenv("BALANCE_EVENTS_TIMEOUT", "0.5"))  # 发布超时（秒），不拖慢记账路径
+
+_PENDING_KEY = "balance_changed_user_ids"
+
+class BalanceEventPublisher:
+    """Redis发布者（首次发布时建立连接）"""
+
+    def __init__(self, channel: str = BALANCE_EVENTS_CHANNEL, client=None):
+        self.channel = channel
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import redis
+            from app.database import settings
+
+            self._client = redis.Redis.from_url(
+                settings.redis_url,
+                socket_timeout=BALANCE_EVENTS_TIMEOUT,
+                socket_connect_timeout=BALANCE_EVENTS_TIMEOUT
+            )
+        return self._client
+
+    def publish(self, user_ids) -> bool:
+        """发布余额变动的用户ID"""
+        try:
+            self.client.publish(self.channel, json.dumps({"user_ids": sorted(user_ids)}))
+            return True
+        except Exception as e:
+            logger.warning(f"余额变动事件发布失败: {e}")
+            return False
+
+def _collect(session: Session, flush_context, instances):
+    """记录本次刷新写入余额流水的用户"""
+    user_ids = {obj.user_id for obj in session.new if isinstance(obj, BalanceTransaction)}
+    if user_ids:
+        session.info.setdefault(_PENDING_KEY, set()).update(user_ids)
+
+def _publish(session: Session):
+    """事务提交后发布（回滚的变动不会发布）"""
+    user_ids = session.info.pop(_PENDING_KEY, None)
+    if user_ids and _publisher is not None:
+        _publisher.publish(user_ids)
+
+def _discard(session: Session):
+    session.info.pop(_PENDING_KEY, None)
+
+_publisher = None
+
+def install_balance_events(publisher: BalanceEventPublisher = None) -> bool:
+    """注册会话事件：flush时收集、commit后发布、rollback时丢弃；未启用时不注册"""
+    global _publisher
+    if publisher is None and not BALANCE_EVENTS_ENABLED:
+        return False
+
+    if not event.contains(Session, "after_commit", _publish):
+        event.listen(Session, "before_flush", _collect)
+        event.listen(Session, "after_commit", _publish)
+        event.listen(Session, "after_rollback", _discard)
+    _publisher = publisher or _publisher or BalanceEventPublisher()
+    return True
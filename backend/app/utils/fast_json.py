@@ -0,0 +1,52 @@
+"""
+列表接口快速JSON输出 - 查询行直接投影为字典后序列化
+跳过逐行构造pydantic模型以及FastAPI按response_model的二次校验；输出格式与原响应模型一致
+安装了 orjson 时使用 orjson，否则回退到标准库 json
+"""
+from datetime import datetime
+from decimal import Decimal
+from fastapi.responses import Response
+import json
+import os
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+# 是否启用列表接口快速输出
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "true").lower() == "true"
+
+def is_fast_json_enabled() -> bool:
+    """列表接口是否走快速输出路径"""
+    return FAST_JSON_RESPONSES
+
+def _isoformat(value: datetime) -> str:
+    """与pydantic一致：UTC时间以Z结尾"""
+    if value.tzinfo is not None and value.utcoffset().total_seconds() == 0:
+        return value.replace(tzinfo=None).isoformat() + "Z"
+    return value.isoformat()
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return str(value)  # 与pydantic一致，金额输出为字符串以保留精度
+    if isinstance(value, datetime):
+        return _isoformat(value)
+    raise TypeError(f"无法序列化类型: {type(value).__name__}")
+
+def dumps(content) -> bytes:
+    """序列化为JSON字节串"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def rows_to_dicts(rows) -> list[dict]:
+    """将列查询结果（Row）投影为字典"""
+    return [row._asdict() for row in rows]
+
+class FastJSONResponse(Response):
+    """使用快速编码器输出的JSON响应"""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,129 @@
+"""
+新订单唤醒信号 - 订单创建后立即唤醒交易处理器
+PostgreSQL 使用 LISTEN/NOTIFY（随订单事务一起提交）；其他数据库通过本机UDP报文通知
+"""
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+import asyncio
+import logging
+import os
+import socket
+
+logger = logging.getLogger(__name__)
+
+ORDER_NOTIFY_CHANNEL = "new_orders"
+ORDER_WAKEUP_HOST = os.getenv("ORDER_WAKEUP_HOST", "127.0.0.1")
+ORDER_WAKEUP_PORT = int(os.getenv("ORDER_WAKEUP_PORT", "8765"))
+_PENDING_ORDERS_KEY = "pending_order_signals"  # session.info 中待提交后通知的订单ID
+
+def publish_new_order(db, order_id: str):
+    """通知交易处理器有新订单（在订单提交前调用，提交后才会送达）"""
+    try:
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(
+                text("SELECT pg_notify(:channel, :order_id)"),
+                {"channel": ORDER_NOTIFY_CHANNEL, "order_id": order_id}
+            )
+        else:
+            pending = db.info.get(_PENDING_ORDERS_KEY)
+            if pending is None:
+                # 每个会话只注册一次：提交后发送、回滚后丢弃本事务中登记的订单
+                pending = db.info[_PENDING_ORDERS_KEY] = []
+                event.listen(db, "after_commit", _send_pending)
+                event.listen(db, "after_soft_rollback", _discard_pending)
+            pending.append(order_id)
+    except Exception as e:
+        # 通知失败不影响下单，处理器会通过兜底轮询拿到订单
+        logger.warning(f"新订单通知失败: {order_id}, 错误: {e}")
+
+def _send_pending(session):
+    """事务提交后发送本事务中创建的订单"""
+    pending = session.info.get(_PENDING_ORDERS_KEY)
+    order_ids = list(pending)
+    pending.clear()
+    for order_id in order_ids:
+        _send_datagram(order_id)
+
+def _discard_pending(session, previous_transaction):
+    """事务回滚（例如幂等键冲突）后丢弃未创建成功的订单，不在之后无关的提交中发送"""
+    if not previous_transaction.nested:
+        session.info.get(_PENDING_ORDERS_KEY).clear()
+
+def _send_datagram(order_id: str):
+    """向本机处理器发送UDP唤醒报文（无人监听时直接丢弃）"""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.sendto(order_id.encode(), (ORDER_WAKEUP_HOST, ORDER_WAKEUP_PORT))
+    except OSError as e:
+        logger.warning(f"发送订单唤醒报文失败: {e}")
+
+class _WakeupProtocol(asyncio.DatagramProtocol):
+    def __init__(self, wakeup: asyncio.Event):
+        self.wakeup = wakeup
+
+    def datagram_received(self, data, addr):
+        self.wakeup.set()
+
+class OrderWakeupListener:
+    """交易处理器侧的唤醒监听器"""
+
+    def __init__(self, database_url: str = None, port: int = ORDER_WAKEUP_PORT):
+        from app.database import settings
+
+        self.url = make_url(database_url or settings.database_url)
+        self.port = port
+        self._wakeup = None
+        self._pg_conn = None
+        self._transport = None
+
+    async def start(self) -> bool:
+        """开始监听，失败时返回False（此时仅依赖兜底轮询）"""
+        self._wakeup = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        try:
+            if self.url.get_backend_name() == "postgresql":
+                import psycopg2
+
+                dsn = self.url.set(drivername="postgresql").render_as_string(hide_password=False)
+                self._pg_conn = psycopg2.connect(dsn)
+                self._pg_conn.autocommit = True
+                self._pg_conn.cursor().execute(f"LISTEN {ORDER_NOTIFY_CHANNEL}")
+                loop.add_reader(self._pg_conn.fileno(), self._on_pg_notify)
+                logger.info(f"已监听PostgreSQL新订单通知: {ORDER_NOTIFY_CHANNEL}")
+            else:
+                self._transport, _ = await loop.create_datagram_endpoint(
+                    lambda: _WakeupProtocol(self._wakeup),
+                    local_addr=(ORDER_WAKEUP_HOST, self.port)
+                )
+                logger.info(f"已监听新订单唤醒报文: {ORDER_WAKEUP_HOST}:{self.port}")
+            return True
+        except Exception as e:
+            logger.warning(f"新订单唤醒监听启动失败，仅使用轮询: {e}")
+            return False
+
+    def _on_pg_notify(self):
+        self._pg_conn.poll()
+        if self._pg_conn.notifies:
+            self._pg_conn.notifies.clear()
+            self._wakeup.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """等待新订单信号，返回是否被唤醒（超时返回False）"""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._wakeup.clear()
+
+    def close(self):
+        """停止监听"""
+        if self._pg_conn is not None:
+            asyncio.get_event_loop().remove_reader(self._pg_conn.fileno())
+            self._pg_conn.close()
+            self._pg_conn = None
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
@@ -0,0 +1,47 @@
+"""
+游标分页工具 - 基于 (created_at, id) 的键集分页
+翻页代价与页码无关，深翻页不再随 OFFSET 线性变慢
+"""
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import or_, and_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(created_at: datetime, row_id) -> str:
+    """将最后一行的 (created_at, id) 编码为不透明游标"""
+    payload = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    """解析游标，格式错误时抛出 ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), row_id
+    except Exception:
+        raise ValueError("无效的分页游标")
+
+def apply_keyset(query, created_at_column, id_column, cursor: str = None, limit: int = 100):
+    """按 (created_at, id) 倒序取下一页"""
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            created_at_column < created_at,
+            and_(created_at_column == created_at, id_column < row_id)
+        ))
+    return query.order_by(created_at_column.desc(), id_column.desc()).limit(limit)
+
+def next_cursor(items: list, limit: int):
+    """整页时返回下一页游标，否则说明已到末页"""
+    if not items or len(items) < limit:
+        return None
+    last = items[-1]
+    return encode_cursor(last.created_at, last.id)
+
+def merge_pages(*pages, limit: int = 100) -> list:
+    """合并多个按 (created_at, id) 倒序的分页结果（如热表与归档表），取前limit条"""
+    rows = [row for page in pages for row in page]
+    rows.sort(key=lambda row: (row.created_at, row.id), reverse=True)
+    return rows[:limit]
@@ -1,57 +1,71 @@
 """
-工作任务启动器 - 安全的任务调度接口
-负责安全地启动后台任务，避免Redis连接错误影响主要业务逻辑
+工作任务启动器 - 订单派发接口
+负责将发件箱中的订单派发到任务队列；未配置队列时回退到进程内执行
 """
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import logging
 import os
 
 logger = logging.getLogger(__name__)
 
-def safely_start_order_task(order_id: str) -> bool:
-    """
-    安全地启动订单处理任务
-    
-    Args:
-        order_id: 订单ID
-        
-    Returns:
-        bool: 是否成功启动后台任务
-    """
-    # 检查是否启用了后台任务
-    if os.getenv("ENABLE_BACKGROUND_TASKS", "false").lower() != "true":
-        logger.info(f"后台任务未启用，订单 {order_id} 将通过定时任务处理")
-        return False
-    
-    try:
-        # 先检查Redis连接
-        import redis
-        from app.database import settings
-        
-        redis_client = redis.Redis.from_url(settings.redis_url)
-        redis_client.ping()  # 测试连接
-        logger.info("Redis连接测试成功")
-        
-        # 成功连接Redis后，导入并启动Celery任务
-        from tron_worker import execute_order
-        execute_order.delay(order_id)
-        logger.info(f"订单后台处理任务已启动: {order_id}")
-        return True
-        
-    except ImportError as e:
-        logger.warning(f"缺少依赖模块: {e}")
-        return False
-    except Exception as e:
-        logger.warning(f"后台任务启动失败: {e}")
-        return False
+def is_queue_enabled() -> bool:
+    """是否启用了Celery任务队列"""
+    return os.getenv("ENABLE_BACKGROUND_TASKS", "false").lower() == "true"
+
+class CeleryDispatcher:
+    """通过Celery派发订单，复用Celery生产者连接池，一批订单共用一个连接"""
+
+    def dispatch(self, order_ids: list[str]):
+        from tron_worker import celery_app, execute_order
+
+        with celery_app.producer_or_acquire() as producer:
+            for order_id in order_ids:
+                # 不在请求路径上重试：发送失败由发件箱记录并在下一轮重新派发
+                execute_order.apply_async(args=[order_id], producer=producer, retry=False)
+        logger.info(f"已派发 {len(order_ids)} 个订单到任务队列")
+
+class InProcessDispatcher:
+    """进程内派发：在单线程执行器中依次执行订单，不阻塞API事件循环"""
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="order-executor")
+
+    def dispatch(self, order_ids: list[str]):
+        for order_id in order_ids:
+            self._executor.submit(self._execute, order_id)
+        logger.info(f"已在进程内派发 {len(order_ids)} 个订单")
+
+    def _execute(self, order_id: str):
+        from app.database import SessionLocal
+        from app.services.tron_service import TronTransactionService
+
+        db = SessionLocal()
+        try:
+            result = asyncio.run(TronTransactionService(db).execute_energy_delegate(order_id))
+            logger.info(f"订单执行完成: {order_id}, 结果: {result}")
+        except Exception as e:
+            logger.error(f"订单执行失败: {order_id}, 错误: {e}")
+        finally:
+            db.close()
+
+_dispatcher = None
+
+def get_order_dispatcher():
+    """获取订单派发器（按配置选择队列或进程内执行）"""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = CeleryDispatcher() if is_queue_enabled() else InProcessDispatcher()
+    return _dispatcher
 
 def is_background_tasks_available() -> bool:
     """检查后台任务是否可用"""
     try:
         import redis
         from app.database import settings
-        
+
         redis_client = redis.Redis.from_url(settings.redis_url)
         redis_client.ping()
         return True
     except:
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+列表接口序列化基准测试
+对比原路径（ORM对象 -> pydantic模型 -> response_model校验 -> JSON）与快速路径（列投影 -> 快速JSON编码）
+
+用法: python benchmark_list_endpoints.py [订单数量] [每页数量] [请求次数]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# 使用临时数据库，避免影响开发数据库
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'benchmark.db')}"
+
+from fastapi.testclient import TestClient
+from main import app
+from app.database import SessionLocal
+from app.models import Order, User
+from app.utils import fast_json
+
+def seed(order_count: int):
+    """写入测试订单"""
+    db = SessionLocal()
+    try:
+        db.add(User(id=1, balance_trx=Decimal("100")))
+        now = datetime.utcnow()
+        db.add_all([Order(
+            id=f"order-{i:08d}",
+            user_id=1,
+            receive_address="TQ5kjKLLm9X4L2D1JgogNis6V1YoAm6sv2",
+            energy_amount=65000,
+            duration_hours=1,
+            cost_trx=Decimal("2.600000"),
+            status="completed",
+            supplier_wallet="TQ5kjKLLm9X4L2D1JgogNis6V1YoAm6sv2",
+            tx_hash="ab" * 32,
+            created_at=now - timedelta(seconds=i),
+            completed_at=now - timedelta(seconds=i)
+        ) for i in range(order_count)])
+        db.commit()
+    finally:
+        db.close()
+
+def run(client: TestClient, url: str, requests_count: int, fast: bool) -> float:
+    """返回平均每次请求耗时（毫秒）"""
+    fast_json.FAST_JSON_RESPONSES = fast
+    client.get(url)  # 预热
+    started = time.perf_counter()
+    for _ in range(requests_count):
+        response = client.get(url)
+        assert response.status_code == 200
+    return (time.perf_counter() - started) / requests_count * 1000
+
+def main():
+    order_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    page_size = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    requests_count = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    seed(order_count)
+    client = TestClient(app)
+    encoder = "orjson" if fast_json.orjson is not None else "json"
+
+    print(f"订单数: {order_count}, 每页: {page_size}, 请求次数: {requests_count}, 快速路径编码器: {encoder}")
+    for name, url in (
+        ("管理后台订单列表", f"/api/orders/?limit={page_size}"),
+        ("用户订单列表", f"/api/orders/?user_id=1&limit={page_size}"),
+    ):
+        slow = run(client, url, requests_count, fast=False)
+        fast = run(client, url, requests_count, fast=True)
+        print(f"{name}: 原路径 {slow:.2f} ms, 快速路径 {fast:.2f} ms, 提升 {slow / fast:.2f}x")
+
+if __name__ == "__main__":
+    main()
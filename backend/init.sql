@@ -38,6 +38,8 @@ CREATE TABLE IF NOT EXISTS orders (
     tx_hash VARCHAR(66),
     error_message TEXT,
     retry_count INTEGER DEFAULT 0,
+    lease_owner VARCHAR(64),
+    lease_expires_at TIMESTAMP WITH TIME ZONE,
     expires_at TIMESTAMP WITH TIME ZONE,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     completed_at TIMESTAMP WITH TIME ZONE
@@ -69,12 +71,106 @@ CREATE TABLE IF NOT EXISTS supplier_wallets (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+-- 创建订单派发发件箱表
+CREATE TABLE IF NOT EXISTS order_outbox (
+    id SERIAL PRIMARY KEY,
+    order_id VARCHAR(36) NOT NULL REFERENCES orders(id),
+    attempts INTEGER DEFAULT 0,
+    last_error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    dispatched_at TIMESTAMP WITH TIME ZONE
+);
+
+-- 创建下单幂等键表
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    id SERIAL PRIMARY KEY,
+    key VARCHAR(255) NOT NULL UNIQUE,
+    request_hash VARCHAR(64) NOT NULL,
+    order_id VARCHAR(36) REFERENCES orders(id),
+    response_body TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 创建订单归档表（已结束且超过保留期的订单）
+CREATE TABLE IF NOT EXISTS orders_archive (
+    id VARCHAR(36) PRIMARY KEY,
+    user_id BIGINT REFERENCES users(id),
+    receive_address VARCHAR(42) NOT NULL,
+    energy_amount INTEGER NOT NULL,
+    duration_hours INTEGER NOT NULL,
+    cost_trx DECIMAL(18,6) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    supplier_wallet VARCHAR(42),
+    tx_hash VARCHAR(66),
+    error_message TEXT,
+    retry_count INTEGER DEFAULT 0,
+    expires_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE,
+    completed_at TIMESTAMP WITH TIME ZONE,
+    archived_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 创建余额变动归档表
+CREATE TABLE IF NOT EXISTS balance_transactions_archive (
+    id INTEGER PRIMARY KEY,
+    user_id BIGINT REFERENCES users(id),
+    transaction_type VARCHAR(20) NOT NULL,
+    amount DECIMAL(18,6) NOT NULL,
+    balance_after DECIMAL(18,6) NOT NULL,
+    reference_id VARCHAR(255),
+    description VARCHAR(500),
+    created_at TIMESTAMP WITH TIME ZONE,
+    archived_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 创建统计汇总表（管理后台统计由后台任务增量汇总）
+CREATE TABLE IF NOT EXISTS order_stats_hourly (
+    bucket_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    order_count INTEGER NOT NULL DEFAULT 0,
+    energy_amount BIGINT NOT NULL DEFAULT 0,
+    cost_trx DECIMAL(18,6) NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_start, status)
+);
+
+CREATE TABLE IF NOT EXISTS user_stats_hourly (
+    bucket_start TIMESTAMP WITH TIME ZONE PRIMARY KEY,
+    new_users INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS wallet_pool_snapshots (
+    id SERIAL PRIMARY KEY,
+    active_wallets INTEGER NOT NULL DEFAULT 0,
+    energy_available BIGINT NOT NULL DEFAULT 0,
+    energy_limit BIGINT NOT NULL DEFAULT 0,
+    trx_balance DECIMAL(18,6) NOT NULL DEFAULT 0,
+    captured_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS stats_watermarks (
+    name VARCHAR(50) PRIMARY KEY,
+    rolled_up_to TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
 -- 创建索引
 CREATE INDEX IF NOT EXISTS idx_orders_user_id ON orders(user_id);
 CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
 CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders(created_at);
+CREATE INDEX IF NOT EXISTS idx_orders_status_lease ON orders(status, lease_expires_at);
+CREATE INDEX IF NOT EXISTS idx_orders_status_expires_at ON orders(status, expires_at);
+CREATE INDEX IF NOT EXISTS idx_orders_status_created_at ON orders(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_balance_transactions_reference_id ON balance_transactions(reference_id);
+CREATE INDEX IF NOT EXISTS idx_orders_archive_user_created_at_id ON orders_archive(user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_balance_transactions_archive_user_created_at_id ON balance_transactions_archive(user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_orders_archive_created_at ON orders_archive(created_at);
+CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at);
 CREATE INDEX IF NOT EXISTS idx_user_wallets_user_id ON user_wallets(user_id);
 CREATE INDEX IF NOT EXISTS idx_balance_transactions_user_id ON balance_transactions(user_id);
+CREATE INDEX IF NOT EXISTS idx_order_outbox_pending ON order_outbox(id) WHERE dispatched_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_orders_created_at_id ON orders(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_orders_user_created_at_id ON orders(user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_balance_transactions_created_at_id ON balance_transactions(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_balance_transactions_user_created_at_id ON balance_transactions(user_id, created_at, id);
 
 -- 插入测试数据 (可选)
 INSERT INTO users (id, username, first_name, balance_trx) 
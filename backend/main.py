@@ -8,8 +8,12 @@ import encoding_fix  # 必须在最开始导入，修复Windows编码问题
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from app.api import orders, users, wallets, supplier_wallets
+from app.api import orders, users, wallets, supplier_wallets, balance_transactions, stats, quotes
 from app.database import engine, Base
+from app.services.outbox_service import outbox_relay
+from app.services.price_snapshot_service import price_snapshot_publisher
+from app.services.exchange_rate_service import exchange_rate_refresher
+from app.utils.balance_events import install_balance_events
 import logging
 
 # 配置日志
@@ -21,6 +25,9 @@ logging.basicConfig(
 # 创建数据库表
 Base.metadata.create_all(bind=engine)
 
+# 余额流水提交后通知机器人使余额缓存失效
+install_balance_events()
+
 app = FastAPI(
     title="TRON Energy Backend API",
     description="TRON能量助手后台管理系统API",
@@ -34,6 +41,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # 游标分页的下一页游标
 )
 
 # 注册API路由
@@ -41,6 +49,39 @@ app.include_router(orders.router, prefix="/api/orders", tags=["orders"])
 app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(wallets.router, prefix="/api/wallets", tags=["wallets"])
 app.include_router(supplier_wallets.router, prefix="/api/supplier-wallets", tags=["supplier-wallets"])
+app.include_router(balance_transactions.router, prefix="/api/balance-transactions", tags=["balance-transactions"])
+app.include_router(stats.router, prefix="/api/stats", tags=["stats"])
+app.include_router(quotes.router, prefix="/api/quotes", tags=["quotes"])
+
+@app.on_event("startup")
+async def start_outbox_relay():
+    """启动订单发件箱中继"""
+    outbox_relay.start()
+
+@app.on_event("startup")
+async def start_price_snapshot_publisher():
+    """启动价格快照发布器（仅在启用动态定价时按钱包池调整价格）"""
+    price_snapshot_publisher.start()
+
+@app.on_event("startup")
+async def start_exchange_rate_refresher():
+    """启动汇率刷新器"""
+    exchange_rate_refresher.start()
+
+@app.on_event("shutdown")
+async def stop_outbox_relay():
+    """停止订单发件箱中继"""
+    outbox_relay.stop()
+
+@app.on_event("shutdown")
+async def stop_price_snapshot_publisher():
+    """停止价格快照发布器"""
+    price_snapshot_publisher.stop()
+
+@app.on_event("shutdown")
+async def stop_exchange_rate_refresher():
+    """停止汇率刷新器"""
+    exchange_rate_refresher.stop()
 
 @app.get("/")
 async def root():
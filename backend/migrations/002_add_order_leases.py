@@ -0,0 +1,26 @@
+"""add order claim leases
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # 订单认领租约：多个处理器并行认领订单
+    op.add_column('orders', sa.Column('lease_owner', sa.String(length=64), nullable=True))
+    op.add_column('orders', sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index('idx_orders_status_lease', 'orders', ['status', 'lease_expires_at'])
+
+def downgrade():
+    op.drop_index('idx_orders_status_lease')
+    op.drop_column('orders', 'lease_expires_at')
+    op.drop_column('orders', 'lease_owner')
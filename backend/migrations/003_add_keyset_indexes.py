@@ -0,0 +1,28 @@
+"""add keyset pagination indexes
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # 游标分页按 (created_at, id) 倒序扫描
+    op.create_index('idx_orders_created_at_id', 'orders', ['created_at', 'id'])
+    op.create_index('idx_orders_user_created_at_id', 'orders', ['user_id', 'created_at', 'id'])
+    op.create_index('idx_balance_transactions_created_at_id', 'balance_transactions', ['created_at', 'id'])
+    op.create_index('idx_balance_transactions_user_created_at_id', 'balance_transactions', ['user_id', 'created_at', 'id'])
+
+def downgrade():
+    op.drop_index('idx_balance_transactions_user_created_at_id')
+    op.drop_index('idx_balance_transactions_created_at_id')
+    op.drop_index('idx_orders_user_created_at_id')
+    op.drop_index('idx_orders_created_at_id')
@@ -0,0 +1,37 @@
+"""create order outbox
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # 订单派发发件箱
+    op.create_table('order_outbox',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('order_id', sa.String(length=36), nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('dispatched_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # 只索引未派发记录，发件箱表增长不影响中继扫描
+    op.create_index(
+        'idx_order_outbox_pending', 'order_outbox', ['id'],
+        postgresql_where=sa.text('dispatched_at IS NULL')
+    )
+
+def downgrade():
+    op.drop_index('idx_order_outbox_pending')
+    op.drop_table('order_outbox')
@@ -0,0 +1,22 @@
+"""add order expiry index
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # 过期清理按 (status, expires_at) 范围扫描
+    op.create_index('idx_orders_status_expires_at', 'orders', ['status', 'expires_at'])
+
+def downgrade():
+    op.drop_index('idx_orders_status_expires_at')
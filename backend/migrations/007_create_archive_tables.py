@@ -0,0 +1,65 @@
+"""create archive tables
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # 订单归档表
+    op.create_table('orders_archive',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=True),
+        sa.Column('receive_address', sa.String(length=42), nullable=False),
+        sa.Column('energy_amount', sa.Integer(), nullable=False),
+        sa.Column('duration_hours', sa.Integer(), nullable=False),
+        sa.Column('cost_trx', sa.DECIMAL(precision=18, scale=6), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('supplier_wallet', sa.String(length=42), nullable=True),
+        sa.Column('tx_hash', sa.String(length=66), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('retry_count', sa.Integer(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # 余额变动归档表
+    op.create_table('balance_transactions_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=True),
+        sa.Column('transaction_type', sa.String(length=20), nullable=False),
+        sa.Column('amount', sa.DECIMAL(precision=18, scale=6), nullable=False),
+        sa.Column('balance_after', sa.DECIMAL(precision=18, scale=6), nullable=False),
+        sa.Column('reference_id', sa.String(length=255), nullable=True),
+        sa.Column('description', sa.String(length=500), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # 用户历史查询按 (user_id, created_at, id) 游标翻页
+    op.create_index('idx_orders_archive_user_created_at_id', 'orders_archive', ['user_id', 'created_at', 'id'])
+    op.create_index('idx_balance_transactions_archive_user_created_at_id', 'balance_transactions_archive', ['user_id', 'created_at', 'id'])
+    # 归档任务按状态与创建时间挑选订单
+    op.create_index('idx_orders_status_created_at', 'orders', ['status', 'created_at'])
+    op.create_index('idx_balance_transactions_reference_id', 'balance_transactions', ['reference_id'])
+
+def downgrade():
+    op.drop_index('idx_balance_transactions_reference_id')
+    op.drop_index('idx_orders_status_created_at')
+    op.drop_index('idx_balance_transactions_archive_user_created_at_id')
+    op.drop_index('idx_orders_archive_user_created_at_id')
+    op.drop_table('balance_transactions_archive')
+    op.drop_table('orders_archive')
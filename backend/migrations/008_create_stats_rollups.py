@@ -0,0 +1,59 @@
+"""create stats rollups
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # 订单小时汇总
+    op.create_table('order_stats_hourly',
+        sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('order_count', sa.Integer(), nullable=False),
+        sa.Column('energy_amount', sa.BigInteger(), nullable=False),
+        sa.Column('cost_trx', sa.DECIMAL(precision=18, scale=6), nullable=False),
+        sa.PrimaryKeyConstraint('bucket_start', 'status')
+    )
+    # 新增用户小时汇总
+    op.create_table('user_stats_hourly',
+        sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('new_users', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('bucket_start')
+    )
+    # 钱包池快照
+    op.create_table('wallet_pool_snapshots',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('active_wallets', sa.Integer(), nullable=False),
+        sa.Column('energy_available', sa.BigInteger(), nullable=False),
+        sa.Column('energy_limit', sa.BigInteger(), nullable=False),
+        sa.Column('trx_balance', sa.DECIMAL(precision=18, scale=6), nullable=False),
+        sa.Column('captured_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # 汇总高水位
+    op.create_table('stats_watermarks',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('rolled_up_to', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    # 汇总任务按创建时间范围扫描
+    op.create_index('idx_orders_archive_created_at', 'orders_archive', ['created_at'])
+    op.create_index('idx_users_created_at', 'users', ['created_at'])
+
+def downgrade():
+    op.drop_index('idx_users_created_at')
+    op.drop_index('idx_orders_archive_created_at')
+    op.drop_table('stats_watermarks')
+    op.drop_table('wallet_pool_snapshots')
+    op.drop_table('user_stats_hourly')
+    op.drop_table('order_stats_hourly')
@@ -0,0 +1,24 @@
+"""add deposit exchange rate
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # USDT充值入账所用的汇率快照
+    op.add_column('balance_transactions', sa.Column('exchange_rate', sa.DECIMAL(precision=18, scale=8), nullable=True))
+    op.add_column('balance_transactions', sa.Column('exchange_rate_version', sa.String(length=20), nullable=True))
+
+def downgrade():
+    op.drop_column('balance_transactions', 'exchange_rate_version')
+    op.drop_column('balance_transactions', 'exchange_rate')
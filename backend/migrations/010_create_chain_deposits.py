@@ -0,0 +1,68 @@
+"""create chain deposits
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+def _check_duplicate_deposits():
+    """唯一索引创建前检查重复入账的充值记录，有重复时在任何改动之前终止并列出需要对账的交易"""
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT reference_id, COUNT(*) FROM balance_transactions "
+        "WHERE transaction_type = 'deposit' AND reference_id IS NOT NULL "
+        "GROUP BY reference_id HAVING COUNT(*) > 1"
+    )).fetchall()
+    if duplicates:
+        listing = "\n".join(f"  {reference_id}: {count} 条" for reference_id, count in duplicates)
+        raise RuntimeError(
+            f"balance_transactions 中有 {len(duplicates)} 笔充值交易被重复入账，无法创建唯一索引:\n{listing}\n"
+            "请先按 docs/developer/development.md「链上充值监听」中的步骤对账（冲正多入账的余额并删除重复记录）后重新执行迁移"
+        )
+
+def upgrade():
+    _check_duplicate_deposits()
+    # 充值监听器识别到的链上转入交易
+    op.create_table('chain_deposits',
+        sa.Column('tx_hash', sa.String(length=66), nullable=False),
+        sa.Column('currency', sa.String(length=10), nullable=False),
+        sa.Column('amount', sa.DECIMAL(precision=18, scale=6), nullable=False),
+        sa.Column('from_address', sa.String(length=42), nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('block_timestamp', sa.BigInteger(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('tx_hash')
+    )
+    # 对账时按状态查询未匹配的充值
+    op.create_index('idx_chain_deposits_status_timestamp', 'chain_deposits', ['status', 'block_timestamp'])
+    # 监听进度
+    op.create_table('chain_cursors',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('last_timestamp', sa.BigInteger(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+    )
+    # 按发送地址匹配用户
+    op.create_index('idx_user_wallets_wallet_address', 'user_wallets', ['wallet_address'])
+    # 同一笔充值交易只能入账一次（手动确认接口与充值监听并发时由数据库保证）
+    op.create_index(
+        'uq_balance_transactions_deposit_reference', 'balance_transactions', ['reference_id'], unique=True,
+        postgresql_where=sa.text("transaction_type = 'deposit'")
+    )
+
+def downgrade():
+    op.drop_index('uq_balance_transactions_deposit_reference')
+    op.drop_index('idx_user_wallets_wallet_address')
+    op.drop_table('chain_cursors')
+    op.drop_index('idx_chain_deposits_status_timestamp')
+    op.drop_table('chain_deposits')
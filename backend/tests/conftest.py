@@ -0,0 +1,24 @@
+"""
+测试公共夹具
+"""
+import pytest
+from sqlalchemy.orm import sessionmaker
+from app.database import Base, create_db_engine
+import app.models  # noqa: F401  注册所有模型
+
+@pytest.fixture
+def db_engine(tmp_path):
+    """基于临时SQLite文件的数据库引擎"""
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def db_session(db_engine):
+    """数据库会话"""
+    session = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)()
+    try:
+        yield session
+    finally:
+        session.close()
@@ -0,0 +1,58 @@
+"""
+订单归档测试
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+from app.models import BalanceTransaction, BalanceTransactionArchive, Order, OrderArchive, User
+from app.services.archive_service import ArchiveService
+from app.services.order_service import OrderService
+from app.services.user_service import UserService
+from app.utils.pagination import next_cursor
+
+def _add_order(db, order_id, status, age_days):
+    created_at = datetime.utcnow() - timedelta(days=age_days)
+    db.add(Order(
+        id=order_id, user_id=1, receive_address="T" + "A" * 33,
+        energy_amount=65000, duration_hours=1, cost_trx=Decimal("1"),
+        status=status, created_at=created_at
+    ))
+    db.add(BalanceTransaction(
+        user_id=1, transaction_type="deduct", amount=Decimal("1"),
+        balance_after=Decimal("99"), reference_id=order_id, created_at=created_at
+    ))
+
+def _seed(db):
+    db.add(User(id=1, balance_trx=Decimal("100")))
+    _add_order(db, "old-completed", "completed", 40)
+    _add_order(db, "old-expired", "expired", 35)
+    _add_order(db, "old-pending", "pending", 45)
+    _add_order(db, "recent-completed", "completed", 1)
+    db.commit()
+
+def test_archive_moves_old_terminal_orders(db_session):
+    """测试只归档超过保留期的已结束订单及其余额变动"""
+    _seed(db_session)
+    
+    assert ArchiveService(db_session).archive_orders(older_than_days=30, batch_size=1) == 2
+    
+    assert {order.id for order in db_session.query(Order)} == {"old-pending", "recent-completed"}
+    assert {order.id for order in db_session.query(OrderArchive)} == {"old-completed", "old-expired"}
+    assert db_session.query(BalanceTransaction).count() == 2
+    assert db_session.query(BalanceTransactionArchive).count() == 2
+
+def test_reads_fall_through_to_archive(db_session):
+    """测试订单详情与用户历史透明读取归档数据"""
+    _seed(db_session)
+    ArchiveService(db_session).archive_orders(older_than_days=30)
+    order_service = OrderService(db_session)
+    
+    assert order_service.get_order("old-completed").status == "completed"
+    
+    first_page = order_service.get_user_orders(1, limit=2)
+    second_page = order_service.get_user_orders(1, limit=2, cursor=next_cursor(first_page, 2))
+    assert [order.id for order in first_page + second_page] == [
+        "recent-completed", "old-expired", "old-completed", "old-pending"
+    ]
+    
+    transactions = UserService(db_session).get_balance_transactions(user_id=1)
+    assert len(transactions) == 4
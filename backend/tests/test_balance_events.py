@@ -0,0 +1,48 @@
+"""
+余额变动事件测试
+"""
+import asyncio
+from decimal import Decimal
+import pytest
+from app.models import BalanceTransaction, User
+from app.services.user_service import UserService
+from app.utils import balance_events
+
+class RecordingPublisher:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, user_ids):
+        self.published.append(set(user_ids))
+        return True
+
+@pytest.fixture
+def publisher(monkeypatch):
+    recorder = RecordingPublisher()
+    monkeypatch.setattr(balance_events, "_publisher", None)
+    assert balance_events.install_balance_events(recorder)
+    return recorder
+
+@pytest.fixture
+def user(db_session):
+    db_session.add(User(id=1, balance_trx=Decimal("100")))
+    db_session.commit()
+
+def test_publish_after_commit(db_session, user, publisher):
+    """测试扣款与充值提交后发布受影响的用户"""
+    service = UserService(db_session)
+    assert service.deduct_balance(1, Decimal("10"), "order-1")
+    assert asyncio.run(service.confirm_deposit(2, "tx-1", Decimal("5"), "TRX"))
+
+    assert publisher.published == [{1}, {2}]
+
+def test_rollback_not_published(db_session, user, publisher):
+    """测试回滚的余额变动不发布"""
+    db_session.add(BalanceTransaction(
+        user_id=1, transaction_type="deposit", amount=Decimal("1"), balance_after=Decimal("101")
+    ))
+    db_session.flush()
+    db_session.rollback()
+    db_session.commit()
+
+    assert publisher.published == []
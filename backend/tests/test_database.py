@@ -0,0 +1,21 @@
+"""
+数据库引擎配置测试
+"""
+from sqlalchemy import text
+from app.database import create_db_engine, settings
+
+def test_sqlite_engine_pragmas(tmp_path):
+    """测试SQLite引擎启用WAL等PRAGMA"""
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar().lower() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == settings.sqlite_busy_timeout_ms
+    engine.dispose()
+
+def test_sqlite_memory_engine():
+    """测试内存数据库不启用WAL也能正常连接"""
+    engine = create_db_engine("sqlite://")
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+    engine.dispose()
@@ -0,0 +1,136 @@
+"""
+链上充值监听测试
+"""
+import asyncio
+import threading
+from decimal import Decimal
+from sqlalchemy.orm import sessionmaker
+from tronpy.keys import to_hex_address
+import app.services.user_service as user_service_module
+from app.models import BalanceTransaction, ChainCursor, ChainDeposit, User, UserWallet
+from app.services.deposit_watcher import DepositWatcher, TronGridClient
+from exchange_rates import ExchangeRateService
+
+DEPOSIT_ADDRESS = "TYwv7C4Fik2tYuHBwuNSzrnJ4Bw7NukyRb"
+USER_ADDRESS = "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t"
+STRANGER_ADDRESS = "TG3XXyExBkPp9nzdajDZsozEu4BkaSJozs"
+
+def _trx_item(tx_hash: str, sender: str, sun: int, timestamp: int) -> dict:
+    return {
+        "txID": tx_hash, "block_timestamp": timestamp, "ret": [{"contractRet": "SUCCESS"}],
+        "raw_data": {"contract": [{"type": "TransferContract", "parameter": {"value": {
+            "amount": sun, "owner_address": to_hex_address(sender), "to_address": to_hex_address(DEPOSIT_ADDRESS)
+        }}}]}
+    }
+
+def _usdt_item(tx_hash: str, sender: str, value: int, timestamp: int) -> dict:
+    return {
+        "transaction_id": tx_hash, "block_timestamp": timestamp, "type": "Transfer",
+        "from": sender, "to": DEPOSIT_ADDRESS, "value": str(value), "token_info": {"decimals": 6}
+    }
+
+class FakeTronGrid:
+    """按 min_timestamp 过滤、按 limit 分页（fingerprint 为下一页起点）的TronGrid桩"""
+    def __init__(self):
+        self.items = {"trx": [], "usdt": []}
+        self.requests = []
+
+    async def __call__(self, path: str, params: dict) -> dict:
+        stream = "usdt" if path.endswith("trc20") else "trx"
+        self.requests.append((stream, dict(params)))
+        items = [item for item in self.items[stream] if item["block_timestamp"] >= params["min_timestamp"]]
+        start = int(params.get("fingerprint", 0))
+        page = items[start:start + params["limit"]]
+        meta = {"fingerprint": str(start + params["limit"])} if start + params["limit"] < len(items) else {}
+        return {"data": page, "meta": meta}
+
+def _setup(db_session, tmp_path, monkeypatch):
+    db_session.add(User(id=1, balance_trx=Decimal("0")))
+    db_session.add(UserWallet(user_id=1, wallet_address=USER_ADDRESS))
+    db_session.add(ChainCursor(name="deposits:trx", last_timestamp=1000))
+    db_session.add(ChainCursor(name="deposits:usdt", last_timestamp=1000))
+    db_session.commit()
+    rates = ExchangeRateService("static:0.4", path=str(tmp_path / "exchange_rate.json"))
+    monkeypatch.setattr(user_service_module, "exchange_rate_service", rates)
+
+    grid = FakeTronGrid()
+    watcher = DepositWatcher(db_session, TronGridClient(fetch=grid), address=DEPOSIT_ADDRESS, page_size=2)
+    return grid, watcher
+
+def test_deposits_credited_once_from_cursor(db_session, tmp_path, monkeypatch):
+    """测试分页读取新交易，匹配用户入账，游标前进后不重复读取也不重复入账"""
+    grid, watcher = _setup(db_session, tmp_path, monkeypatch)
+    grid.items["trx"] = [
+        _trx_item("a" * 64, USER_ADDRESS, 20000000, 2000),
+        _trx_item("b" * 64, STRANGER_ADDRESS, 50000000, 3000),
+        _trx_item("c" * 64, USER_ADDRESS, 5000000, 4000),
+    ]
+    grid.items["usdt"] = [_usdt_item("d" * 64, USER_ADDRESS, 10000000, 2500)]
+
+    counts = asyncio.run(watcher.poll())
+    assert counts == {"trx": {"credited": 1, "unmatched": 1, "below_minimum": 1}, "usdt": {"credited": 1}}
+    assert db_session.get(User, 1).balance_trx == Decimal("45")  # 20 TRX + 10 USDT / 0.4
+    assert db_session.get(ChainCursor, "deposits:trx").last_timestamp == 4000
+    assert len([request for request in grid.requests if request[0] == "trx"]) == 2  # 两页
+
+    grid.requests.clear()
+    grid.items["trx"].append(_trx_item("e" * 64, USER_ADDRESS, 10000000, 5000))
+    counts = asyncio.run(watcher.poll())
+    assert counts == {"trx": {"credited": 1}, "usdt": {}}
+    assert grid.requests[0][1]["min_timestamp"] == 4000
+    assert db_session.query(BalanceTransaction).count() == 3
+    assert db_session.query(ChainDeposit).filter(ChainDeposit.status == "unmatched").one().from_address == STRANGER_ADDRESS
+
+def test_manually_confirmed_deposit_not_credited_twice(db_session, tmp_path, monkeypatch):
+    """测试已通过接口手动入账的交易标记为重复"""
+    grid, watcher = _setup(db_session, tmp_path, monkeypatch)
+    asyncio.run(user_service_module.UserService(db_session).confirm_deposit(1, "a" * 64, Decimal("20"), "TRX"))
+    grid.items["trx"] = [_trx_item("a" * 64, USER_ADDRESS, 20000000, 2000)]
+
+    assert asyncio.run(watcher.poll_stream("trx")) == {"duplicate": 1}
+    assert db_session.get(User, 1).balance_trx == Decimal("20")
+
+def test_concurrent_manual_confirm_not_credited_twice(db_session, db_engine, tmp_path, monkeypatch):
+    """测试手动确认在监听检查之后、提交之前入账同一交易时，由唯一索引拒绝重复入账"""
+    grid, watcher = _setup(db_session, tmp_path, monkeypatch)
+    rates = user_service_module.exchange_rate_service
+
+    class ManualConfirmDuringCheck:
+        def rate_for_deposit(self):
+            monkeypatch.setattr(user_service_module, "exchange_rate_service", rates)
+            other = sessionmaker(bind=db_engine)()
+            manual = threading.Thread(target=lambda: asyncio.run(
+                user_service_module.UserService(other).confirm_deposit(1, "a" * 64, Decimal("10"), "USDT")
+            ))
+            manual.start()
+            manual.join()
+            other.close()
+            return rates.rate_for_deposit()
+
+    monkeypatch.setattr(user_service_module, "exchange_rate_service", ManualConfirmDuringCheck())
+    grid.items["usdt"] = [_usdt_item("a" * 64, USER_ADDRESS, 10000000, 2000)]
+
+    assert asyncio.run(watcher.poll_stream("usdt")) == {"duplicate": 1}
+    db_session.expire_all()
+    assert db_session.get(User, 1).balance_trx == Decimal("25")
+    assert db_session.query(BalanceTransaction).count() == 1
+    assert db_session.get(ChainDeposit, "a" * 64).status == "duplicate"
+
+def test_cursor_stops_at_failed_deposit(db_session, tmp_path, monkeypatch):
+    """测试入账失败时游标停在失败的交易，恢复后重新处理"""
+    grid, watcher = _setup(db_session, tmp_path, monkeypatch)
+    failing = ExchangeRateService(lambda: (_ for _ in ()).throw(IOError("来源不可用")), path=None)
+    monkeypatch.setattr(user_service_module, "exchange_rate_service", failing)
+    grid.items["usdt"] = [
+        _usdt_item("a" * 64, USER_ADDRESS, 10000000, 2000),
+        _usdt_item("b" * 64, USER_ADDRESS, 10000000, 3000),
+    ]
+
+    assert asyncio.run(watcher.poll_stream("usdt")) == {}
+    assert db_session.get(ChainCursor, "deposits:usdt").last_timestamp == 2000
+    assert db_session.query(ChainDeposit).count() == 0
+
+    monkeypatch.setattr(user_service_module, "exchange_rate_service",
+                        ExchangeRateService("static:0.4", path=str(tmp_path / "exchange_rate.json")))
+    assert asyncio.run(watcher.poll_stream("usdt")) == {"credited": 2}
+    assert db_session.get(User, 1).balance_trx == Decimal("50")
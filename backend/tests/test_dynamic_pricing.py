@@ -0,0 +1,69 @@
+"""
+动态定价价格快照测试
+"""
+import json
+import time
+from decimal import Decimal
+from app.models import SupplierWallet
+from app.services.price_snapshot_service import PriceSnapshotService
+from pricing import DEFAULT_RATES, QuoteEngine, surge_multiplier, write_snapshot
+
+SETTINGS = dict(DEFAULT_RATES["dynamic_pricing"], enabled=True)
+
+def _engine(tmp_path, **dynamic_pricing):
+    rates_path = tmp_path / "pricing_rates.json"
+    rates_path.write_text(json.dumps({"dynamic_pricing": dict(SETTINGS, **dynamic_pricing)}))
+    return QuoteEngine(str(rates_path), reload_interval=0, snapshot_path=str(tmp_path / "pricing_snapshot.json"))
+
+def test_surge_multiplier_curve():
+    """测试利用率到价格系数的分段线性映射、步长取整与上下限"""
+    assert surge_multiplier(0.6, SETTINGS) == Decimal("1")
+    assert surge_multiplier(0.3, SETTINGS) == Decimal("0.95")
+    assert surge_multiplier(0.95, SETTINGS) == Decimal("1.75")
+    assert surge_multiplier(0.95, dict(SETTINGS, max_multiplier="1.5")) == Decimal("1.5")
+    assert surge_multiplier(0.95, DEFAULT_RATES["dynamic_pricing"]) == Decimal("1")
+    assert surge_multiplier(None, SETTINGS) == Decimal("1")
+
+def test_publish_snapshot_from_wallet_pool(db_session, tmp_path):
+    """测试按钱包池剩余能量发布快照，报价按快照系数调整"""
+    db_session.add_all([
+        SupplierWallet(wallet_address="T" + "A" * 33, private_key_encrypted="x", energy_available=5000, energy_limit=50000),
+        SupplierWallet(wallet_address="T" + "B" * 33, private_key_encrypted="x", energy_available=5000, energy_limit=50000),
+        SupplierWallet(wallet_address="T" + "C" * 33, private_key_encrypted="x", energy_available=90000,
+                       energy_limit=90000, is_active=False)
+    ])
+    db_session.commit()
+    engine = _engine(tmp_path)
+    assert engine.quote(135000, "1d") == Decimal("21.60")
+
+    snapshot = PriceSnapshotService(db_session, engine).publish()
+    assert snapshot["utilisation"] == 0.9
+    assert snapshot["multiplier"] == "1.55"
+    assert engine.quote(135000, "1d") == Decimal("33.48")
+    assert engine.matrix.to_dict()["multiplier"] == "1.55"
+
+def test_stale_or_disabled_snapshot_uses_base_price(tmp_path):
+    """测试快照过期或关闭动态定价时按原价报价"""
+    engine = _engine(tmp_path)
+    write_snapshot(engine.snapshot_path, {"multiplier": "1.5", "published_at": time.time() - 3600})
+    assert engine.quote(135000, "1d") == Decimal("21.60")
+
+    write_snapshot(engine.snapshot_path, {"multiplier": "3", "published_at": time.time()})
+    assert engine.quote(135000, "1d") == Decimal("43.20")  # 受 max_multiplier 限制
+
+    disabled = _engine(tmp_path, enabled=False)
+    assert disabled.quote(135000, "1d") == Decimal("21.60")
+
+def test_partial_settings_merge_with_defaults(tmp_path):
+    """测试费率文件只写部分动态定价字段时其余字段使用默认值，无效设置整体拒绝"""
+    rates_path = tmp_path / "pricing_rates.json"
+    rates_path.write_text(json.dumps({"dynamic_pricing": {"enabled": True}}))
+    engine = QuoteEngine(str(rates_path), reload_interval=0, snapshot_path=str(tmp_path / "pricing_snapshot.json"))
+    assert engine.matrix.rates["dynamic_pricing"] == SETTINGS
+    write_snapshot(engine.snapshot_path, {"multiplier": "1.5", "published_at": time.time()})
+    assert engine.quote(135000, "1d") == Decimal("32.40")
+
+    rates_path.write_text(json.dumps({"price_per_energy": "1", "dynamic_pricing": {"step": "0"}}))
+    engine.reload(force=True)
+    assert engine.matrix.rates["dynamic_pricing"] == SETTINGS  # 保留上一版费率
+    assert engine.quote(135000, "1d") == Decimal("32.40")
@@ -0,0 +1,74 @@
+"""
+汇率服务测试
+"""
+import asyncio
+from decimal import Decimal
+import pytest
+import app.services.user_service as user_service_module
+from app.models import BalanceTransaction
+from app.services.user_service import UserService
+from exchange_rates import ExchangeRateService, ExchangeRateUnavailable, load_rate_source
+
+class StubSource:
+    """可修改汇率、记录调用次数的测试来源"""
+    def __init__(self, rate: str):
+        self.rate = Decimal(rate)
+        self.calls = 0
+
+    def __call__(self) -> Decimal:
+        self.calls += 1
+        if self.rate is None:
+            raise IOError("来源不可用")
+        return self.rate
+
+def test_refresh_shares_cached_snapshot(tmp_path):
+    """测试刷新写入缓存文件，其他进程只读缓存；汇率不变时版本号不变"""
+    path = str(tmp_path / "exchange_rate.json")
+    source = StubSource("0.4")
+    backend = ExchangeRateService(source, path=path, reload_interval=0)
+    first = backend.refresh()
+
+    bot_source = StubSource("9")
+    bot = ExchangeRateService(bot_source, path=path, reload_interval=0)
+    assert bot.current() == first
+    assert bot_source.calls == 0
+
+    assert backend.refresh().version == first.version
+    source.rate = Decimal("0.5")
+    assert backend.refresh().version > first.version
+    assert bot.current().usdt_per_trx == Decimal("0.5")
+
+def test_expired_rate_is_not_used_for_deposits(tmp_path):
+    """测试汇率过期后入账前重新刷新，刷新失败时拒绝入账"""
+    source = StubSource("0.4")
+    service = ExchangeRateService(source, path=str(tmp_path / "exchange_rate.json"), ttl=0, reload_interval=0)
+    service.refresh()
+    assert service.rate_for_deposit().usdt_per_trx == Decimal("0.4")
+    assert source.calls == 2
+
+    source.rate = None
+    with pytest.raises(ExchangeRateUnavailable):
+        service.rate_for_deposit()
+    assert service.current().usdt_per_trx == Decimal("0.4")  # 展示仍使用最近的汇率
+
+def test_file_source(tmp_path):
+    """测试从本地JSON文件读取汇率（点号分隔的字段路径）"""
+    source_path = tmp_path / "rates.json"
+    source_path.write_text('{"tron": {"usdt": "0.39"}}')
+    assert load_rate_source(f"file:{source_path}", field="tron.usdt")() == Decimal("0.39")
+    assert load_rate_source("static:0.38826")() == Decimal("0.38826")
+
+def test_usdt_deposit_records_rate_snapshot(db_session, tmp_path, monkeypatch):
+    """测试USDT充值按快照汇率入账并记录汇率与版本"""
+    service = ExchangeRateService(StubSource("0.4"), path=str(tmp_path / "exchange_rate.json"))
+    snapshot = service.refresh()
+    monkeypatch.setattr(user_service_module, "exchange_rate_service", service)
+
+    assert asyncio.run(UserService(db_session).confirm_deposit(1, "a" * 64, Decimal("10"), "USDT"))
+    assert asyncio.run(UserService(db_session).confirm_deposit(1, "b" * 64, Decimal("10"), "TRX"))
+
+    usdt, trx = db_session.query(BalanceTransaction).order_by(BalanceTransaction.id).all()
+    assert usdt.amount == Decimal("25")
+    assert usdt.exchange_rate == Decimal("0.4")
+    assert usdt.exchange_rate_version == snapshot.version
+    assert trx.exchange_rate is None and trx.exchange_rate_version is None
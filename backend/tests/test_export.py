@@ -0,0 +1,47 @@
+"""
+流式导出测试
+"""
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+from app.models import BalanceTransaction, Order, User
+from app.services.export_service import ExportService
+
+def _seed(db):
+    db.add(User(id=1, balance_trx=Decimal("100")))
+    now = datetime.utcnow()
+    for i in range(5):
+        db.add(Order(
+            id=f"order-{i}", user_id=1, receive_address="T" + "A" * 33,
+            energy_amount=65000, duration_hours=1, cost_trx=Decimal("1.5"),
+            status="completed" if i % 2 == 0 else "failed",
+            created_at=now + timedelta(seconds=i)
+        ))
+        db.add(BalanceTransaction(
+            user_id=1, transaction_type="deduct", amount=Decimal("1.5"),
+            balance_after=Decimal("98.5"), reference_id=f"order-{i}",
+            created_at=now + timedelta(seconds=i)
+        ))
+    db.commit()
+
+def test_export_orders_ndjson_in_chunks(db_session):
+    """测试NDJSON按批次输出并按状态筛选"""
+    _seed(db_session)
+    chunks = list(ExportService(db_session, chunk_size=2).iter_orders("ndjson", status="completed"))
+    
+    rows = [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+    assert [row["id"] for row in rows] == ["order-0", "order-2", "order-4"]
+    assert rows[0]["cost_trx"] == "1.500000"
+    assert len(chunks) == 2
+
+def test_export_balance_transactions_csv(db_session):
+    """测试CSV导出包含表头且按时间范围筛选"""
+    _seed(db_session)
+    start = db_session.query(BalanceTransaction).order_by(BalanceTransaction.id).all()[3].created_at
+    output = "".join(ExportService(db_session).iter_balance_transactions("csv", user_id=1, start=start))
+    
+    rows = list(csv.reader(io.StringIO(output)))
+    assert rows[0][:3] == ["id", "user_id", "transaction_type"]
+    assert [row[5] for row in rows[1:]] == ["order-3", "order-4"]
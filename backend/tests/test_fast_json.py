@@ -0,0 +1,60 @@
+"""
+列表接口快速输出测试
+"""
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from app.database import get_db
+from app.models import Order, SupplierWallet, User, UserWallet
+from app.utils import fast_json
+
+@pytest.fixture
+def client(db_session):
+    app.dependency_overrides[get_db] = lambda: db_session
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+@pytest.fixture
+def seeded(db_session):
+    db_session.add(User(id=1, balance_trx=Decimal("100")))
+    for i in range(3):
+        db_session.add(Order(
+            id=f"order-{i}", user_id=1, receive_address="T" + "A" * 33,
+            energy_amount=65000, duration_hours=1, cost_trx=Decimal("1.25"),
+            status="completed", tx_hash="ab" * 32,
+            created_at=datetime.utcnow() + timedelta(seconds=i)
+        ))
+    db_session.add(UserWallet(user_id=1, wallet_address="T" + "C" * 33))
+    db_session.add(SupplierWallet(
+        wallet_address="T" + "B" * 33, private_key_encrypted="x", trx_balance=Decimal("10"),
+        energy_available=1000, energy_limit=2000, last_balance_check=datetime.utcnow()
+    ))
+    db_session.commit()
+
+def _get_both(client, monkeypatch, url):
+    monkeypatch.setattr(fast_json, "FAST_JSON_RESPONSES", False)
+    slow = client.get(url)
+    monkeypatch.setattr(fast_json, "FAST_JSON_RESPONSES", True)
+    fast = client.get(url)
+    return slow, fast
+
+@pytest.mark.parametrize("url", [
+    "/api/orders/?limit=2",
+    "/api/orders/?user_id=1&limit=2",
+    "/api/wallets/users/1",
+    "/api/supplier-wallets/",
+])
+def test_fast_path_matches_response_model(client, seeded, monkeypatch, url):
+    """测试快速输出与原响应模型输出一致（含分页游标）"""
+    slow, fast = _get_both(client, monkeypatch, url)
+    
+    assert fast.status_code == slow.status_code == 200
+    assert fast.json() == slow.json()
+    assert fast.headers.get("X-Next-Cursor") == slow.headers.get("X-Next-Cursor")
+
+def test_dumps_formats_like_pydantic():
+    """测试金额输出为字符串、UTC时间以Z结尾"""
+    payload = {"amount": Decimal("1.500000"), "at": datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)}
+    assert fast_json.dumps(payload) == b'{"amount":"1.500000","at":"2026-01-02T03:04:05Z"}'
@@ -0,0 +1,64 @@
+"""
+下单幂等键测试
+"""
+import asyncio
+from decimal import Decimal
+import pytest
+from app.models import IdempotencyKey, Order, OrderOutbox, User
+from app.schemas import CreateOrderRequest
+from app.services.order_service import OrderService
+from app.services.idempotency_service import IdempotencyConflictError
+from app.services.quote_service import StaleQuoteError, quote_service
+
+def _request(energy_amount: int = 65000, quoted_cost: Decimal = None):
+    return CreateOrderRequest(
+        user_id=1, energy_amount=energy_amount, duration="1h", receive_address="T" + "A" * 33,
+        quoted_cost=quoted_cost
+    )
+
+@pytest.fixture
+def user(db_session):
+    db_session.add(User(id=1, balance_trx=Decimal("100")))
+    db_session.commit()
+
+def test_retry_returns_same_order(db_session, user):
+    """测试同一幂等键重试只创建一个订单"""
+    service = OrderService(db_session)
+    first = asyncio.run(service.create_order(_request(), idempotency_key="buy-1"))
+    second = asyncio.run(service.create_order(_request(), idempotency_key="buy-1"))
+    
+    assert second.id == first.id
+    assert db_session.query(Order).count() == 1
+    assert db_session.query(OrderOutbox).count() == 1
+    assert db_session.query(IdempotencyKey).one().order_id == first.id
+
+def test_key_reused_with_different_request(db_session, user):
+    """测试同一幂等键用于不同请求时报冲突"""
+    service = OrderService(db_session)
+    asyncio.run(service.create_order(_request(), idempotency_key="buy-1"))
+    
+    with pytest.raises(IdempotencyConflictError):
+        asyncio.run(service.create_order(_request(energy_amount=131000), idempotency_key="buy-1"))
+    assert db_session.query(Order).count() == 1
+
+def test_without_key_creates_new_orders(db_session, user):
+    """测试不带幂等键时每次都创建新订单"""
+    service = OrderService(db_session)
+    first = asyncio.run(service.create_order(_request()))
+    second = asyncio.run(service.create_order(_request()))
+    
+    assert first.id != second.id
+    assert db_session.query(IdempotencyKey).count() == 0
+
+def test_stale_quote_rejected(db_session, user):
+    """测试展示费用与当前报价不一致时拒绝下单；报价刷新后同一幂等键的重试返回首次创建的订单"""
+    service = OrderService(db_session)
+    cost = quote_service.quote(65000, "1h")
+    with pytest.raises(StaleQuoteError):
+        asyncio.run(service.create_order(_request(quoted_cost=cost + 1), idempotency_key="buy-1"))
+    assert db_session.query(Order).count() == 0
+
+    first = asyncio.run(service.create_order(_request(quoted_cost=cost), idempotency_key="buy-1"))
+    retry = asyncio.run(service.create_order(_request(quoted_cost=cost + 1), idempotency_key="buy-1"))
+    assert retry.id == first.id
+    assert db_session.query(Order).count() == 1
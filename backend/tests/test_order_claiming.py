@@ -0,0 +1,100 @@
+"""
+订单认领测试
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy.orm import sessionmaker
+from app.models import BalanceTransaction, Order, User
+from app.services.tron_service import TronTransactionService
+
+def _add_orders(db, count, **kwargs):
+    db.add(User(id=1, balance_trx=Decimal("100")))
+    for i in range(count):
+        db.add(Order(
+            id=f"order-{i}",
+            user_id=1,
+            receive_address="T" + "A" * 33,
+            energy_amount=65000,
+            duration_hours=1,
+            cost_trx=Decimal("1"),
+            created_at=datetime.utcnow() + timedelta(seconds=i),
+            **kwargs
+        ))
+    db.commit()
+
+def test_claim_orders_is_exclusive(db_engine, db_session):
+    """测试两个处理器不会认领到同一订单"""
+    _add_orders(db_session, 5, status="pending")
+    other_session = sessionmaker(bind=db_engine)()
+    
+    worker_a = TronTransactionService(db_session, worker_id="worker-a")
+    worker_b = TronTransactionService(other_session, worker_id="worker-b")
+    
+    claimed_a = worker_a.claim_orders(limit=3)
+    claimed_b = worker_b.claim_orders(limit=3)
+    other_session.close()
+    
+    assert claimed_a == ["order-0", "order-1", "order-2"]
+    assert claimed_b == ["order-3", "order-4"]
+    
+    order = db_session.query(Order).filter(Order.id == "order-0").first()
+    assert order.status == "processing"
+    assert order.lease_owner == "worker-a"
+
+def test_expired_lease_is_reclaimed(db_session):
+    """测试租约过期的订单会被重新认领"""
+    _add_orders(
+        db_session, 1,
+        status="processing",
+        lease_owner="crashed-worker",
+        lease_expires_at=datetime.utcnow() - timedelta(seconds=1)
+    )
+    
+    service = TronTransactionService(db_session, worker_id="worker-a")
+    assert service.claim_orders() == ["order-0"]
+    assert service.claim_orders() == []
+
+def test_claim_order_respects_active_lease(db_session):
+    """测试有效租约期内其他处理器无法认领"""
+    _add_orders(
+        db_session, 1,
+        status="processing",
+        lease_owner="worker-a",
+        lease_expires_at=datetime.utcnow() + timedelta(minutes=5)
+    )
+    
+    assert not TronTransactionService(db_session, worker_id="worker-b").claim_order("order-0")
+    assert TronTransactionService(db_session, worker_id="worker-a").claim_order("order-0")
+
+def test_expire_overdue_orders_in_bulk(db_session):
+    """测试批量过期清理只处理已过期订单，并对已扣款订单退款"""
+    overdue = datetime.utcnow() - timedelta(minutes=1)
+    _add_orders(db_session, 3, status="pending", expires_at=overdue)
+    db_session.add(Order(
+        id="stale-charged", user_id=1, receive_address="T" + "A" * 33,
+        energy_amount=65000, duration_hours=1, cost_trx=Decimal("2"),
+        status="processing", lease_owner="crashed-worker",
+        lease_expires_at=overdue, expires_at=overdue
+    ))
+    db_session.add(Order(
+        id="live", user_id=1, receive_address="T" + "A" * 33,
+        energy_amount=65000, duration_hours=1, cost_trx=Decimal("1"),
+        status="pending", expires_at=datetime.utcnow() + timedelta(minutes=30)
+    ))
+    db_session.add(BalanceTransaction(
+        user_id=1, transaction_type="deduct", amount=Decimal("2"),
+        balance_after=Decimal("98"), reference_id="stale-charged"
+    ))
+    db_session.query(User).filter(User.id == 1).update({"balance_trx": Decimal("98")})
+    db_session.commit()
+    
+    service = TronTransactionService(db_session, worker_id="sweeper")
+    assert service.expire_overdue_orders() == 4
+    assert service.expire_overdue_orders() == 0
+    
+    assert db_session.query(Order).filter(Order.status == "expired").count() == 4
+    assert db_session.query(User).filter(User.id == 1).one().balance_trx == Decimal("100")
+    assert not service.user_service.is_order_charged("stale-charged")
+    
+    # 认领批次只包含未过期订单
+    assert service.claim_orders() == ["live"]
@@ -0,0 +1,49 @@
+"""
+新订单唤醒信号测试
+"""
+import asyncio
+import socket
+from app.models import User
+from app.utils import order_signal
+from app.utils.order_signal import OrderWakeupListener, publish_new_order
+
+def _free_udp_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def test_listener_wakes_after_commit(db_session, monkeypatch):
+    """测试SQLite下订单提交后处理器被唤醒，未提交时不唤醒"""
+    port = _free_udp_port()
+    monkeypatch.setattr(order_signal, "ORDER_WAKEUP_PORT", port)
+    
+    async def scenario():
+        listener = OrderWakeupListener(database_url="sqlite://", port=port)
+        assert await listener.start()
+        try:
+            publish_new_order(db_session, "order-1")
+            assert not await listener.wait(0.2)
+            
+            db_session.commit()
+            assert await listener.wait(2)
+        finally:
+            listener.close()
+    
+    asyncio.run(scenario())
+
+def test_rolled_back_order_not_signalled(db_session, monkeypatch):
+    """测试回滚的订单不会在之后无关的提交中发送唤醒"""
+    sent = []
+    monkeypatch.setattr(order_signal, "_send_datagram", sent.append)
+
+    db_session.add(User(id=1))  # 与订单在同一事务中
+    publish_new_order(db_session, "order-1")
+    db_session.rollback()
+    db_session.commit()
+    assert sent == []
+
+    publish_new_order(db_session, "order-2")
+    publish_new_order(db_session, "order-3")
+    db_session.commit()
+    db_session.commit()
+    assert sent == ["order-2", "order-3"]
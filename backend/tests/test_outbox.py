@@ -0,0 +1,56 @@
+"""
+订单发件箱测试
+"""
+import asyncio
+from decimal import Decimal
+from app.models import Order, OrderOutbox, User
+from app.schemas import CreateOrderRequest
+from app.services.order_service import OrderService
+from app.services.outbox_service import OutboxService
+
+class RecordingDispatcher:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.batches = []
+    
+    def dispatch(self, order_ids):
+        if self.fail:
+            raise ConnectionError("broker unavailable")
+        self.batches.append(list(order_ids))
+
+def _create_order(db):
+    db.add(User(id=1, balance_trx=Decimal("100")))
+    db.commit()
+    request = CreateOrderRequest(
+        user_id=1, energy_amount=65000, duration="1h", receive_address="T" + "A" * 33
+    )
+    return asyncio.run(OrderService(db).create_order(request))
+
+def test_create_order_writes_outbox(db_session):
+    """测试下单时写入发件箱记录"""
+    order = _create_order(db_session)
+    
+    event = db_session.query(OrderOutbox).one()
+    assert event.order_id == order.id
+    assert event.dispatched_at is None
+
+def test_drain_dispatches_in_batches(db_session):
+    """测试中继分批派发并标记已派发"""
+    order = _create_order(db_session)
+    dispatcher = RecordingDispatcher()
+    
+    assert OutboxService(db_session, dispatcher=dispatcher).drain() == 1
+    assert dispatcher.batches == [[order.id]]
+    assert db_session.query(OrderOutbox).one().dispatched_at is not None
+    assert OutboxService(db_session, dispatcher=dispatcher).drain() == 0
+
+def test_drain_keeps_events_on_failure(db_session):
+    """测试派发失败时保留记录等待重试"""
+    _create_order(db_session)
+    
+    assert OutboxService(db_session, dispatcher=RecordingDispatcher(fail=True)).drain() == 0
+    event = db_session.query(OrderOutbox).one()
+    assert event.dispatched_at is None
+    assert event.attempts == 1
+    assert "broker unavailable" in event.last_error
+    assert db_session.query(Order).one().status == "pending"
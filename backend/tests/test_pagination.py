@@ -0,0 +1,67 @@
+"""
+游标分页测试
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+import pytest
+from app.models import Order, User, BalanceTransaction
+from app.services.order_service import OrderService
+from app.services.user_service import UserService
+from app.utils.pagination import encode_cursor, decode_cursor, next_cursor
+
+def test_cursor_roundtrip():
+    """测试游标编码解码"""
+    created_at = datetime(2026, 1, 2, 3, 4, 5, 678)
+    assert decode_cursor(encode_cursor(created_at, "abc")) == (created_at, "abc")
+    
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+def test_order_keyset_pages(db_session):
+    """测试订单游标分页不重不漏（包括created_at相同的订单）"""
+    db_session.add(User(id=1, balance_trx=Decimal("0")))
+    base = datetime(2026, 1, 1)
+    for i in range(7):
+        db_session.add(Order(
+            id=f"order-{i}",
+            user_id=1,
+            receive_address="T" + "A" * 33,
+            energy_amount=65000,
+            duration_hours=1,
+            cost_trx=Decimal("1"),
+            created_at=base + timedelta(seconds=i // 2)
+        ))
+    db_session.commit()
+    
+    service = OrderService(db_session)
+    seen, cursor = [], None
+    while True:
+        page = service.get_all_orders(limit=3, cursor=cursor)
+        seen.extend(order.id for order in page)
+        cursor = next_cursor(page, 3)
+        if not cursor:
+            break
+    
+    assert seen == [f"order-{i}" for i in range(6, -1, -1)]
+    assert [o.id for o in service.get_user_orders(1, limit=2)] == ["order-6", "order-5"]
+
+def test_balance_transaction_listing(db_session):
+    """测试余额变动记录按用户分页"""
+    for user_id in (1, 2):
+        db_session.add(User(id=user_id, balance_trx=Decimal("0")))
+    for i in range(5):
+        db_session.add(BalanceTransaction(
+            user_id=1 if i % 2 == 0 else 2,
+            transaction_type="deposit",
+            amount=Decimal("10"),
+            balance_after=Decimal("10") * (i + 1),
+            reference_id=f"tx-{i}"
+        ))
+    db_session.commit()
+    
+    service = UserService(db_session)
+    first = service.get_balance_transactions(user_id=1, limit=2)
+    second = service.get_balance_transactions(user_id=1, limit=2, cursor=next_cursor(first, 2))
+    
+    assert [tx.reference_id for tx in first] == ["tx-4", "tx-2"]
+    assert [tx.reference_id for tx in second] == ["tx-0"]
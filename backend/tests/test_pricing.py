@@ -0,0 +1,61 @@
+"""
+统一定价引擎测试
+"""
+import json
+import os
+from decimal import Decimal
+from fastapi.testclient import TestClient
+from main import app
+from pricing import DEFAULT_RATES, QuoteEngine, QuoteMatrix
+from app.services.order_service import OrderService
+
+client = TestClient(app)
+
+def test_matrix_matches_displayed_prices():
+    """测试标准档位报价与机器人原先展示的价格一致，后端扣费使用同一报价"""
+    matrix = QuoteMatrix(dict(DEFAULT_RATES))
+    assert matrix.quote(65000, "1h") == Decimal("0.43")
+    assert matrix.quote(135000, "1d") == Decimal("21.60")
+    assert matrix.quote(1000000, "14d") == Decimal("2240.00")
+    assert OrderService(None)._calculate_cost(135000, "1d") == Decimal("21.60")
+
+def test_custom_amount_interpolation():
+    """测试自定义数量按相邻档位的单价插值"""
+    rates = dict(DEFAULT_RATES, overrides={"1d": {"135000": "20", "270000": "36"}})
+    matrix = QuoteMatrix(rates)
+    assert matrix.quote(135000, "1d") == Decimal("20.00")
+    # 单价在 20/135000 与 36/270000 之间线性变化
+    expected = (Decimal(20) / 135000 + (Decimal(36) / 270000 - Decimal(20) / 135000) / 2) * 202500
+    assert matrix.quote(202500, "1d") == expected.quantize(Decimal("0.01"))
+    # 线性费率下插值结果与公式一致
+    assert QuoteMatrix(dict(DEFAULT_RATES)).quote(100000, "1d") == Decimal("16.00")
+
+def test_engine_hot_reload(tmp_path):
+    """测试费率文件修改后重新生成报价矩阵，文件有误时保留当前费率"""
+    path = tmp_path / "pricing_rates.json"
+    engine = QuoteEngine(str(path), reload_interval=0)
+    default_version = engine.version
+    assert engine.quote("65K", "1d") == Decimal("10.40")
+
+    path.write_text(json.dumps({"market_multiplier": "10"}))
+    os.utime(path, ns=(1, 1))
+    assert engine.quote("65K", "1d") == Decimal("5.20")
+    assert engine.version != default_version
+
+    path.write_text("{invalid")
+    os.utime(path, ns=(2, 2))
+    assert engine.quote("65K", "1d") == Decimal("5.20")
+
+def test_quotes_endpoint():
+    """测试报价矩阵接口与条件请求"""
+    response = client.get("/api/quotes/")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["quotes"]["1d"]["135000"] == "21.60"
+    etag = response.headers["ETag"]
+    assert etag == f'"{data["version"]}"'
+
+    assert client.get("/api/quotes/", headers={"If-None-Match": etag}).status_code == 304
+    quote = client.get("/api/quotes/quote", params={"energy_amount": 100000, "duration": "1d"}).json()
+    assert quote["cost_trx"] == "16.00"
+    assert client.get("/api/quotes/quote", params={"energy_amount": 100000, "duration": "2d"}).status_code == 400
@@ -0,0 +1,58 @@
+"""
+统计汇总测试
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+from app.models import Order, OrderStatsHourly, StatsWatermark, SupplierWallet, User
+from app.services.stats_service import StatsService, floor_hour
+
+def _add_order(db, order_id, status, created_at, cost="1"):
+    db.add(Order(
+        id=order_id, user_id=1, receive_address="T" + "A" * 33,
+        energy_amount=65000, duration_hours=1, cost_trx=Decimal(cost),
+        status=status, created_at=created_at
+    ))
+
+def _seed(db):
+    now = datetime.utcnow()
+    db.add(User(id=1, balance_trx=Decimal("100")))
+    db.add(SupplierWallet(
+        wallet_address="T" + "B" * 33, private_key_encrypted="x",
+        energy_available=25000, energy_limit=100000, is_active=True
+    ))
+    _add_order(db, "old-completed", "completed", now - timedelta(hours=5), cost="2")
+    _add_order(db, "old-failed", "failed", now - timedelta(hours=5))
+    _add_order(db, "new-completed", "completed", now)
+    db.commit()
+
+def test_roll_up_is_incremental(db_session):
+    """测试汇总从高水位增量推进，不重复汇总"""
+    _seed(db_session)
+    service = StatsService(db_session)
+    
+    assert service.roll_up(settle_minutes=60) > 0
+    assert service.roll_up(settle_minutes=60) == 0
+    
+    rows = {row.status: row.order_count for row in db_session.query(OrderStatsHourly)}
+    assert rows == {"completed": 1, "failed": 1}
+    mark = db_session.query(StatsWatermark).filter(StatsWatermark.name == "orders").one()
+    assert mark.rolled_up_to == floor_hour(datetime.utcnow() - timedelta(minutes=60))
+
+def test_stats_combine_rollups_with_recent_orders(db_session):
+    """测试统计结果合并汇总表与高水位之后的新订单"""
+    _seed(db_session)
+    service = StatsService(db_session)
+    service.roll_up(settle_minutes=60)
+    service.snapshot_wallet_pool()
+    
+    stats = service.get_stats(days=7)
+    
+    assert stats.totals.orders == 3
+    assert stats.totals.completed == 2
+    assert stats.totals.revenue_trx == Decimal("3")
+    assert stats.totals.energy_delegated == 130000
+    assert stats.totals.success_rate == 66.67
+    assert stats.total_users == 1
+    assert sum(day.orders for day in stats.daily) == 3
+    assert stats.pool.active_wallets == 1
+    assert stats.pool.utilisation == 0.75
@@ -1,16 +1,25 @@
 from celery import Celery
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.database import settings
+from celery.signals import worker_process_init, worker_process_shutdown
+from app.database import settings, engine, SessionLocal
 from app.services.tron_service import TronTransactionService
+from app.services.outbox_service import OutboxService
+from app.services.archive_service import ArchiveService
+from app.services.stats_service import StatsService
+from app.services.deposit_watcher import DEPOSIT_POLL_INTERVAL, watch_deposits
+from app.utils.task_launcher import CeleryDispatcher
+from app.utils.balance_events import install_balance_events
 import asyncio
 import logging
 import os
+import threading
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 余额流水提交后通知机器人（扣款、退款）
+install_balance_events()
+
 # 创建Celery应用
 celery_app = Celery(
     "tron_worker",
@@ -23,12 +32,33 @@ celery_app.conf.update(
     task_routes={
         'tron_worker.process_orders': {'queue': 'orders'},
         'tron_worker.update_wallets': {'queue': 'wallets'},
+        'tron_worker.relay_outbox': {'queue': 'orders'},
     },
     beat_schedule={
         'process-orders-every-30-seconds': {
             'task': 'tron_worker.process_orders',
             'schedule': 30.0,  # 每30秒执行一次
         },
+        'relay-outbox-every-10-seconds': {
+            'task': 'tron_worker.relay_outbox',
+            'schedule': 10.0,  # 兜底派发API进程未能派发的订单
+        },
+        'expire-orders-every-minute': {
+            'task': 'tron_worker.expire_orders',
+            'schedule': 60.0,  # 批量清理过期订单
+        },
+        'archive-orders-every-hour': {
+            'task': 'tron_worker.archive_orders',
+            'schedule': 3600.0,  # 已结束订单超过保留期后移入归档表
+        },
+        'watch-deposits': {
+            'task': 'tron_worker.watch_deposits',
+            'schedule': DEPOSIT_POLL_INTERVAL,  # 增量读取充值地址的新转入交易并入账
+        },
+        'roll-up-stats-every-5-minutes': {
+            'task': 'tron_worker.roll_up_stats',
+            'schedule': 300.0,  # 增量汇总统计数据并记录钱包池快照
+        },
         'update-wallets-every-5-minutes': {
             'task': 'tron_worker.update_wallets',
             'schedule': 300.0,  # 每5分钟执行一次
@@ -37,22 +67,77 @@ celery_app.conf.update(
     timezone='UTC',
 )
 
-# 数据库连接
-engine = create_engine(settings.database_url)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+class WorkerRuntime:
+    """Worker进程级运行时：常驻事件循环、数据库会话和交易服务，每个进程只初始化一次"""
+    
+    def __init__(self):
+        self.loop = None
+        self.db = None
+        self.tron_service = None
+        self._thread = None
+    
+    def start(self):
+        """启动常驻事件循环并创建交易服务（TRON客户端连接在任务之间复用）"""
+        if self.loop is not None:
+            return
+        
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="worker-event-loop", daemon=True)
+        self._thread.start()
+        
+        self.db = SessionLocal()
+        self.tron_service = TronTransactionService(self.db)
+        logger.info(f"Worker运行时已启动: pid={os.getpid()}")
+    
+    def stop(self):
+        """停止事件循环并释放数据库会话"""
+        if self.loop is None:
+            return
+        
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+        self.loop.close()
+        self.db.close()
+        self.loop = None
+        self.db = None
+        self.tron_service = None
+        self._thread = None
+        logger.info(f"Worker运行时已停止: pid={os.getpid()}")
+    
+    def run(self, coroutine_factory):
+        """将协程提交到常驻事件循环并等待结果
+        
+        coroutine_factory 接收交易服务并返回协程；任务结束后关闭会话，
+        连接归还连接池、会话状态清空，下一个任务拿到的是干净的会话。
+        """
+        if self.loop is None:
+            # solo池或eager模式下不会触发 worker_process_init
+            self.start()
+        
+        future = asyncio.run_coroutine_threadsafe(coroutine_factory(self.tron_service), self.loop)
+        try:
+            return future.result()
+        finally:
+            self.db.close()
+
+runtime = WorkerRuntime()
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """子进程启动：丢弃从父进程继承的数据库连接，并启动运行时"""
+    engine.dispose(close=False)
+    runtime.start()
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    """子进程退出：停止运行时"""
+    runtime.stop()
 
 @celery_app.task(name="tron_worker.process_orders")
 def process_orders():
     """处理待处理订单的后台任务"""
-    db = SessionLocal()
     try:
-        tron_service = TronTransactionService(db)
-        
-        # 运行异步任务
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(tron_service.process_pending_orders())
-        loop.close()
+        runtime.run(lambda tron_service: tron_service.process_pending_orders())
         
         logger.info("订单处理任务完成")
         return "订单处理完成"
@@ -60,6 +145,62 @@ def process_orders():
     except Exception as e:
         logger.error(f"订单处理任务失败: {str(e)}")
         raise
+
+@celery_app.task(name="tron_worker.expire_orders")
+def expire_orders():
+    """批量过期超时未处理订单的后台任务"""
+    db = SessionLocal()
+    try:
+        expired = TronTransactionService(db).expire_overdue_orders()
+        logger.info(f"过期订单清理完成: {expired} 个订单")
+        return expired
+    
+    except Exception as e:
+        logger.error(f"过期订单清理任务失败: {str(e)}")
+        raise
+    
+    finally:
+        db.close()
+
+@celery_app.task(name="tron_worker.archive_orders")
+def archive_orders():
+    """归档已结束订单的后台任务"""
+    db = SessionLocal()
+    try:
+        archived = ArchiveService(db).archive_orders()
+        logger.info(f"订单归档完成: {archived} 个订单")
+        return archived
+    
+    except Exception as e:
+        logger.error(f"订单归档任务失败: {str(e)}")
+        raise
+    
+    finally:
+        db.close()
+
+@celery_app.task(name="tron_worker.watch_deposits")
+def watch_deposits_task():
+    """链上充值监听的后台任务"""
+    try:
+        return runtime.run(lambda tron_service: watch_deposits(tron_service.db))
+    
+    except Exception as e:
+        logger.error(f"充值监听任务失败: {str(e)}")
+        raise
+
+@celery_app.task(name="tron_worker.roll_up_stats")
+def roll_up_stats():
+    """增量汇总管理后台统计数据的后台任务"""
+    db = SessionLocal()
+    try:
+        stats_service = StatsService(db)
+        rolled_hours = stats_service.roll_up()
+        stats_service.snapshot_wallet_pool()
+        return rolled_hours
+    
+    except Exception as e:
+        logger.error(f"统计汇总任务失败: {str(e)}")
+        raise
     
     finally:
         db.close()
@@ -67,15 +208,8 @@ def process_orders():
 @celery_app.task(name="tron_worker.update_wallets")
 def update_wallets():
     """更新供应商钱包余额的后台任务"""
-    db = SessionLocal()
     try:
-        tron_service = TronTransactionService(db)
-        
-        # 运行异步任务
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(tron_service.update_wallet_balances())
-        loop.close()
+        runtime.run(lambda tron_service: tron_service.update_wallet_balances())
         
         logger.info("钱包余额更新任务完成")
         return "钱包余额更新完成"
@@ -83,22 +217,12 @@ def update_wallets():
     except Exception as e:
         logger.error(f"钱包余额更新任务失败: {str(e)}")
         raise
-    
-    finally:
-        db.close()
 
 @celery_app.task(name="tron_worker.execute_order")
 def execute_order(order_id: str):
     """执行单个订单的后台任务"""
-    db = SessionLocal()
     try:
-        tron_service = TronTransactionService(db)
-        
-        # 运行异步任务
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        result = loop.run_until_complete(tron_service.execute_energy_delegate(order_id))
-        loop.close()
+        result = runtime.run(lambda tron_service: tron_service.execute_energy_delegate(order_id))
         
         logger.info(f"订单执行完成: {order_id}, 结果: {result}")
         return f"订单 {order_id} 执行{'成功' if result else '失败'}"
@@ -106,6 +230,20 @@ def execute_order(order_id: str):
     except Exception as e:
         logger.error(f"订单执行失败: {order_id}, 错误: {str(e)}")
         raise
+
+@celery_app.task(name="tron_worker.relay_outbox")
+def relay_outbox():
+    """派发订单发件箱中积压记录的后台任务"""
+    db = SessionLocal()
+    try:
+        dispatched = OutboxService(db, dispatcher=CeleryDispatcher()).drain()
+        if dispatched:
+            logger.info(f"发件箱派发完成: {dispatched} 个订单")
+        return dispatched
+    
+    except Exception as e:
+        logger.error(f"发件箱派发任务失败: {str(e)}")
+        raise
     
     finally:
         db.close()
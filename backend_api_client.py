@@ -1,110 +1,193 @@
-import requests
+import asyncio
+import httpx
 import logging
+import os
+import random
 from typing import Optional, Dict, List
 from decimal import Decimal
 
 logger = logging.getLogger(__name__)
 
+# 连接池与超时配置
+BACKEND_API_URL = os.getenv("BACKEND_API_URL", "http://localhost:8002")
+BACKEND_API_TIMEOUT = float(os.getenv("BACKEND_API_TIMEOUT", "10"))  # 默认单次请求超时（秒）
+BACKEND_API_FAST_TIMEOUT = float(os.getenv("BACKEND_API_FAST_TIMEOUT", "3"))  # 页面渲染路径上的查询超时（秒）
+BACKEND_API_MAX_CONNECTIONS = int(os.getenv("BACKEND_API_MAX_CONNECTIONS", "20"))
+BACKEND_API_MAX_KEEPALIVE = int(os.getenv("BACKEND_API_MAX_KEEPALIVE", "10"))
+BACKEND_API_RETRIES = int(os.getenv("BACKEND_API_RETRIES", "2"))
+BACKEND_API_RETRY_BACKOFF = float(os.getenv("BACKEND_API_RETRY_BACKOFF", "0.3"))  # 重试退避基数（秒）
+
+# 网关类错误可重试
+RETRYABLE_STATUS_CODES = {502, 503, 504}
+
+class QuoteChangedError(Exception):
+    """下单时展示的费用与后端当前报价不一致（后端返回409），需按当前报价重新确认"""
+
 class BackendAPIClient:
-    """后端API客户端"""
-    
-    def __init__(self, base_url: str = "http://localhost:8002"):
+    """后端API异步客户端（连接池复用，调用不阻塞机器人事件循环）"""
+
+    def __init__(self, base_url: str = BACKEND_API_URL, timeout: float = BACKEND_API_TIMEOUT,
+                 max_connections: int = BACKEND_API_MAX_CONNECTIONS,
+                 max_keepalive_connections: int = BACKEND_API_MAX_KEEPALIVE,
+                 retries: int = BACKEND_API_RETRIES, transport: httpx.AsyncBaseTransport = None):
         self.base_url = base_url.rstrip('/')
-        self.session = requests.Session()
-        self.session.headers.update({
-            'Content-Type': 'application/json'
-        })
-    
-    def _make_request(self, method: str, endpoint: str, data: dict = None) -> Optional[dict]:
-        """发起API请求"""
-        url = f"{self.base_url}{endpoint}"
-        
-        try:
-            if method.upper() == "GET":
-                response = self.session.get(url, params=data, timeout=10)
-            elif method.upper() == "POST":
-                response = self.session.post(url, json=data, timeout=10)
-            elif method.upper() == "DELETE":
-                response = self.session.delete(url, timeout=10)
-            else:
-                raise ValueError(f"不支持的HTTP方法: {method}")
-            
-            response.raise_for_status()
-            return response.json()
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"API请求失败 {method} {url}: {e}")
-            return None
-        except Exception as e:
-            logger.error(f"API调用异常: {e}")
-            return None
-    
+        self.timeout = timeout
+        self.retries = retries
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections
+        )
+        self._transport = transport
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """首次使用时创建连接池（绑定到机器人的事件循环）"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={'Content-Type': 'application/json'},
+                limits=self.limits,
+                timeout=self.timeout,
+                transport=self._transport
+            )
+        return self._client
+
+    async def aclose(self):
+        """关闭连接池"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _retry_delay(self, attempt: int) -> float:
+        """指数退避加随机抖动，避免多个会话同时重试"""
+        return random.uniform(0, BACKEND_API_RETRY_BACKOFF * (2 ** attempt))
+
+    async def _make_request(self, method: str, endpoint: str, data: dict = None,
+                            headers: dict = None, timeout: float = None, retries: int = None,
+                            raise_statuses: tuple = ()) -> Optional[dict]:
+        """发起API请求
+
+        GET/DELETE 与携带幂等键的请求在超时、连接失败或网关错误时重试；其余请求不重试，避免重复提交。
+        失败时返回None；状态码在 raise_statuses 中时抛出 httpx.HTTPStatusError，由调用方处理。
+        """
+        method = method.upper()
+        if method not in ("GET", "POST", "DELETE"):
+            raise ValueError(f"不支持的HTTP方法: {method}")
+
+        if retries is None:
+            idempotent = method != "POST" or bool(headers and headers.get("Idempotency-Key"))
+            retries = self.retries if idempotent else 0
+
+        for attempt in range(retries + 1):
+            try:
+                response = await self.client.request(
+                    method,
+                    endpoint,
+                    params=data if method == "GET" else None,
+                    json=data if method == "POST" else None,
+                    headers=headers,
+                    timeout=timeout if timeout is not None else self.timeout
+                )
+
+                if response.status_code in RETRYABLE_STATUS_CODES and attempt < retries:
+                    logger.warning(f"API返回 {response.status_code}，重试 {attempt + 1}/{retries} {method} {endpoint}")
+                    await asyncio.sleep(self._retry_delay(attempt))
+                    continue
+
+                response.raise_for_status()
+                return response.json()
+
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                if attempt < retries:
+                    logger.warning(f"API请求失败，重试 {attempt + 1}/{retries} {method} {endpoint}: {e!r}")
+                    await asyncio.sleep(self._retry_delay(attempt))
+                    continue
+                logger.error(f"API请求失败 {method} {endpoint}: {e!r}")
+                return None
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code in raise_statuses:
+                    raise
+                logger.error(f"API请求失败 {method} {endpoint}: {e}")
+                return None
+            except httpx.HTTPError as e:
+                logger.error(f"API请求失败 {method} {endpoint}: {e}")
+                return None
+            except Exception as e:
+                logger.error(f"API调用异常: {e}")
+                return None
+
     # 用户余额相关API
-    def get_user_balance(self, user_id: int) -> Optional[Dict]:
-        """获取用户余额"""
-        return self._make_request("GET", f"/api/users/{user_id}/balance")
-    
-    def deduct_user_balance(self, user_id: int, amount: float, order_id: str, description: str = None) -> bool:
+    async def get_user_balance(self, user_id: int, timeout: float = BACKEND_API_FAST_TIMEOUT) -> Optional[Dict]:
+        """获取用户余额（渲染页面时调用，使用较短超时）"""
+        return await self._make_request("GET", f"/api/users/{user_id}/balance", timeout=timeout)
+
+    async def deduct_user_balance(self, user_id: int, amount: float, order_id: str, description: str = None) -> bool:
         """扣减用户余额"""
         data = {
             "amount": amount,
             "order_id": order_id,
             "description": description
         }
-        result = self._make_request("POST", f"/api/users/{user_id}/deduct", data)
-        return result and result.get("success", False)
-    
-    def confirm_user_deposit(self, user_id: int, tx_hash: str, amount: float, currency: str) -> bool:
+        result = await self._make_request("POST", f"/api/users/{user_id}/deduct", data)
+        return bool(result and result.get("success", False))
+
+    async def confirm_user_deposit(self, user_id: int, tx_hash: str, amount: float, currency: str) -> bool:
         """确认用户充值"""
         data = {
             "tx_hash": tx_hash,
             "amount": amount,
             "currency": currency
         }
-        result = self._make_request("POST", f"/api/users/{user_id}/deposit", data)
-        return result and result.get("success", False)
-    
+        result = await self._make_request("POST", f"/api/users/{user_id}/deposit", data)
+        return bool(result and result.get("success", False))
+
     # 订单相关API
-    def create_order(self, user_id: int, energy_amount: int, duration: str, receive_address: str) -> Optional[Dict]:
-        """创建订单"""
+    async def create_order(self, user_id: int, energy_amount: int, duration: str, receive_address: str,
+                           idempotency_key: str = None, quoted_cost: str = None) -> Optional[Dict]:
+        """创建订单（携带幂等键时超时可安全重试，不会重复下单；quoted_cost 与后端报价不一致时抛出 QuoteChangedError）"""
         data = {
             "user_id": user_id,
             "energy_amount": energy_amount,
             "duration": duration,
-            "receive_address": receive_address
+            "receive_address": receive_address,
+            "quoted_cost": quoted_cost
         }
-        return self._make_request("POST", "/api/orders/", data)
-    
-    def get_order(self, order_id: str) -> Optional[Dict]:
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+        try:
+            return await self._make_request("POST", "/api/orders/", data, headers=headers, raise_statuses=(409,))
+        except httpx.HTTPStatusError as e:
+            raise QuoteChangedError(e.response.text) from e
+
+    async def get_order(self, order_id: str) -> Optional[Dict]:
         """查询订单详情"""
-        return self._make_request("GET", f"/api/orders/{order_id}")
-    
-    def get_user_orders(self, user_id: int, limit: int = 10) -> List[Dict]:
+        return await self._make_request("GET", f"/api/orders/{order_id}")
+
+    async def get_user_orders(self, user_id: int, limit: int = 10) -> List[Dict]:
         """获取用户订单列表"""
-        result = self._make_request("GET", "/api/orders", {"user_id": user_id, "limit": limit})
+        result = await self._make_request("GET", "/api/orders/", {"user_id": user_id, "limit": limit})
         return result if result else []
-    
-    def cancel_order(self, order_id: str) -> bool:
+
+    async def cancel_order(self, order_id: str) -> bool:
         """取消订单"""
-        result = self._make_request("POST", f"/api/orders/{order_id}/cancel")
-        return result and result.get("success", False)
-    
+        result = await self._make_request("POST", f"/api/orders/{order_id}/cancel")
+        return bool(result and result.get("success", False))
+
     # 钱包相关API
-    def get_user_wallets(self, user_id: int) -> List[Dict]:
-        """获取用户钱包列表"""
-        result = self._make_request("GET", f"/api/wallets/users/{user_id}")
-        return result if result else []
-    
-    def add_user_wallet(self, user_id: int, wallet_address: str) -> bool:
+    async def get_user_wallets(self, user_id: int) -> Optional[List[Dict]]:
+        """获取用户钱包列表（请求失败返回None，以便与无地址区分）"""
+        return await self._make_request("GET", f"/api/wallets/users/{user_id}")
+
+    async def add_user_wallet(self, user_id: int, wallet_address: str) -> bool:
         """添加用户钱包地址"""
         data = {"wallet_address": wallet_address}
-        result = self._make_request("POST", f"/api/wallets/users/{user_id}", data)
-        return result and result.get("success", False)
-    
-    def remove_user_wallet(self, user_id: int, wallet_address: str) -> bool:
+        result = await self._make_request("POST", f"/api/wallets/users/{user_id}", data)
+        return bool(result and result.get("success", False))
+
+    async def remove_user_wallet(self, user_id: int, wallet_address: str) -> bool:
         """删除用户钱包地址"""
-        result = self._make_request("DELETE", f"/api/wallets/users/{user_id}/{wallet_address}")
-        return result and result.get("success", False)
+        result = await self._make_request("DELETE", f"/api/wallets/users/{user_id}/{wallet_address}")
+        return bool(result and result.get("success", False))
 
 # 全局API客户端实例
-backend_api = BackendAPIClient()
\ No newline at end of file
+backend_api = BackendAPIClient()
@@ -0,0 +1,59 @@
+"""
+余额变动订阅 - 接收后端通过Redis发布的余额变动事件，使对应用户的余额缓存失效
+未启用或未安装redis时不订阅，余额缓存仅依靠有效期过期
+"""
+import asyncio
+import json
+import logging
+import os
+from models import invalidate_user_balance
+
+logger = logging.getLogger(__name__)
+
+BALANCE_EVENTS_ENABLED = os.getenv("BALANCE_EVENTS_ENABLED", "false").lower() == "true"
+BALANCE_EVENTS_CHANNEL = os.getenv("BALANCE_EVENTS_CHANNEL", "trx_energy:balance_changed")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+RECONNECT_DELAY = 5  # 连接断开后的重连间隔（秒）
+
+def handle_balance_event(payload) -> int:
+    """处理一条余额变动消息，返回失效的用户数"""
+    try:
+        user_ids = json.loads(payload)["user_ids"]
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning(f"无法解析余额变动消息: {payload!r}, 错误: {e}")
+        return 0
+
+    for user_id in user_ids:
+        invalidate_user_balance(int(user_id))
+    return len(user_ids)
+
+async def listen_balance_events():
+    """订阅余额变动频道（断线自动重连，任务取消时退出）"""
+    try:
+        import redis.asyncio as redis
+    except ImportError:
+        logger.warning("未安装redis，余额变动订阅未启动")
+        return
+
+    while True:
+        client = redis.Redis.from_url(REDIS_URL)
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(BALANCE_EVENTS_CHANNEL)
+            logger.info(f"已订阅余额变动频道: {BALANCE_EVENTS_CHANNEL}")
+            async for message in pubsub.listen():
+                handle_balance_event(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"余额变动订阅中断，{RECONNECT_DELAY} 秒后重连: {e}")
+            await asyncio.sleep(RECONNECT_DELAY)
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+def start_balance_listener():
+    """在机器人事件循环中启动订阅任务，未启用时返回None"""
+    if not BALANCE_EVENTS_ENABLED:
+        return None
+    return asyncio.create_task(listen_balance_events(), name="balance-events")
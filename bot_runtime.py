@@ -0,0 +1,117 @@
+"""
+机器人运行时 - 并发处理更新（同一聊天内保持顺序）与可选的Webhook模式
+不同聊天的更新并行处理，一个用户的慢查询不再阻塞其他用户；同一聊天的更新依次处理，会话状态不会交错修改
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Dict
+from telegram import Update
+from telegram.ext import Application, BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+BOT_MODE = os.getenv("BOT_MODE", "polling")  # polling / webhook
+BOT_CONCURRENT_UPDATES = int(os.getenv("BOT_CONCURRENT_UPDATES", "64"))  # 同时处理的更新数上限
+
+# Webhook模式配置
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # Telegram回调的公网地址，例如 https://bot.example.com/telegram
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN") or None
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))  # Telegram同时推送的连接数上限
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """并发处理更新，同一聊天（无聊天时按用户）的更新按到达顺序依次处理"""
+
+    # 传给基类的上限：基类在调用 do_process_update 之前获取信号量，等待聊天锁的更新会占用名额，
+    # 因此基类不做限制，并发上限由 do_process_update 在获得聊天锁之后获取的信号量控制
+    UNBOUNDED = 2 ** 30
+
+    def __init__(self, max_concurrent_updates: int = BOT_CONCURRENT_UPDATES):
+        if max_concurrent_updates < 1:
+            raise ValueError("max_concurrent_updates 必须为正整数")
+        super().__init__(self.UNBOUNDED)
+        self.concurrency_limit = max_concurrent_updates
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._waiters: Dict[int, int] = {}
+
+    @staticmethod
+    def ordering_key(update: object):
+        """更新的顺序键：聊天ID，其次用户ID；无法识别时返回None（不排序）"""
+        if not isinstance(update, Update):
+            return None
+        if update.effective_chat:
+            return update.effective_chat.id
+        if update.effective_user:
+            return update.effective_user.id
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self.ordering_key(update)
+        if key is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            # 先排聊天内的顺序，再占用并发名额：等待同一聊天前序更新的更新不占名额，不会阻塞其他聊天
+            async with lock:
+                async with self._slots:
+                    await coroutine
+        finally:
+            # 没有等待者时释放锁对象，字典大小只与活跃聊天数有关
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+                del self._locks[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def stats(self) -> Dict:
+        """正在处理或排队的聊天数"""
+        return {
+            "max_concurrent_updates": self.concurrency_limit,
+            "active_chats": len(self._locks),
+            "queued_updates": sum(self._waiters.values())
+        }
+
+def build_application(bot_token: str) -> Application:
+    """创建启用并发处理的Application"""
+    return (
+        Application.builder()
+        .token(bot_token)
+        .concurrent_updates(PerChatUpdateProcessor(BOT_CONCURRENT_UPDATES))
+        .build()
+    )
+
+def run_application(application: Application, mode: str = BOT_MODE):
+    """按配置以轮询或Webhook模式运行"""
+    if mode == "webhook":
+        if not WEBHOOK_URL:
+            raise ValueError("Webhook模式需要设置WEBHOOK_URL")
+        logger.info(f"Webhook模式: 监听 {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH}，并发上限 {BOT_CONCURRENT_UPDATES}")
+        # 需要安装 python-telegram-bot[webhooks]
+        application.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET_TOKEN,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            drop_pending_updates=True,
+            close_loop=False
+        )
+    else:
+        logger.info(f"轮询模式，并发上限 {BOT_CONCURRENT_UPDATES}")
+        application.run_polling(drop_pending_updates=True, close_loop=False)
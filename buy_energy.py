@@ -1,57 +1,119 @@
-import asyncio
 import os
+from decimal import Decimal
+from functools import lru_cache
+from typing import NamedTuple, Tuple
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
 from models import get_user_session, calculate_mock_cost, format_energy, get_wallet_addresses, add_wallet_address
-from tron_api import TronAPI
-from config import TRON_NETWORK
-
-def generate_buy_energy_text(user_id: int) -> str:
-    """生成闪租页文本内容"""
-    session = get_user_session(user_id)
-    
-    # 重新计算成本
-    session.computed_cost = calculate_mock_cost(session.selected_energy, session.selected_duration)
-    
-    # 格式化能量显示（数字格式，用空格分隔千位）
-    energy_value = session.selected_energy
+from edit_scheduler import edit_scheduler
+from address_balance_cache import address_balance_cache, balance_label
+from pricing import quote_engine
+from exchange_rates import exchange_rate_service
+
+# 闪租页按钮选项
+DURATION_OPTIONS = ("1h", "1d", "3d", "7d", "14d")
+ENERGY_OPTIONS = ("65K", "135K", "270K", "540K", "1M")
+BUY_PAGE_CACHE_SIZE = 512  # 渲染模板缓存的组合数（自定义能量数量会产生新组合）
+
+class BuyPageTemplate(NamedTuple):
+    """闪租页中与用户无关的文本片段（按时长、能量、是否已选地址预先生成）"""
+    computed_cost: str
+    intro_text: str
+    cost_section: str
+    command_prefix: str  # 订单命令中地址之前的部分
+
+@lru_cache(maxsize=BUY_PAGE_CACHE_SIZE)
+def energy_strings(energy_value: str) -> Tuple[str, str]:
+    """能量数量的显示文本（空格分隔千位）和命令文本"""
     if energy_value.endswith("K"):
-        if energy_value == "65K":
-            energy_display = "65 000"
-            energy_command = "65000"
-        elif energy_value == "135K":
-            energy_display = "135 000"
-            energy_command = "135000"
-        elif energy_value == "270K":
-            energy_display = "270 000"
-            energy_command = "270000"
-        elif energy_value == "540K":
-            energy_display = "540 000"
-            energy_command = "540000"
-        else:
-            energy_display = energy_value
-            energy_command = energy_value.replace("K", "000")
-    elif energy_value.endswith("M"):
+        if energy_value in ENERGY_OPTIONS:
+            amount = int(energy_value[:-1]) * 1000
+            return f"{amount:,}".replace(",", " "), str(amount)
+        return energy_value, energy_value.replace("K", "000")
+    if energy_value.endswith("M"):
         if energy_value == "1M":
-            energy_display = "1 000 000"
-            energy_command = "1000000"
-        else:
-            energy_display = energy_value
-            energy_command = energy_value.replace("M", "000000")
-    elif energy_value.isdigit():
+            return "1 000 000", "1000000"
+        return energy_value, energy_value.replace("M", "000000")
+    if energy_value.isdigit():
         # 自定义数量，格式化显示
-        val = int(energy_value)
-        energy_display = f"{val:,}".replace(",", " ")
-        energy_command = energy_value
-    else:
-        energy_display = energy_value
-        energy_command = energy_value
-    
+        return f"{int(energy_value):,}".replace(",", " "), energy_value
+    return energy_value, energy_value
+
+@lru_cache(maxsize=BUY_PAGE_CACHE_SIZE)
+def buy_page_template(duration: str, energy: str, has_address: bool, price_version: str) -> BuyPageTemplate:
+    """闪租页文本模板（成本计算与格式化只在组合首次出现时执行；费率版本变化后重新生成）"""
+    computed_cost = calculate_mock_cost(energy, duration)
+    energy_display, energy_command = energy_strings(energy)
+
     # 开头文案根据是否选择地址决定
-    if session.selected_address:
+    if has_address:
         intro_text = "Calculation of the cost of purchasing energy:"
     else:
         intro_text = "Select the required number of days and energy, and then click Address - to select an address from your favorites or add a new one.\n\nCalculating the cost of purchasing energy:"
+
+    # 成本计算部分
+    cost_section = f"""⚡️ Amount: {energy_display}
+📆 Period: {duration} 
+💵 Cost: {computed_cost} TRX """
+
+    command_prefix = f"""Assemble your order with buttons. If the buttons do not have the required values, use the format command::
+`BUY {energy_command} {duration} """
+
+    return BuyPageTemplate(computed_cost, intro_text, cost_section, command_prefix)
+
+@lru_cache(maxsize=BUY_PAGE_CACHE_SIZE)
+def buy_page_keyboard(duration: str, energy: str, has_address: bool) -> InlineKeyboardMarkup:
+    """闪租页键盘（按钮不可变，同一组合的所有用户共用一个实例）"""
+    # Duration按钮行 - 单行布局，使用🔸高亮
+    duration_buttons = tuple(
+        InlineKeyboardButton(f"🔸 {value}" if duration == value else value, callback_data=f"buy_energy:duration:{value}")
+        for value in DURATION_OPTIONS
+    )
+
+    # Energy按钮行 - 单行布局，使用🔹高亮
+    energy_buttons = tuple(
+        InlineKeyboardButton(f"🔹 {value}" if energy == value else value, callback_data=f"buy_energy:energy:{value}")
+        for value in ENERGY_OPTIONS
+    )
+
+    # Other amount按钮 - 使用铅笔图标
+    other_text = "🔹 ✏️ Other amount" if energy not in ENERGY_OPTIONS else "✏️ Other amount"
+    other_button = InlineKeyboardButton(other_text, callback_data="buy_energy:energy:custom")
+
+    keyboard = [
+        duration_buttons,      # 第一行：时长选择
+        energy_buttons,        # 第二行：能量选择
+        (other_button,),       # 第三行：Other amount
+    ]
+
+    # 检查是否完成所有必要选择（时长、能量、地址）
+    if duration and energy and has_address:
+        # 完整状态：显示BUY、Change address、Address balance、Later
+        keyboard.extend([
+            (InlineKeyboardButton("✅ BUY", callback_data="buy_energy:pay:confirm"),),  # 第四行：BUY按钮
+            (                                                                           # 第五行：地址操作
+                InlineKeyboardButton("✅ Change address", callback_data="buy_energy:address:select"),
+                InlineKeyboardButton("🔄 Address balance", callback_data="buy_energy:balance:refresh")
+            ),
+            (InlineKeyboardButton("❌ Later", callback_data="buy_energy:close"),)       # 第六行：Later
+        ])
+    else:
+        # 初始状态：只显示Select address、Later
+        keyboard.extend([
+            (InlineKeyboardButton("✅ Select address", callback_data="buy_energy:address:select"),),  # 第四行：选择地址
+            (InlineKeyboardButton("❌ Later", callback_data="buy_energy:close"),)                      # 第五行：Later
+        ])
+
+    return InlineKeyboardMarkup(tuple(keyboard))
+
+async def generate_buy_energy_text(user_id: int) -> str:
+    """生成闪租页文本内容（固定部分来自模板缓存，只填充地址和余额）"""
+    session = get_user_session(user_id)
+    template = buy_page_template(
+        session.selected_duration, session.selected_energy, bool(session.selected_address), quote_engine.version
+    )
+    session.computed_cost = template.computed_cost
     
     # 地址信息部分
     address_section = ""
@@ -71,84 +133,26 @@ def generate_buy_energy_text(user_id: int) -> str:
                 address_section += f"BANDWIDTH: {bandwidth}\n"
             address_section += "\n"
     
-    # 成本计算部分
-    cost_section = f"""⚡️ Amount: {energy_display}
-📆 Period: {session.selected_duration} 
-💵 Cost: {session.computed_cost} TRX """
-    
     # 组装订单命令部分
-    if session.selected_address:
-        command_address = session.selected_address
-    else:
-        command_address = "YOUR_TRX_ADDRESS"
-    
-    command_section = f"""Assemble your order with buttons. If the buttons do not have the required values, use the format command::
-`BUY {energy_command} {session.selected_duration} {command_address}`"""
+    command_address = session.selected_address or "YOUR_TRX_ADDRESS"
+    command_section = f"{template.command_prefix}{command_address}`"
     
     # 余额信息部分
-    balance_section = f"Your balance: {session.user_balance['TRX']}"
+    user_balance = await session.get_user_balance()
+    balance_section = f"Your balance: {user_balance['TRX']}"
     
     # 组合最终文本
-    text_parts = [intro_text]
+    text_parts = [template.intro_text]
     if address_section:
         text_parts.append(address_section)
-    text_parts.extend([cost_section, "", command_section, "", balance_section])
+    text_parts.extend([template.cost_section, "", command_section, "", balance_section])
     
     return "\n".join(text_parts)
 
 def generate_buy_energy_keyboard(user_id: int) -> InlineKeyboardMarkup:
     """生成闪租页键盘"""
     session = get_user_session(user_id)
-    
-    # Duration按钮行 - 单行布局，使用🔸高亮
-    duration_buttons = []
-    durations = [("1h", "1h"), ("1d", "1d"), ("3d", "3d"), ("7d", "7d"), ("14d", "14d")]
-    for label, value in durations:
-        display_text = f"🔸 {label}" if session.selected_duration == value else label
-        duration_buttons.append(InlineKeyboardButton(display_text, callback_data=f"buy_energy:duration:{value}"))
-    
-    # Energy按钮行 - 单行布局，使用🔹高亮
-    energy_buttons = []
-    energies = [("65K", "65K"), ("135K", "135K"), ("270K", "270K"), ("540K", "540K"), ("1M", "1M")]
-    for label, value in energies:
-        display_text = f"🔹 {label}" if session.selected_energy == value else label
-        energy_buttons.append(InlineKeyboardButton(display_text, callback_data=f"buy_energy:energy:{value}"))
-    
-    # Other amount按钮 - 使用铅笔图标
-    other_selected = session.selected_energy not in ["65K", "135K", "270K", "540K", "1M"]
-    other_text = f"✏️ Other amount" if not other_selected else f"🔹 ✏️ Other amount"
-    other_button = InlineKeyboardButton(other_text, callback_data="buy_energy:energy:custom")
-    
-    # 检查是否完成所有必要选择（时长、能量、地址）
-    has_duration = session.selected_duration is not None and session.selected_duration != ""
-    has_energy = session.selected_energy is not None and session.selected_energy != ""
-    has_address = session.selected_address is not None and session.selected_address != ""
-    all_selected = has_duration and has_energy and has_address
-    
-    keyboard = [
-        duration_buttons,      # 第一行：时长选择
-        energy_buttons,        # 第二行：能量选择  
-        [other_button],        # 第三行：Other amount
-    ]
-    
-    if all_selected:
-        # 完整状态：显示BUY、Change address、Address balance、Later
-        keyboard.extend([
-            [InlineKeyboardButton("✅ BUY", callback_data="buy_energy:pay:confirm")],  # 第四行：BUY按钮
-            [                                                                          # 第五行：地址操作
-                InlineKeyboardButton("✅ Change address", callback_data="buy_energy:address:select"),
-                InlineKeyboardButton("🔄 Address balance", callback_data="buy_energy:balance:refresh")
-            ],
-            [InlineKeyboardButton("❌ Later", callback_data="buy_energy:close")]       # 第六行：Later
-        ])
-    else:
-        # 初始状态：只显示Select address、Later
-        keyboard.extend([
-            [InlineKeyboardButton("✅ Select address", callback_data="buy_energy:address:select")],  # 第四行：选择地址
-            [InlineKeyboardButton("❌ Later", callback_data="buy_energy:close")]                      # 第五行：Later
-        ])
-    
-    return InlineKeyboardMarkup(keyboard)
+    return buy_page_keyboard(session.selected_duration, session.selected_energy, bool(session.selected_address))
 
 async def handle_buy_energy_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """处理闪租页回调"""
@@ -160,7 +164,8 @@ async def handle_buy_energy_callback(update: Update, context: ContextTypes.DEFAU
     
     if callback_data == "main:buy_energy":
         # 从主菜单进入闪租页
-        text = generate_buy_energy_text(user_id)
+        get_user_session(user_id).start_new_purchase()
+        text = await generate_buy_energy_text(user_id)
         keyboard = generate_buy_energy_keyboard(user_id)
         await query.edit_message_text(text, reply_markup=keyboard, parse_mode='Markdown')
         
@@ -171,7 +176,7 @@ async def handle_buy_energy_callback(update: Update, context: ContextTypes.DEFAU
         session.selected_duration = duration
         
         # 更新消息
-        text = generate_buy_energy_text(user_id)
+        text = await generate_buy_energy_text(user_id)
         keyboard = generate_buy_energy_keyboard(user_id)
         await query.edit_message_text(text, reply_markup=keyboard, parse_mode='Markdown')
         
@@ -197,7 +202,7 @@ async def handle_buy_energy_callback(update: Update, context: ContextTypes.DEFAU
         else:
             session.selected_energy = energy
             # 更新消息
-            text = generate_buy_energy_text(user_id)
+            text = await generate_buy_energy_text(user_id)
             keyboard = generate_buy_energy_keyboard(user_id)
             await query.edit_message_text(text, reply_markup=keyboard, parse_mode='Markdown')
             
@@ -236,7 +241,8 @@ async def handle_buy_energy_callback(update: Update, context: ContextTypes.DEFAU
         await show_deposit_page(query, context)
         
     elif callback_data == "deposit:later":
-        # 关闭充值页面
+        # 关闭充值页面并停止倒计时
+        edit_scheduler.cancel(query.message.chat_id, query.message.message_id)
         await query.delete_message()
         
     elif callback_data == "success:buy_more":
@@ -264,7 +270,7 @@ async def show_address_selection(query, context):
     user_id = query.from_user.id
     
     # 获取用户的钱包地址列表
-    user_addresses = get_wallet_addresses(user_id)
+    user_addresses = await get_wallet_addresses(user_id)
     
     if not user_addresses:
         # 用户还没有绑定地址
@@ -286,22 +292,34 @@ async def show_address_selection(query, context):
 
 📊 共有 {len(user_addresses)} 个地址"""
         
-        keyboard = []
-        for i, addr in enumerate(user_addresses):
-            short_addr = f"{addr[:6]}...{addr[-4:]}"
-            # 如果是当前选中的地址，添加标记
-            if addr == get_user_session(user_id).selected_address:
-                button_text = f"✅ {short_addr}"
-            else:
-                button_text = f"📍 {short_addr}"
-            keyboard.append([InlineKeyboardButton(button_text, callback_data=f"address:select:{i}")])
-        
-        keyboard.extend([
-            [InlineKeyboardButton("➕ 添加新地址", callback_data="address:new")],
-            [InlineKeyboardButton("⬅️ 返回", callback_data="address:back")]
-        ])
+        keyboard = address_selection_keyboard(user_id, user_addresses)
     
     await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode='Markdown')
+    
+    # 后台预取所有地址余额，完成后列表原地显示TRX/能量
+    address_balance_cache.start_prefetch(
+        get_user_session(user_id), query.message, user_addresses,
+        lambda: InlineKeyboardMarkup(address_selection_keyboard(user_id, user_addresses))
+    )
+
+def address_selection_keyboard(user_id: int, user_addresses: list) -> list:
+    """地址选择列表按钮（已缓存余额的地址显示TRX/能量）"""
+    keyboard = []
+    for i, addr in enumerate(user_addresses):
+        short_addr = f"{addr[:6]}...{addr[-4:]}"
+        # 如果是当前选中的地址，添加标记
+        if addr == get_user_session(user_id).selected_address:
+            button_text = f"✅ {short_addr}"
+        else:
+            button_text = f"📍 {short_addr}"
+        button_text += balance_label(address_balance_cache.get(addr))
+        keyboard.append([InlineKeyboardButton(button_text, callback_data=f"address:select:{i}")])
+    
+    keyboard.extend([
+        [InlineKeyboardButton("➕ 添加新地址", callback_data="address:new")],
+        [InlineKeyboardButton("⬅️ 返回", callback_data="address:back")]
+    ])
+    return keyboard
 
 async def refresh_address_balance(query, context):
     """刷新地址余额"""
@@ -319,14 +337,8 @@ async def refresh_address_balance(query, context):
     )
     
     try:
-        # 创建API客户端
-        api = TronAPI(
-            network=TRON_NETWORK,
-            api_key=os.getenv('TRON_API_KEY')
-        )
-        
-        # 查询余额
-        balance = api.get_account_balance(session.selected_address)
+        # 查询余额（跳过缓存，结果同时更新缓存）
+        balance = await address_balance_cache.fetch(session.selected_address, refresh=True)
         
         if balance:
             # 更新会话中的余额信息，包含USDT和带宽
@@ -338,7 +350,7 @@ async def refresh_address_balance(query, context):
             }
             
             # 重新生成页面
-            text = generate_buy_energy_text(user_id)
+            text = await generate_buy_energy_text(user_id)
             keyboard = generate_buy_energy_keyboard(user_id)
             await query.edit_message_text(text, reply_markup=keyboard, parse_mode='Markdown')
             
@@ -368,9 +380,14 @@ async def confirm_payment(query, context):
     print(f"DEBUG: BUY按钮被点击，用户ID: {user_id}")
     print(f"DEBUG: 用户会话状态 - 能量: {session.selected_energy}, 时长: {session.selected_duration}, 地址: {session.selected_address}")
     
+    # 页面渲染后费率或动态定价系数已变化：按当前报价重新渲染，由用户确认新价格
+    if calculate_mock_cost(session.selected_energy, session.selected_duration) != session.computed_cost:
+        await show_quote_changed(query, context)
+        return
+    
     # 获取所需费用和用户余额
     required_cost = float(session.computed_cost)
-    user_balance_info = session.user_balance
+    user_balance_info = await session.get_user_balance()
     user_trx_balance = float(user_balance_info['TRX'])
     
     print(f"DEBUG: 所需费用: {required_cost} TRX, 用户余额: {user_trx_balance} TRX")
@@ -397,10 +414,11 @@ async def process_successful_payment(query, context, session, cost: float):
     
     # 调用后端API创建真实订单
     print(f"DEBUG: 准备创建订单 - 能量: {energy_amount}, 时长: {session.selected_duration}, 地址: {session.selected_address}")
-    order_result = session.create_order(
+    order_result = await session.create_order(
         energy_amount=energy_amount,
         duration=session.selected_duration,
-        receive_address=session.selected_address
+        receive_address=session.selected_address,
+        quoted_cost=session.computed_cost
     )
     print(f"DEBUG: 订单创建结果: {order_result}")
     
@@ -416,14 +434,15 @@ async def process_successful_payment(query, context, session, cost: float):
         energy_display = format_energy_display(session.selected_energy)
         
         # 创建成功消息
+        user_balance = await session.get_user_balance()
         text = f"""✅ 交易成功完成！
 
 🎯 地址: {session.selected_address[:6]}...{session.selected_address[-6:]}
 ⚡ 数量: {energy_display}
 📅 时长: {session.selected_duration}
-💵 费用: {cost:.2f} TRX
+💵 费用: {float(order_data["cost_trx"]):.2f} TRX
 🆔 订单ID: {order_data["id"][:8]}
-💰 余额: {session.user_balance['TRX']} TRX
+💰 余额: {user_balance['TRX']} TRX
 
 预计能量将在几分钟内到达您的钱包。
 ✅ 已发送。"""
@@ -456,12 +475,28 @@ async def process_successful_payment(query, context, session, cost: float):
                 chat_id=user_id,
                 text=f"✅ 订单创建成功！订单ID: {order_data['id'][:8]}"
             )
+    elif order_result.get("quote_changed"):
+        # 后端报价与页面展示不一致（如机器人尚未加载新费率），重新加载后按当前报价重新渲染
+        quote_engine.reload(force=True)
+        await show_quote_changed(query, context)
     else:
         # 订单创建失败
         error_msg = order_result.get("message", "订单创建失败")
         print(f"DEBUG: 订单创建失败: {error_msg}")
         await query.answer(f"订单失败: {error_msg}", show_alert=True)
 
+async def show_quote_changed(query, context):
+    """报价已变化：按当前报价重新渲染闪租页并提示用户重新确认"""
+    user_id = query.from_user.id
+    text = await generate_buy_energy_text(user_id)
+    keyboard = generate_buy_energy_keyboard(user_id)
+    try:
+        await query.edit_message_text(text, reply_markup=keyboard, parse_mode='Markdown')
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            raise
+    await context.bot.send_message(chat_id=user_id, text="⚠️ 报价已更新，请确认新的费用后重新点击 BUY")
+
 def parse_energy_amount(energy_str: str) -> int:
     """解析能量字符串为整数值"""
     if energy_str.endswith("K"):
@@ -497,6 +532,7 @@ async def show_insufficient_balance_message(query, context, required_cost: float
     # 计算需要充值的数量（加上一些缓冲）
     needed_amount = required_cost - current_balance
     recommended_amount = max(10.0, needed_amount + 5.0)  # 至少充值10 TRX，额外加5 TRX缓冲
+    usdt_per_trx = exchange_rate_service.current().usdt_per_trx  # 读取汇率缓存，不发起网络请求
     
     text = f"""💰 余额不足提醒
 
@@ -512,8 +548,8 @@ async def show_insufficient_balance_message(query, context, required_cost: float
 • TRX (TRON网络)
 • USDT TRC20
 
-💱 汇率：1 TRX = 0.38826 USDT
-例如充值 {recommended_amount:.0f} USDT ≈ {recommended_amount/0.38826:.1f} TRX
+💱 汇率：1 TRX = {usdt_per_trx} USDT
+例如充值 {recommended_amount:.0f} USDT ≈ {recommended_amount/float(usdt_per_trx):.1f} TRX
 
 ⚡ 充值后余额通常在5分钟内到账"""
     
@@ -547,21 +583,21 @@ async def show_insufficient_balance_message(query, context, required_cost: float
 
 async def show_exchange_rates(query, context):
     """显示详细汇率信息"""
-    text = """💱 详细充值汇率信息
+    rate = exchange_rate_service.current()
+    rows = "\n".join(
+        f"│ {f'{amount} TRX':>8}     │ {f'{amount * rate.usdt_per_trx:.2f} USDT':>11}  │" for amount in (10, 20, 50, 100, 200)
+    )
+    text = f"""💱 详细充值汇率信息
 
-🔸 当前汇率（实时更新）
-• 1 TRX = 0.38826 USDT
-• 1 USDT = 2.576 TRX
+🔸 当前汇率（定时更新）
+• 1 TRX = {rate.usdt_per_trx} USDT
+• 1 USDT = {rate.trx_per_usdt:.3f} TRX
 
 📊 充值参考表：
 ┌──────────────┬──────────────┐
 │   TRX金额    │  USDT等值    │
 ├──────────────┼──────────────┤
-│   10 TRX     │   3.88 USDT  │
-│   20 TRX     │   7.77 USDT  │
-│   50 TRX     │  19.41 USDT  │
-│  100 TRX     │  38.83 USDT  │
-│  200 TRX     │  77.65 USDT  │
+{rows}
 └──────────────┴──────────────┘
 
 ⚠️ 重要说明：
@@ -585,18 +621,25 @@ async def show_exchange_rates(query, context):
     
     await query.edit_message_text(text, reply_markup=keyboard, parse_mode='Markdown')
 
-async def show_deposit_page(query, context):
-    deposit_address = "TYwv7C4Fik2tYuHBwuNSzrnJ4Bw7NukyRb"
+DEPOSIT_ADDRESS = os.getenv("DEPOSIT_ADDRESS", "TYwv7C4Fik2tYuHBwuNSzrnJ4Bw7NukyRb")  # 平台充值地址（与后端充值监听一致）
+DEPOSIT_COUNTDOWN_SECONDS = 180  # 充值页面倒计时（秒），结束后删除消息
+
+def render_deposit_page(remaining_seconds: int):
+    """生成充值页面文本和键盘（倒计时显示剩余时间）"""
+    minutes = remaining_seconds // 60
+    seconds = remaining_seconds % 60
+    time_display = f"{minutes:02d}:{seconds:02d}"
+    rate = exchange_rate_service.current()  # 每次刷新倒计时都会调用，只读取汇率缓存
     
     text = f"""Transfer the desired amount to the wallet below:
 
-{deposit_address}
+{DEPOSIT_ADDRESS}
 
 ❗Only TRX and USDT TRC20 are accepted for payment.
 
-When paying in USDT TRC20, the rate is 1 TRX = 0.38826 USDT. For example,
+When paying in USDT TRC20, the rate is 1 TRX = {rate.usdt_per_trx} USDT. For example,
 when replenishing the balance by 10 USDT
-your balance will receive: 25.75594 TRX
+your balance will receive: {rate.usdt_to_trx(Decimal(10)):.5f} TRX
 
 After replenishment, your balance will be updated within 5 minutes.
 
@@ -604,11 +647,15 @@ After replenishment, your balance will be updated within 5 minutes.
 
 A 10% fee applies to mistaken top-ups, withdrawals, or refunds to cover costs and maintain stable service. Please double-check before transferring funds.
 
-⚠️ Minimum deposit amount is 10 TRX / 10 USDT. If you send a smaller amount, the balance will not be credited  ⏳ [ 03:00 ]"""
+⚠️ Minimum deposit amount is 10 TRX / 10 USDT. If you send a smaller amount, the balance will not be credited  ⏳ [ {time_display} ]"""
     
     keyboard = InlineKeyboardMarkup([
         [InlineKeyboardButton("❌ Later", callback_data="deposit:later")]
     ])
+    return text, keyboard
+
+async def show_deposit_page(query, context):
+    text, keyboard = render_deposit_page(DEPOSIT_COUNTDOWN_SECONDS)
     
     # 删除原消息并发送新消息
     await query.delete_message()
@@ -620,66 +667,19 @@ A 10% fee applies to mistaken top-ups, withdrawals, or refunds to cover costs an
         reply_markup=keyboard
     )
     
-    # 启动倒计时任务
-    asyncio.create_task(countdown_timer(context, query.from_user.id, deposit_message.message_id))
-
-async def countdown_timer(context, chat_id: int, message_id: int):
-    """3分钟倒计时功能"""
-    deposit_address = "TYwv7C4Fik2tYuHBwuNSzrnJ4Bw7NukyRb"
-    
-    for remaining_seconds in range(180, -1, -5):  # 180秒到0，每5秒更新一次
-        minutes = remaining_seconds // 60
-        seconds = remaining_seconds % 60
-        time_display = f"{minutes:02d}:{seconds:02d}"
-        
-        text = f"""Transfer the desired amount to the wallet below:
-
-{deposit_address}
-
-❗Only TRX and USDT TRC20 are accepted for payment.
-
-When paying in USDT TRC20, the rate is 1 TRX = 0.38826 USDT. For example,
-when replenishing the balance by 10 USDT
-your balance will receive: 25.75594 TRX
-
-After replenishment, your balance will be updated within 5 minutes.
-
-🔁 Refund
-
-A 10% fee applies to mistaken top-ups, withdrawals, or refunds to cover costs and maintain stable service. Please double-check before transferring funds.
-
-⚠️ Minimum deposit amount is 10 TRX / 10 USDT. If you send a smaller amount, the balance will not be credited  ⏳ [ {time_display} ]"""
-        
-        keyboard = InlineKeyboardMarkup([
-            [InlineKeyboardButton("❌ Later", callback_data="deposit:later")]
-        ])
-        
-        try:
-            await context.bot.edit_message_text(
-                chat_id=chat_id,
-                message_id=message_id,
-                text=text,
-                reply_markup=keyboard
-            )
-        except Exception:
-            # 如果消息已被删除或编辑失败，停止倒计时
-            return
-            
-        if remaining_seconds > 0:
-            await asyncio.sleep(5)  # 等待5秒
-    
-    # 倒计时结束，删除消息
-    try:
-        await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
-    except Exception:
-        pass  # 忽略删除失败的情况
+    # 登记倒计时（由全局编辑调度器统一刷新，见 edit_scheduler.py）
+    edit_scheduler.add_countdown(
+        context.bot, query.from_user.id, deposit_message.message_id,
+        DEPOSIT_COUNTDOWN_SECONDS, render_deposit_page
+    )
 
 async def return_to_buy_energy_page(query, context):
     """返回闪租页面"""
     user_id = query.from_user.id
+    get_user_session(user_id).start_new_purchase()
     
     # 生成闪租页面内容
-    text = generate_buy_energy_text(user_id)
+    text = await generate_buy_energy_text(user_id)
     keyboard = generate_buy_energy_keyboard(user_id)
     
     # 编辑消息内容
@@ -694,30 +694,10 @@ async def show_order_details(query, context):
     tronscan_link = f"https://tronscan.org/#/transaction/{session.last_transaction_hash}"
     
     # 格式化能量数量显示
-    energy_value = session.selected_energy
-    if energy_value.endswith("K"):
-        if energy_value == "65K":
-            energy_display = "65 000"
-        elif energy_value == "135K":
-            energy_display = "135 000"
-        elif energy_value == "270K":
-            energy_display = "270 000"
-        elif energy_value == "540K":
-            energy_display = "540 000"
-        else:
-            energy_display = energy_value
-    elif energy_value.endswith("M"):
-        if energy_value == "1M":
-            energy_display = "1 000 000"
-        else:
-            energy_display = energy_value
-    elif energy_value.isdigit():
-        val = int(energy_value)
-        energy_display = f"{val:,}".replace(",", " ")
-    else:
-        energy_display = energy_value
+    energy_display, _ = energy_strings(session.selected_energy)
     
-    # 创建订单详情消息
+    # 创建订单详情消息（用户主动查看余额，跳过缓存）
+    user_balance = await session.get_user_balance(refresh=True)
     text = f"""📋 Order Details
 
 🆔 Order ID: {session.last_order_id}
@@ -726,7 +706,7 @@ async def show_order_details(query, context):
 ⚡ Quantity: {energy_display}
 📅 Duration: {session.selected_duration}
 💵 Cost: {session.computed_cost} TRX
-💰 Balance: {session.user_balance['TRX']} TRX"""
+💰 Balance: {user_balance['TRX']} TRX"""
     
     keyboard = InlineKeyboardMarkup([
         [
@@ -760,7 +740,7 @@ async def show_order_status(query, context):
     
     try:
         # 调用后端API查询订单状态
-        order_data = session.get_order_status(session.last_order_id)
+        order_data = await session.get_order_status(session.last_order_id)
         
         if order_data:
             # 格式化状态显示
@@ -10,9 +10,8 @@ sys.path.append('backend')
 
 import requests
 from tronpy.keys import PrivateKey
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from backend.app.database import Base
+from backend.app.database import Base, create_db_engine
 from backend.app.models import SupplierWallet
 from cryptography.fernet import Fernet
 import base64
@@ -39,7 +38,7 @@ def update_supplier_wallet_with_private_key():
     
     # 连接数据库
     DATABASE_URL = "sqlite:///backend/trx_energy.db"
-    engine = create_engine(DATABASE_URL)
+    engine = create_db_engine(DATABASE_URL)
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     
     db = SessionLocal()
@@ -0,0 +1,213 @@
+"""
+消息编辑调度器 - 由一个定时循环驱动所有倒计时消息，替代每条消息一个任务
+所有编辑经过全局令牌桶限速并遵守单聊天最小间隔；同一消息未发出的编辑只保留最新内容；
+活跃倒计时超过发送能力或遇到429时自动放慢刷新频率
+"""
+import asyncio
+import heapq
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+logger = logging.getLogger(__name__)
+
+EDIT_RATE_LIMIT = float(os.getenv("EDIT_RATE_LIMIT", "25"))  # 全局每秒最多发出的编辑数（Telegram约30条/秒）
+EDIT_CHAT_INTERVAL = float(os.getenv("EDIT_CHAT_INTERVAL", "1"))  # 同一聊天两次编辑的最小间隔（秒）
+COUNTDOWN_INTERVAL = int(os.getenv("COUNTDOWN_INTERVAL", "5"))  # 倒计时正常刷新间隔（秒）
+COUNTDOWN_MAX_INTERVAL = int(os.getenv("COUNTDOWN_MAX_INTERVAL", "30"))  # 高负载时最长刷新间隔（秒）
+SCHEDULER_TICK = 0.1  # 有待处理工作时的循环间隔（秒）
+
+# 待发送内容为None表示删除消息
+DELETE = None
+
+class _Countdown:
+    __slots__ = ("deadline", "render", "shown")
+
+    def __init__(self, deadline: float, render: Callable):
+        self.deadline = deadline
+        self.render = render  # 剩余秒数 -> (文本, 键盘)
+        self.shown = None  # 当前消息上显示的剩余秒数
+
+class EditScheduler:
+    """倒计时消息调度器（单事件循环内使用）"""
+
+    def __init__(self, rate: float = EDIT_RATE_LIMIT, chat_interval: float = EDIT_CHAT_INTERVAL,
+                 base_interval: int = COUNTDOWN_INTERVAL, max_interval: int = COUNTDOWN_MAX_INTERVAL):
+        self.rate = rate
+        self.chat_interval = chat_interval
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self._bot = None
+        self._task = None
+        self._wakeup = None
+        self._countdowns: Dict[Tuple[int, int], _Countdown] = {}
+        self._timers = []  # (到期时间, 消息键) 小顶堆
+        self._pending = OrderedDict()  # 消息键 -> 待发送内容（同一消息只保留最新内容）
+        self._inflight = set()
+        self._send_tasks = set()
+        self._chat_ready_at: Dict[int, float] = {}
+        self._tokens = rate
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self.sent = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.failures = 0
+
+    def add_countdown(self, bot, chat_id: int, message_id: int, seconds: int, render: Callable):
+        """登记倒计时消息：到期前按当前刷新间隔更新剩余时间，到期后删除消息"""
+        self._ensure_started(bot)
+        key = (chat_id, message_id)
+        now = time.monotonic()
+        countdown = _Countdown(now + seconds, render)
+        countdown.shown = seconds  # 发送时已显示完整时长
+        self._countdowns[key] = countdown
+        heapq.heappush(self._timers, (now + min(self.base_interval, seconds), key))
+        self._wakeup.set()
+
+    def cancel(self, chat_id: int, message_id: int):
+        """取消倒计时（用户已关闭消息）"""
+        key = (chat_id, message_id)
+        self._countdowns.pop(key, None)
+        self._pending.pop(key, None)
+
+    def current_interval(self) -> int:
+        """当前刷新间隔：活跃倒计时或积压编辑超过发送能力、或被限流时放慢"""
+        capacity = self.rate * self.base_interval  # 一个刷新周期内能发出的编辑数
+        factor = max(1, math.ceil(max(len(self._countdowns), len(self._pending)) / capacity))
+        if time.monotonic() < self._paused_until:
+            factor *= 2
+        return min(self.max_interval, self.base_interval * factor)
+
+    def stats(self) -> Dict:
+        """队列深度与发送情况"""
+        return {
+            "active_countdowns": len(self._countdowns),
+            "queue_depth": len(self._pending),
+            "inflight": len(self._inflight),
+            "interval": self.current_interval(),
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "rate_limited": self.rate_limited,
+            "failures": self.failures
+        }
+
+    async def stop(self):
+        """停止调度循环（未发出的编辑丢弃）"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _ensure_started(self, bot):
+        self._bot = bot
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name="edit-scheduler")
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            self._schedule_due(now)
+            self._dispatch(now)
+
+            self._wakeup.clear()
+            if self._countdowns or self._pending or self._inflight:
+                await asyncio.sleep(SCHEDULER_TICK)
+            else:
+                await self._wakeup.wait()
+
+    def _schedule_due(self, now: float):
+        """到期的倒计时生成编辑（剩余时间按正常刷新间隔向上取整显示）"""
+        interval = self.current_interval()
+        while self._timers and self._timers[0][0] <= now:
+            _, key = heapq.heappop(self._timers)
+            countdown = self._countdowns.get(key)
+            if countdown is None:
+                continue  # 已取消
+
+            remaining = countdown.deadline - now
+            if remaining <= 0:
+                del self._countdowns[key]
+                self._enqueue(key, DELETE)
+                continue
+
+            shown = math.ceil(remaining / self.base_interval) * self.base_interval
+            if shown != countdown.shown:
+                countdown.shown = shown
+                self._enqueue(key, countdown.render(shown))
+            heapq.heappush(self._timers, (now + min(interval, remaining), key))
+
+    def _enqueue(self, key, payload):
+        if key in self._pending:
+            self.coalesced += 1
+        self._pending[key] = payload
+
+    def _dispatch(self, now: float):
+        """按令牌桶和单聊天间隔发出待发送的编辑"""
+        if now < self._paused_until:
+            return
+
+        self._tokens = min(self.rate, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+        if self._chat_ready_at:
+            # 清理已过间隔的聊天（倒计时被取消或编辑失败时不会再有删除消息来清理）
+            self._chat_ready_at = {chat_id: ready_at for chat_id, ready_at in self._chat_ready_at.items() if ready_at > now}
+
+        for key in list(self._pending):
+            if self._tokens < 1:
+                break
+            if key in self._inflight or self._chat_ready_at.get(key[0], 0) > now:
+                continue
+
+            payload = self._pending.pop(key)
+            self._tokens -= 1
+            self._chat_ready_at[key[0]] = now + self.chat_interval
+            self._inflight.add(key)
+            task = asyncio.create_task(self._send(key, payload))
+            self._send_tasks.add(task)
+            task.add_done_callback(self._send_tasks.discard)
+
+    async def _send(self, key, payload):
+        chat_id, message_id = key
+        try:
+            if payload is DELETE:
+                self._chat_ready_at.pop(chat_id, None)
+                await self._bot.delete_message(chat_id=chat_id, message_id=message_id)
+            else:
+                text, reply_markup = payload
+                await self._bot.edit_message_text(
+                    chat_id=chat_id, message_id=message_id, text=text, reply_markup=reply_markup
+                )
+            self.sent += 1
+        except RetryAfter as e:
+            # 全局暂停并重新排队（已有更新内容时保留更新内容）
+            self.rate_limited += 1
+            self._paused_until = time.monotonic() + float(e.retry_after)
+            if payload is DELETE or key in self._countdowns:
+                self._pending.setdefault(key, payload)
+            logger.warning(f"消息编辑被限流，暂停 {e.retry_after} 秒，积压 {len(self._pending)} 条")
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                # 消息已被删除或无法编辑，停止该倒计时
+                self.failures += 1
+                self.cancel(chat_id, message_id)
+        except Forbidden:
+            self.failures += 1
+            self.cancel(chat_id, message_id)
+        except Exception as e:
+            # 网络错误：丢弃本次编辑，下次刷新时重试
+            self.failures += 1
+            logger.debug(f"消息编辑失败 {key}: {e}")
+        finally:
+            self._inflight.discard(key)
+
+# 全局编辑调度器实例
+edit_scheduler = EditScheduler()
@@ -0,0 +1,182 @@
+"""
+汇率服务 - TRX/USDT汇率按计划从配置的来源刷新，缓存到共享文件并带有效期和版本号
+后端定期刷新并按快照入账（充值记录保存所用汇率与版本）；机器人只读取缓存文件渲染页面，不发起网络请求
+"""
+import json
+import logging
+import os
+import threading
+import time
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Dict, NamedTuple, Optional, Union
+import requests
+from pricing import write_snapshot
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USDT_PER_TRX = "0.38826"  # 未配置来源时的固定汇率（1 TRX = 0.38826 USDT）
+
+EXCHANGE_RATE_SOURCE = os.getenv("EXCHANGE_RATE_SOURCE", f"static:{DEFAULT_USDT_PER_TRX}")  # static:<汇率> / file:<路径> / http(s)://...
+EXCHANGE_RATE_FIELD = os.getenv("EXCHANGE_RATE_FIELD", "usdt_per_trx")  # 来源JSON中的汇率字段（点号分隔的路径）
+EXCHANGE_RATE_FILE = os.getenv(
+    "EXCHANGE_RATE_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "exchange_rate.json")
+)
+EXCHANGE_RATE_TTL = float(os.getenv("EXCHANGE_RATE_TTL", "3600"))  # 汇率有效期（秒），过期后不再用于入账
+EXCHANGE_RATE_RELOAD_INTERVAL = float(os.getenv("EXCHANGE_RATE_RELOAD_INTERVAL", "5"))  # 检查缓存文件变化的最小间隔（秒）
+EXCHANGE_RATE_TIMEOUT = float(os.getenv("EXCHANGE_RATE_TIMEOUT", "10"))
+
+class ExchangeRateUnavailable(ValueError):
+    """没有有效期内的汇率"""
+
+class RateSnapshot(NamedTuple):
+    """汇率快照（汇率不变时刷新只延长有效期，版本号不变）"""
+    usdt_per_trx: Decimal
+    version: str
+    source: str
+    fetched_at: float
+    valid_until: float
+
+    @property
+    def trx_per_usdt(self) -> Decimal:
+        return 1 / self.usdt_per_trx
+
+    def is_valid(self) -> bool:
+        return time.time() < self.valid_until
+
+    def usdt_to_trx(self, amount: Decimal) -> Decimal:
+        return amount / self.usdt_per_trx
+
+    def to_dict(self) -> Dict:
+        return {
+            "usdt_per_trx": str(self.usdt_per_trx),
+            "version": self.version,
+            "source": self.source,
+            "fetched_at": self.fetched_at,
+            "valid_until": self.valid_until
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "RateSnapshot":
+        return cls(Decimal(str(data["usdt_per_trx"])), str(data["version"]), data.get("source", ""),
+                   float(data["fetched_at"]), float(data["valid_until"]))
+
+# 缓存文件不存在时的兜底快照（仅用于展示，已过期，不用于入账）
+DEFAULT_SNAPSHOT = RateSnapshot(Decimal(DEFAULT_USDT_PER_TRX), "default", "default", 0.0, 0.0)
+
+def _read_field(data, field: str):
+    for key in field.split("."):
+        data = data[key]
+    return data
+
+def load_rate_source(spec: str, field: str = EXCHANGE_RATE_FIELD) -> Callable[[], Decimal]:
+    """按配置创建汇率来源：static:<汇率>、file:<JSON文件路径> 或返回JSON的 http(s) 地址"""
+    if spec.startswith("static:"):
+        rate = Decimal(spec[len("static:"):])
+        return lambda: rate
+
+    if spec.startswith("file:"):
+        path = spec[len("file:"):]
+
+        def read_file() -> Decimal:
+            with open(path, "r", encoding="utf-8") as f:
+                return Decimal(str(_read_field(json.load(f), field)))
+        return read_file
+
+    if spec.startswith(("http://", "https://")):
+        def fetch() -> Decimal:
+            response = requests.get(spec, timeout=EXCHANGE_RATE_TIMEOUT)
+            response.raise_for_status()
+            return Decimal(str(_read_field(response.json(), field)))
+        return fetch
+
+    raise ValueError(f"不支持的汇率来源: {spec}")
+
+class ExchangeRateService:
+    """汇率服务：current() 只读缓存文件，refresh() 查询来源并写入缓存文件"""
+
+    def __init__(self, source: Union[str, Callable[[], Decimal]] = EXCHANGE_RATE_SOURCE,
+                 path: Optional[str] = EXCHANGE_RATE_FILE, ttl: float = EXCHANGE_RATE_TTL,
+                 reload_interval: float = EXCHANGE_RATE_RELOAD_INTERVAL):
+        self.source_name = source if isinstance(source, str) else getattr(source, "__name__", "custom")
+        self._source = source
+        self.path = path
+        self.ttl = ttl
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._snapshot: Optional[RateSnapshot] = None
+        self._mtime = None
+        self._checked_at = 0.0
+
+    @property
+    def source(self) -> Callable[[], Decimal]:
+        if isinstance(self._source, str):
+            self._source = load_rate_source(self._source)
+        return self._source
+
+    def current(self) -> RateSnapshot:
+        """当前汇率快照（不发起网络请求；缓存文件不存在时返回兜底快照）"""
+        if self._snapshot is None or time.monotonic() - self._checked_at >= self.reload_interval:
+            self._reload()
+        return self._snapshot or DEFAULT_SNAPSHOT
+
+    def rate_for_deposit(self) -> RateSnapshot:
+        """入账用汇率：缓存已过期时立即刷新，刷新失败时拒绝使用过期汇率"""
+        snapshot = self.current()
+        if snapshot.is_valid():
+            return snapshot
+        try:
+            return self.refresh()
+        except Exception as e:
+            raise ExchangeRateUnavailable(f"汇率已过期且刷新失败: {e}")
+
+    def refresh(self) -> RateSnapshot:
+        """从来源刷新汇率并写入缓存文件"""
+        rate = self.source()
+        if rate <= 0:
+            raise ValueError(f"汇率无效: {rate}")
+
+        self.current()  # 先读取缓存文件，汇率未变化时沿用版本号
+        with self._lock:
+            now = time.time()
+            previous = self._snapshot
+            if previous is not None and previous.usdt_per_trx == rate and previous.source == self.source_name:
+                version = previous.version
+            else:
+                # 版本号为UTC时间（精确到毫秒），保证递增
+                version = time.strftime("%Y%m%d%H%M%S", time.gmtime(now)) + f"{int(now * 1000) % 1000:03d}"
+                if previous is not None and previous.version.isdigit() and version <= previous.version:
+                    version = str(int(previous.version) + 1)
+            snapshot = RateSnapshot(rate, version, self.source_name, now, now + self.ttl)
+            if self.path:
+                write_snapshot(self.path, snapshot.to_dict())
+                self._mtime = self._file_mtime()
+            self._snapshot = snapshot
+            self._checked_at = time.monotonic()
+
+        if previous is None or previous.version != version:
+            logger.info(f"汇率已更新: 1 TRX = {rate} USDT（版本 {version}）")
+        return snapshot
+
+    def _reload(self):
+        with self._lock:
+            self._checked_at = time.monotonic()
+            mtime = self._file_mtime()
+            if mtime is None or mtime == self._mtime:
+                return
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._snapshot = RateSnapshot.from_dict(json.load(f))
+                self._mtime = mtime
+            except (IOError, KeyError, TypeError, ValueError, InvalidOperation) as e:
+                logger.error(f"读取汇率缓存失败，保留当前汇率: {e}")
+
+    def _file_mtime(self):
+        if not self.path:
+            return None
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+# 全局汇率服务实例
+exchange_rate_service = ExchangeRateService()
@@ -1,15 +1,24 @@
 # -*- coding: utf-8 -*-
 import encoding_fix  # 必须在最开始导入，修复Windows编码问题
+from dotenv import load_dotenv
+
+# 加载环境变量（须在导入读取配置的模块之前）
+load_dotenv()
+
 import logging
 import asyncio
 import os
 import sys
 import time
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, BotCommand
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes, MessageHandler, filters
-from dotenv import load_dotenv
+from telegram.ext import CommandHandler, CallbackQueryHandler, ContextTypes, MessageHandler, TypeHandler, filters
 from tron_api import TronAPI
-from models import get_user_session, format_energy
+from models import get_user_session, acquire_user_session, release_user_session, session_store, wallet_store, wallet_cache, format_energy
+from backend_api_client import backend_api
+from balance_events import start_balance_listener
+from edit_scheduler import edit_scheduler
+from address_balance_cache import address_balance_cache, balance_label
+from bot_runtime import BOT_MODE, build_application, run_application
 from buy_energy import handle_buy_energy_callback, generate_buy_energy_text, generate_buy_energy_keyboard
 from config import TRON_NETWORK
 
@@ -22,9 +31,6 @@ except ImportError:
     print("⚠️  psutil库未安装，跳过实例检查功能")
     print("   可以运行: pip install psutil 来启用自动实例管理")
 
-# 加载环境变量
-load_dotenv()
-
 # 配置日志
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -36,10 +42,34 @@ logger = logging.getLogger(__name__)
 logging.getLogger("httpx").setLevel(logging.WARNING)
 
 
+# 会话存储、钱包地址缓存与编辑调度统计日志间隔（秒）
+SESSION_STATS_LOG_INTERVAL = float(os.getenv("SESSION_STATS_LOG_INTERVAL", "600"))
+
+async def prepare_user_session(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """更新处理前加载会话（在处理器分组-1中执行，早于业务处理器；持久层读取不阻塞事件循环）"""
+    if update.effective_user:
+        await acquire_user_session(update.effective_user.id)
+
+async def persist_user_session(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """更新处理完成后将会话状态写回持久层（在处理器分组1中执行，晚于业务处理器）"""
+    if update.effective_user:
+        await release_user_session(update.effective_user.id)
+
+async def log_session_stats(application):
+    """定期记录会话存储占用、钱包地址缓存命中率、编辑调度队列深度与更新处理排队情况"""
+    while True:
+        await asyncio.sleep(SESSION_STATS_LOG_INTERVAL)
+        logger.info(f"会话存储: {await session_store.stats()}")
+        logger.info(f"钱包地址缓存: {wallet_cache.stats()}")
+        logger.info(f"地址余额缓存: {address_balance_cache.stats()}")
+        logger.info(f"倒计时编辑调度: {edit_scheduler.stats()}")
+        logger.info(f"更新处理: {application.update_processor.stats()}")
+
 async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """处理所有回调查询"""
     query = update.callback_query
     callback_data = query.data
+    get_user_session(query.from_user.id).view_seq += 1
     
     # 路由到不同的处理器
     if callback_data.startswith("main:buy_energy") or callback_data.startswith("buy_energy:"):
@@ -77,13 +107,21 @@ async def handle_address_callback(update: Update, context: ContextTypes.DEFAULT_
         
         # 从用户的钱包地址列表中获取地址
         from models import get_wallet_addresses
-        user_addresses = get_wallet_addresses(user_id)
+        user_addresses = await get_wallet_addresses(user_id)
         
         if addr_index < len(user_addresses):
             session.selected_address = user_addresses[addr_index]
+            # 列表页已预取余额时直接显示
+            cached_balance = address_balance_cache.get(session.selected_address)
+            session.address_balance = {
+                'TRX': f"{cached_balance.trx_balance:.6f}",
+                'USDT': f"{cached_balance.usdt_balance:.6f}",
+                'ENERGY': f"{cached_balance.energy_available:,}",
+                'BANDWIDTH': f"{cached_balance.bandwidth_available:,}"
+            } if cached_balance else None
             
             # 返回闪租页
-            text = generate_buy_energy_text(user_id)
+            text = await generate_buy_energy_text(user_id)
             keyboard = generate_buy_energy_keyboard(user_id)
             await query.edit_message_text(text, reply_markup=keyboard, parse_mode='Markdown')
         else:
@@ -115,7 +153,7 @@ async def handle_address_callback(update: Update, context: ContextTypes.DEFAULT_
         
     elif callback_data == "address:back":
         # 返回闪租页
-        text = generate_buy_energy_text(user_id)
+        text = await generate_buy_energy_text(user_id)
         keyboard = generate_buy_energy_keyboard(user_id)
         await query.edit_message_text(text, reply_markup=keyboard, parse_mode='Markdown')
         
@@ -159,7 +197,7 @@ async def handle_payment_callback(update: Update, context: ContextTypes.DEFAULT_
         
     elif callback_data == "buy_energy:back":
         # 返回闪租页
-        text = generate_buy_energy_text(user_id)
+        text = await generate_buy_energy_text(user_id)
         keyboard = generate_buy_energy_keyboard(user_id)
         await query.edit_message_text(text, reply_markup=keyboard, parse_mode='Markdown')
 
@@ -172,7 +210,7 @@ async def handle_wallet_management(update: Update, context: ContextTypes.DEFAULT
     
     # 获取用户的钱包地址列表
     from models import get_wallet_addresses
-    user_addresses = get_wallet_addresses(user_id)
+    user_addresses = await get_wallet_addresses(user_id)
     
     if not user_addresses:
         text = """🏦 钱包管理
@@ -191,20 +229,34 @@ async def handle_wallet_management(update: Update, context: ContextTypes.DEFAULT
 
 地址列表："""
         
-        keyboard = []
-        for i, addr in enumerate(user_addresses):
-            short_addr = f"{addr[:8]}...{addr[-6:]}"
-            keyboard.append([
-                InlineKeyboardButton(f"📍 {short_addr}", callback_data=f"wallet:view:{i}"),
-                InlineKeyboardButton("❌", callback_data=f"wallet:delete:{i}")
-            ])
-        
-        keyboard.extend([
-            [InlineKeyboardButton("➕ 添加新地址", callback_data="wallet:add")],
-            [InlineKeyboardButton("🏠 返回主菜单", callback_data="main:home")]
-        ])
+        keyboard = wallet_management_keyboard(user_addresses)
     
     await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode='Markdown')
+    
+    # 后台预取所有地址余额，完成后列表原地显示TRX/能量
+    address_balance_cache.start_prefetch(
+        get_user_session(user_id), query.message, user_addresses,
+        lambda: InlineKeyboardMarkup(wallet_management_keyboard(user_addresses))
+    )
+
+def wallet_management_keyboard(user_addresses: list) -> list:
+    """钱包管理地址列表按钮（已缓存余额的地址显示TRX/能量）"""
+    keyboard = []
+    for i, addr in enumerate(user_addresses):
+        short_addr = f"{addr[:8]}...{addr[-6:]}"
+        keyboard.append([
+            InlineKeyboardButton(
+                f"📍 {short_addr}{balance_label(address_balance_cache.get(addr))}",
+                callback_data=f"wallet:view:{i}"
+            ),
+            InlineKeyboardButton("❌", callback_data=f"wallet:delete:{i}")
+        ])
+    
+    keyboard.extend([
+        [InlineKeyboardButton("➕ 添加新地址", callback_data="wallet:add")],
+        [InlineKeyboardButton("🏠 返回主菜单", callback_data="main:home")]
+    ])
+    return keyboard
 
 async def handle_wallet_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """处理钱包相关回调"""
@@ -242,7 +294,7 @@ async def handle_wallet_callback(update: Update, context: ContextTypes.DEFAULT_T
         # 查看地址详情
         addr_index = int(callback_data.split(":")[-1])
         from models import get_wallet_addresses
-        user_addresses = get_wallet_addresses(user_id)
+        user_addresses = await get_wallet_addresses(user_id)
         
         if addr_index < len(user_addresses):
             address = user_addresses[addr_index]
@@ -254,7 +306,7 @@ async def handle_wallet_callback(update: Update, context: ContextTypes.DEFAULT_T
         # 删除地址确认
         addr_index = int(callback_data.split(":")[-1])
         from models import get_wallet_addresses
-        user_addresses = get_wallet_addresses(user_id)
+        user_addresses = await get_wallet_addresses(user_id)
         
         if addr_index < len(user_addresses):
             address = user_addresses[addr_index]
@@ -283,11 +335,11 @@ async def handle_wallet_callback(update: Update, context: ContextTypes.DEFAULT_T
         # 确认删除地址
         addr_index = int(callback_data.split(":")[-1])
         from models import get_wallet_addresses, remove_wallet_address
-        user_addresses = get_wallet_addresses(user_id)
+        user_addresses = await get_wallet_addresses(user_id)
         
         if addr_index < len(user_addresses):
             address = user_addresses[addr_index]
-            if remove_wallet_address(user_id, address):
+            if await remove_wallet_address(user_id, address):
                 await query.answer("✅ 地址已删除", show_alert=True)
                 # 返回钱包管理页面
                 await handle_wallet_management(update, context)
@@ -311,41 +363,11 @@ async def handle_wallet_callback(update: Update, context: ContextTypes.DEFAULT_T
         address = callback_data.split(":", 2)[-1]  # 获取完整地址
         await refresh_wallet_address_balance(query, context, address)
 
-async def show_address_details(query, context, address):
-    """显示地址详情"""
-    user_id = query.from_user.id
-    
-    # 先显示基本信息
+def address_details_text(address: str, balance, footer: str = "") -> str:
+    """地址详情文本"""
     short_addr = f"{address[:8]}...{address[-6:]}"
-    text = f"""📍 钱包地址详情
-
-地址: {short_addr}
-`{address}`
-
-🔄 正在查询余额信息..."""
-    
-    keyboard = InlineKeyboardMarkup([
-        [
-            InlineKeyboardButton("🔄 刷新余额", callback_data=f"wallet:refresh:{address}"),
-            InlineKeyboardButton("⬅️ 返回", callback_data="wallet:back")
-        ]
-    ])
-    
-    await query.edit_message_text(text, reply_markup=keyboard, parse_mode='Markdown')
-    
-    # 异步查询余额
-    try:
-        from tron_api import TronAPI
-        import os
-        api = TronAPI(
-            network=TRON_NETWORK,
-            api_key=os.getenv('TRON_API_KEY')
-        )
-        
-        balance = api.get_account_balance(address)
-        
-        if balance:
-            text = f"""📍 钱包地址详情
+    if balance:
+        text = f"""📍 钱包地址详情
 
 地址: {short_addr}
 `{address}`
@@ -355,30 +377,50 @@ TRX: {balance.trx_balance:.6f}
 USDT: {balance.usdt_balance:.6f}
 ENERGY: {balance.energy_available:,}
 BANDWIDTH: {balance.bandwidth_available:,}"""
-        else:
-            text = f"""📍 钱包地址详情
+    else:
+        text = f"""📍 钱包地址详情
 
 地址: {short_addr}
 `{address}`
 
 ❌ 地址可能未激活或网络异常
 💡 新地址需要先接收至少0.1 TRX才会被激活"""
-            
-    except Exception as e:
-        text = f"""📍 钱包地址详情
+    return text + footer
+
+def address_details_keyboard(address: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton("🔄 刷新余额", callback_data=f"wallet:refresh:{address}"),
+            InlineKeyboardButton("⬅️ 返回", callback_data="wallet:back")
+        ]
+    ])
+
+async def show_address_details(query, context, address):
+    """显示地址详情（列表页已预取余额时直接显示）"""
+    keyboard = address_details_keyboard(address)
+    
+    cached_balance = address_balance_cache.get(address)
+    if cached_balance:
+        await query.edit_message_text(address_details_text(address, cached_balance), reply_markup=keyboard, parse_mode='Markdown')
+        return
+    
+    # 先显示基本信息
+    short_addr = f"{address[:8]}...{address[-6:]}"
+    text = f"""📍 钱包地址详情
 
 地址: {short_addr}
 `{address}`
 
-❌ 查询余额时发生错误
-请稍后重试"""
+🔄 正在查询余额信息..."""
     
     await query.edit_message_text(text, reply_markup=keyboard, parse_mode='Markdown')
+    
+    # 异步查询余额（预取进行中时复用同一次查询）
+    balance = await address_balance_cache.fetch(address)
+    await query.edit_message_text(address_details_text(address, balance), reply_markup=keyboard, parse_mode='Markdown')
 
 async def refresh_wallet_address_balance(query, context, address):
     """刷新钱包地址余额"""
-    user_id = query.from_user.id
-    
     # 显示刷新中的消息
     short_addr = f"{address[:8]}...{address[-6:]}"
     loading_text = f"""📍 钱包地址详情
@@ -388,60 +430,13 @@ async def refresh_wallet_address_balance(query, context, address):
 
 🔄 正在刷新余额信息..."""
     
-    keyboard = InlineKeyboardMarkup([
-        [
-            InlineKeyboardButton("🔄 刷新余额", callback_data=f"wallet:refresh:{address}"),
-            InlineKeyboardButton("⬅️ 返回", callback_data="wallet:back")
-        ]
-    ])
+    keyboard = address_details_keyboard(address)
     
     await query.edit_message_text(loading_text, reply_markup=keyboard, parse_mode='Markdown')
     
-    # 异步查询余额
-    try:
-        from tron_api import TronAPI
-        import os
-        api = TronAPI(
-            network=TRON_NETWORK,
-            api_key=os.getenv('TRON_API_KEY')
-        )
-        
-        balance = api.get_account_balance(address)
-        
-        if balance:
-            text = f"""📍 钱包地址详情
-
-地址: {short_addr}
-`{address}`
-
-💰 余额信息:
-TRX: {balance.trx_balance:.6f}
-USDT: {balance.usdt_balance:.6f}
-ENERGY: {balance.energy_available:,}
-BANDWIDTH: {balance.bandwidth_available:,}
-
-🕒 最后更新: 刚刚"""
-        else:
-            text = f"""📍 钱包地址详情
-
-地址: {short_addr}
-`{address}`
-
-❌ 地址可能未激活或网络异常
-💡 新地址需要先接收至少0.1 TRX才会被激活
-
-🕒 最后更新: 刚刚"""
-            
-    except Exception as e:
-        text = f"""📍 钱包地址详情
-
-地址: {short_addr}
-`{address}`
-
-❌ 查询余额时发生错误
-请稍后重试
-
-🕒 最后更新: 刚刚"""
+    # 跳过缓存查询上游，结果同时更新缓存
+    balance = await address_balance_cache.fetch(address, refresh=True)
+    text = address_details_text(address, balance, footer="\n\n🕒 最后更新: 刚刚")
     
     await query.edit_message_text(text, reply_markup=keyboard, parse_mode='Markdown')
 
@@ -450,6 +445,7 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
     user_id = update.effective_user.id
     text = update.message.text.strip()
     session = get_user_session(user_id)
+    session.view_seq += 1
     
     if session.pending_input == "custom_energy":
         # 处理自定义能量输入
@@ -468,7 +464,7 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
             
             # 这里需要更新原来的闪租卡片，但需要消息ID
             # 简单起见，我们发送新的卡片
-            text_content = generate_buy_energy_text(user_id)
+            text_content = await generate_buy_energy_text(user_id)
             keyboard = generate_buy_energy_keyboard(user_id)
             await update.message.reply_text(text_content, reply_markup=keyboard, parse_mode='Markdown')
             
@@ -481,7 +477,7 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
         
         if is_valid_tron_address(text):
             # 地址格式有效，尝试添加
-            if add_wallet_address(user_id, text):
+            if await add_wallet_address(user_id, text):
                 # 添加成功，自动选择这个地址
                 session.selected_address = text
                 session.pending_input = None
@@ -489,7 +485,7 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
                 await update.message.reply_text(f"✅ 地址添加成功：`{text[:6]}...{text[-6:]}`\n\n🎯 已自动选择此地址用于接收能量。", parse_mode='Markdown')
                 
                 # 发送新的闪租卡片
-                text_content = generate_buy_energy_text(user_id)
+                text_content = await generate_buy_energy_text(user_id)
                 keyboard = generate_buy_energy_keyboard(user_id)
                 await update.message.reply_text(text_content, reply_markup=keyboard, parse_mode='Markdown')
             else:
@@ -504,7 +500,7 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
         
         if is_valid_tron_address(text):
             # 地址格式有效，尝试添加
-            if add_wallet_address(user_id, text):
+            if await add_wallet_address(user_id, text):
                 # 添加成功
                 session.pending_input = None
                 
@@ -512,7 +508,7 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
                 
                 # 发送新的钱包管理页面
                 from models import get_wallet_addresses
-                user_addresses = get_wallet_addresses(user_id)
+                user_addresses = await get_wallet_addresses(user_id)
                 
                 text_content = f"""🏦 钱包管理
 
@@ -565,7 +561,7 @@ async def handle_balance_query(update: Update, context: ContextTypes.DEFAULT_TYP
     
     try:
         # 查询余额
-        balance = api.get_account_balance(address)
+        balance = await asyncio.to_thread(api.get_account_balance, address)  # 同步HTTP请求放到线程中，不阻塞其他更新
         
         if balance:
             # 查询成功，显示结果
@@ -796,29 +792,47 @@ def main():
     if not bot_token:
         raise ValueError("请在.env文件中设置TELEGRAM_BOT_TOKEN环境变量，或在config.py中设置BOT_TOKEN")
     
-    # 使用获取到的Bot Token
-    application = Application.builder().token(bot_token).build()
+    # 使用获取到的Bot Token（并发处理更新，同一聊天内保持顺序）
+    application = build_application(bot_token)
     
     # 添加处理器
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CallbackQueryHandler(handle_callback_query))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_message))
+    application.add_handler(TypeHandler(Update, prepare_user_session), group=-1)
+    application.add_handler(TypeHandler(Update, persist_user_session), group=1)
     
-    # 设置机器人菜单命令
+    # 设置机器人菜单命令，启动余额变动订阅（后端余额变动时使缓存失效）与会话占用日志
     async def post_init(application):
         await setup_bot_commands(application)
+        application.bot_data["balance_listener"] = start_balance_listener()
+        application.bot_data["session_stats"] = asyncio.create_task(log_session_stats(application))
     
     application.post_init = post_init
     
+    # 停止时取消后台任务，关闭后端API连接池与本地存储
+    async def post_shutdown(application):
+        for name in ("balance_listener", "session_stats"):
+            task = application.bot_data.get(name)
+            if task:
+                task.cancel()
+        await edit_scheduler.stop()
+        await backend_api.aclose()
+        await session_store.close()
+        wallet_store.close()
+    
+    application.post_shutdown = post_shutdown
+    
     # 启动Bot
     print(f"✅ Bot配置完成，正在连接Telegram...")
     print(f"📡 网络: {TRON_NETWORK}")
+    print(f"🔀 运行模式: {BOT_MODE}")
     print(f"📁 工作目录: {os.getcwd()}")
     print("-" * 60)
     print("Bot正在运行中... 按 Ctrl+C 停止")
     print("=" * 60)
     try:
-        application.run_polling(drop_pending_updates=True, close_loop=False)
+        run_application(application)
     except KeyboardInterrupt:
         print("\n" + "=" * 60)
         print("🛑 Bot已停止")
@@ -1,12 +1,28 @@
 import logging
-import json
 import os
-from typing import List, Dict, Optional
-from backend_api_client import backend_api
+import time
+import uuid
+from typing import List, Dict, Optional, Tuple
+from backend_api_client import QuoteChangedError, backend_api
+from pricing import parse_energy, quote_engine
+from session_store import SessionStore, create_session_backend
+from wallet_store import WalletStore
+from wallet_cache import WalletListCache
 
 logger = logging.getLogger(__name__)
 
+# 用户余额缓存有效期（秒）；扣款、充值和退款后由后端推送的余额变动事件失效，未启用事件时依靠有效期
+BALANCE_CACHE_TTL = float(os.getenv("BALANCE_CACHE_TTL", "30"))
+
 class UserSession:
+    # 需要持久化的会话字段（余额缓存、钱包列表等可从后端重新获取的数据不持久化）
+    PERSISTED_FIELDS = (
+        "selected_duration", "selected_energy", "selected_address", "computed_cost",
+        "pending_input", "address_balance", "show_balance_in_buy_page",
+        "last_order_id", "last_transaction_hash", "last_order_time",
+        "_purchase_key", "_purchase_selection"
+    )
+    
     def __init__(self, user_id: int = None):
         self.user_id = user_id
         self.selected_duration = "1h"  # 默认选择1小时
@@ -14,49 +30,106 @@ class UserSession:
         self.selected_address = None
         self.computed_cost = "0.00"
         self._user_balance = None  # 缓存用户余额
+        self._user_balance_at = 0.0  # 余额缓存时间（monotonic）
         self.pending_input = None  # 用于跟踪等待的用户输入类型
         self.address_balance = None  # 存储地址余额信息 {"TRX": "18.900009", "ENERGY": "0"}
         self.wallet_addresses = []  # 用户绑定的钱包地址列表
         self.show_balance_in_buy_page = False  # 是否在购买页面显示余额信息
+        self.view_seq = 0  # 页面版本：每次回调或文本输入递增，后台任务据此判断用户是否已切换页面
         # 订单相关信息
         self.last_order_id = None  # 最近一次订单ID
         self.last_transaction_hash = None  # 最近一次交易哈希
         self.last_order_time = None  # 最近一次订单时间
+        # 下单幂等键：请求失败或超时后重新确认（相同选择）时沿用，订单创建成功后作废
+        self._purchase_key = None
+        self._purchase_selection = None
+    
+    def to_state(self) -> Dict:
+        """导出需要持久化的状态（省略默认值，保持紧凑）"""
+        defaults = _DEFAULT_STATE
+        return {
+            field: getattr(self, field) for field in self.PERSISTED_FIELDS
+            if getattr(self, field) != defaults[field]
+        }
+    
+    def apply_state(self, state: Dict):
+        """用持久化状态覆盖当前字段（缺省字段恢复默认值）"""
+        for field in self.PERSISTED_FIELDS:
+            setattr(self, field, state.get(field, _DEFAULT_STATE[field]))
+        if self._purchase_selection is not None:
+            self._purchase_selection = tuple(self._purchase_selection)
+    
+    @classmethod
+    def from_state(cls, user_id: int, state: Optional[Dict] = None) -> "UserSession":
+        """由持久化状态恢复会话"""
+        session = cls(user_id=user_id)
+        if state:
+            session.apply_state(state)
+        return session
+    
+    def purchase_key(self, energy_amount: int, duration: str, receive_address: str) -> str:
+        """获取当前购买的幂等键，选择变化后生成新键"""
+        selection = (energy_amount, duration, receive_address)
+        if self._purchase_key is None or self._purchase_selection != selection:
+            self._purchase_key = f"{self.user_id}:{uuid.uuid4()}"
+            self._purchase_selection = selection
+        return self._purchase_key
+    
+    def start_new_purchase(self):
+        """开始新一次购买（进入闪租页或订单创建成功时调用）"""
+        self._purchase_key = None
+        self._purchase_selection = None
+    
+    def invalidate_balance(self):
+        """使余额缓存失效，下次读取时重新查询后端"""
+        self._user_balance = None
+        self._user_balance_at = 0.0
     
-    @property
-    def user_balance(self) -> Dict[str, str]:
-        """获取用户余额（调用后端API）"""
+    async def get_user_balance(self, refresh: bool = False) -> Dict[str, str]:
+        """获取用户余额（调用后端API，结果在会话内缓存 BALANCE_CACHE_TTL 秒）"""
         if self.user_id is None:
             return {"TRX": "0.000", "USDT": "0.00"}
         
+        if (not refresh and self._user_balance is not None
+                and time.monotonic() - self._user_balance_at < BALANCE_CACHE_TTL):
+            return self._user_balance
+        
         # 尝试从后端API获取真实余额
         try:
-            balance_data = backend_api.get_user_balance(self.user_id)
+            balance_data = await backend_api.get_user_balance(self.user_id)
             if balance_data:
-                return {
+                self._user_balance = {
                     "TRX": f"{float(balance_data['balance_trx']):.3f}",
                     "USDT": f"{float(balance_data['balance_usdt']):.2f}"
                 }
+                self._user_balance_at = time.monotonic()
+                return self._user_balance
         except Exception as e:
             logger.warning(f"获取用户余额失败，使用Mock数据: {e}")
         
-        # 后端API不可用时使用Mock数据
+        # 后端API不可用时使用Mock数据（不缓存，后端恢复后立即显示真实余额）
         return {"TRX": "20.000", "USDT": "50.00"}
     
-    def create_order(self, energy_amount: int, duration: str, receive_address: str) -> Dict:
-        """创建订单（调用后端API）"""
+    async def create_order(self, energy_amount: int, duration: str, receive_address: str,
+                           quoted_cost: str = None) -> Dict:
+        """创建订单（调用后端API；quoted_cost 为展示给用户的费用，与后端当前报价不一致时不下单）"""
         if self.user_id is None:
             return {"success": False, "message": "用户ID未设置"}
         
         try:
-            order_data = backend_api.create_order(
+            order_data = await backend_api.create_order(
                 user_id=self.user_id,
                 energy_amount=energy_amount,
                 duration=duration,
-                receive_address=receive_address
+                receive_address=receive_address,
+                idempotency_key=self.purchase_key(energy_amount, duration, receive_address),
+                quoted_cost=quoted_cost
             )
             
             if order_data:
+                # 订单已创建，之后相同选择的确认是新的购买，不应重放本订单
+                self.start_new_purchase()
+                # 后端执行订单时才扣款，此时余额尚未变化；扣款后由余额变动事件使缓存失效（未启用时等待缓存过期）
                 self.last_order_id = order_data["id"]
                 self.last_transaction_hash = order_data.get("tx_hash", "pending")
                 logger.info(f"用户 {self.user_id} 通过API创建订单成功: {order_data['id']}")
@@ -64,6 +137,7 @@ class UserSession:
                 # 如果有tx_hash说明是真实交易，否则是pending状态
                 if order_data.get("tx_hash") and order_data["tx_hash"] != "pending":
                     logger.info(f"真实交易已执行，tx_hash: {order_data['tx_hash']}")
+                    self.invalidate_balance()  # 订单已执行即已扣款
                 else:
                     logger.info(f"订单已创建，等待后台处理器执行交易")
                 
@@ -72,6 +146,9 @@ class UserSession:
                 logger.warning(f"用户 {self.user_id} API返回空数据，使用Mock订单")
                 return self._create_mock_order(energy_amount, duration, receive_address)
                 
+        except QuoteChangedError as e:
+            logger.info(f"用户 {self.user_id} 下单时报价已变化: {e}")
+            return {"success": False, "quote_changed": True, "message": "报价已更新，请确认新价格后重新下单"}
         except Exception as e:
             logger.warning(f"用户 {self.user_id} 通过API创建订单失败，使用Mock订单: {e}")
             return self._create_mock_order(energy_amount, duration, receive_address)
@@ -100,88 +177,84 @@ class UserSession:
         
         return {"success": True, "order": mock_order}
     
-    def get_order_status(self, order_id: str) -> Optional[Dict]:
+    async def get_order_status(self, order_id: str) -> Optional[Dict]:
         """查询订单状态（调用后端API）"""
         if not order_id:
             return None
         
         try:
-            order_data = backend_api.get_order(order_id)
+            order_data = await backend_api.get_order(order_id)
             return order_data
         except Exception as e:
             logger.error(f"查询订单状态异常: {e}")
             return None
 
-# 用户会话状态存储（内存）
-user_sessions = {}
+_DEFAULT_STATE = {field: getattr(UserSession(), field) for field in UserSession.PERSISTED_FIELDS}
 
-# 持久化存储配置
-WALLET_DATA_FILE = "user_wallets.json"
+# 用户会话存储（LRU内存层 + 可选持久层，见 session_store.py）
+session_store = SessionStore(UserSession.from_state, backend=create_session_backend())
 
-def load_wallet_data() -> Dict:
-    """从文件加载钱包数据"""
-    if os.path.exists(WALLET_DATA_FILE):
-        try:
-            with open(WALLET_DATA_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError) as e:
-            logger.error(f"加载钱包数据失败: {e}")
-            return {}
-    return {}
+# 钱包地址本地存储（后端API不可用时的备份，见 wallet_store.py）
+wallet_store = WalletStore()
 
-def save_wallet_data(data: Dict) -> bool:
-    """保存钱包数据到文件"""
-    try:
-        with open(WALLET_DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        return True
-    except IOError as e:
-        logger.error(f"保存钱包数据失败: {e}")
-        return False
+def get_user_session(user_id: int) -> UserSession:
+    """获取用户会话（已在更新开始时由 acquire_user_session 加载；不访问后端，钱包地址由 load_user_session 加载）"""
+    return session_store.get(user_id)
 
-def get_user_wallet_data(user_id: int) -> List[str]:
-    """获取用户的持久化钱包地址列表"""
-    wallet_data = load_wallet_data()
-    return wallet_data.get(str(user_id), [])
+async def acquire_user_session(user_id: int) -> UserSession:
+    """更新开始处理时加载会话并固定在内存层（处理期间不被淘汰）"""
+    return await session_store.acquire(user_id)
 
-def save_user_wallet_data(user_id: int, addresses: List[str]) -> bool:
-    """保存用户的钱包地址列表"""
-    wallet_data = load_wallet_data()
-    wallet_data[str(user_id)] = addresses
-    return save_wallet_data(wallet_data)
+async def release_user_session(user_id: int) -> bool:
+    """更新处理完成后将有变化的会话状态写回持久层并解除固定"""
+    return await session_store.release(user_id)
 
-def get_user_session(user_id: int) -> UserSession:
-    """获取或创建用户会话"""
-    if user_id not in user_sessions:
-        user_sessions[user_id] = UserSession(user_id=user_id)
-        
-        # 尝试从后端API加载钱包地址
-        try:
-            wallets_data = backend_api.get_user_wallets(user_id)
-            if wallets_data:
-                api_addresses = [
-                    wallet["wallet_address"] for wallet in wallets_data if wallet["is_active"]
-                ]
-                user_sessions[user_id].wallet_addresses = api_addresses
-                # 同步更新本地文件，保持数据一致性
-                save_user_wallet_data(user_id, api_addresses)
-                logger.info(f"用户 {user_id} 从API加载 {len(api_addresses)} 个地址，并同步到本地文件")
-            else:
-                # 后端API返回空数据，使用本地文件
-                persistent_addresses = get_user_wallet_data(user_id)
-                user_sessions[user_id].wallet_addresses = persistent_addresses
-                logger.info(f"用户 {user_id} API返回空数据，从本地文件加载 {len(persistent_addresses)} 个地址")
-        except Exception as e:
-            logger.warning(f"从后端API加载钱包地址失败，使用本地文件: {e}")
-            persistent_addresses = get_user_wallet_data(user_id)
-            user_sessions[user_id].wallet_addresses = persistent_addresses
-            logger.info(f"用户 {user_id} API失败，从本地文件加载 {len(persistent_addresses)} 个地址")
+def invalidate_user_balance(user_id: int):
+    """使指定用户的余额缓存失效（后端推送余额变动时调用）"""
+    session = session_store.peek(user_id)
+    if session is not None:
+        session.invalidate_balance()
+
+async def _fetch_wallet_addresses(user_id: int) -> Tuple[List[str], bool]:
+    """从后端API加载钱包地址；后端无数据或失败时使用本地存储，返回 (地址列表, 后端是否成功)"""
+    wallets_data = await backend_api.get_user_wallets(user_id)
+    if wallets_data is None:
+        persistent_addresses = wallet_store.get(user_id)
+        logger.warning(f"用户 {user_id} 从API加载钱包地址失败，从本地存储加载 {len(persistent_addresses)} 个地址")
+        return persistent_addresses, False
     
-    return user_sessions[user_id]
+    api_addresses = [wallet["wallet_address"] for wallet in wallets_data if wallet["is_active"]]
+    if api_addresses:
+        # 同步更新本地存储（列表未变化时不写入）
+        wallet_store.replace(user_id, api_addresses)
+        logger.info(f"用户 {user_id} 从API加载 {len(api_addresses)} 个地址")
+        return api_addresses, True
+    
+    # 后端API返回空数据，使用本地存储
+    persistent_addresses = wallet_store.get(user_id)
+    logger.info(f"用户 {user_id} API返回空数据，从本地存储加载 {len(persistent_addresses)} 个地址")
+    return persistent_addresses, True
 
-def add_wallet_address(user_id: int, address: str) -> bool:
-    """添加钱包地址"""
+def _apply_wallet_addresses(user_id: int, addresses: List[str]):
+    """后台刷新得到新地址列表时同步到内存中的会话"""
+    session = session_store.peek(user_id)
+    if session is not None:
+        session.wallet_addresses = addresses
+
+# 钱包地址列表缓存（有效期内不访问后端，见 wallet_cache.py）
+wallet_cache = WalletListCache(
+    _fetch_wallet_addresses, seed=wallet_store.get, on_update=_apply_wallet_addresses
+)
+
+async def load_user_session(user_id: int) -> UserSession:
+    """获取用户会话并从钱包地址缓存填充地址列表"""
     session = get_user_session(user_id)
+    session.wallet_addresses = await wallet_cache.get(user_id)
+    return session
+
+async def add_wallet_address(user_id: int, address: str) -> bool:
+    """添加钱包地址"""
+    session = await load_user_session(user_id)
     
     # 验证地址格式
     if not is_valid_tron_address(address):
@@ -194,7 +267,7 @@ def add_wallet_address(user_id: int, address: str) -> bool:
     # 尝试通过后端API添加
     api_success = False
     try:
-        success = backend_api.add_user_wallet(user_id, address)
+        success = await backend_api.add_user_wallet(user_id, address)
         if success:
             api_success = True
             logger.info(f"用户 {user_id} 通过API添加地址: {address}")
@@ -204,19 +277,20 @@ def add_wallet_address(user_id: int, address: str) -> bool:
     # 更新本地会话
     session.wallet_addresses.append(address)
     
-    # 无论API是否成功，都同时保存到本地文件作为备份
-    save_user_wallet_data(user_id, session.wallet_addresses)
+    # 无论API是否成功，都同时保存到本地存储作为备份
+    wallet_store.add(user_id, address)
+    wallet_cache.update(user_id, session.wallet_addresses)
     
     if api_success:
         logger.info(f"用户 {user_id} 地址已添加到API和本地备份: {address}")
     else:
-        logger.info(f"用户 {user_id} 地址仅保存到本地文件: {address}")
+        logger.info(f"用户 {user_id} 地址仅保存到本地存储: {address}")
     
     return True
 
-def remove_wallet_address(user_id: int, address: str) -> bool:
+async def remove_wallet_address(user_id: int, address: str) -> bool:
     """删除钱包地址"""
-    session = get_user_session(user_id)
+    session = await load_user_session(user_id)
     
     # 检查地址是否存在
     if address not in session.wallet_addresses:
@@ -225,7 +299,7 @@ def remove_wallet_address(user_id: int, address: str) -> bool:
     # 尝试通过后端API删除
     api_success = False
     try:
-        success = backend_api.remove_user_wallet(user_id, address)
+        success = await backend_api.remove_user_wallet(user_id, address)
         if success:
             api_success = True
             logger.info(f"用户 {user_id} 通过API删除地址: {address}")
@@ -239,19 +313,20 @@ def remove_wallet_address(user_id: int, address: str) -> bool:
     if session.selected_address == address:
         session.selected_address = None
     
-    # 无论API是否成功，都同时更新本地文件
-    save_user_wallet_data(user_id, session.wallet_addresses)
+    # 无论API是否成功，都同时更新本地存储
+    wallet_store.remove(user_id, address)
+    wallet_cache.update(user_id, session.wallet_addresses)
     
     if api_success:
         logger.info(f"用户 {user_id} 地址已从API和本地备份删除: {address}")
     else:
-        logger.info(f"用户 {user_id} 地址仅从本地文件删除: {address}")
+        logger.info(f"用户 {user_id} 地址仅从本地存储删除: {address}")
     
     return True
 
-def get_wallet_addresses(user_id: int) -> list:
+async def get_wallet_addresses(user_id: int) -> list:
     """获取用户的钱包地址列表"""
-    session = get_user_session(user_id)
+    session = await load_user_session(user_id)
     return session.wallet_addresses.copy()
 
 def is_valid_tron_address(address: str) -> bool:
@@ -268,32 +343,19 @@ def is_valid_tron_address(address: str) -> bool:
     return False
 
 def calculate_mock_cost(energy: str, duration: str) -> str:
-    """模拟成本计算"""
-    energy_map = {"65K": 65000, "135K": 135000, "270K": 270000, "540K": 540000, "1M": 1000000}
-    duration_map = {"1h": 1/24, "1d": 1, "3d": 3, "7d": 7, "14d": 14}
-    
-    # 获取数值，如果是自定义数量则直接解析
-    if energy.endswith("K"):
-        energy_val = energy_map.get(energy, 135000)
-    elif energy.endswith("M"):
-        energy_val = int(float(energy[:-1]) * 1000000)
-    else:
-        try:
-            energy_val = int(energy)
-        except:
-            energy_val = 135000
-    
-    duration_val = duration_map.get(duration, 1)
-    
-    # 简单的定价公式 (仅为演示)
-    base_price = energy_val * 0.00001  # 基础价格
-    time_multiplier = duration_val * 0.8  # 时间倍数
-    total_cost = base_price * time_multiplier
+    """计算订单费用（与后端扣费一致，见 pricing.py）"""
+    try:
+        energy_val = parse_energy(energy)
+    except ValueError:
+        energy_val = 135000
     
-    # 价格调整：乘以20来匹配市场价格
-    market_adjusted_cost = total_cost * 20
+    if duration not in quote_engine.matrix.durations:
+        duration = "1d"
     
-    return f"{market_adjusted_cost:.2f}"
+    try:
+        return str(quote_engine.quote(energy_val, duration))
+    except ValueError:
+        return "0.00"
 
 def format_energy(energy: str) -> str:
     """格式化能量显示"""
@@ -0,0 +1,294 @@
+"""
+统一定价引擎 - 机器人展示的价格与后端实际扣费使用同一套费率和报价矩阵
+标准档位×时长的报价在费率加载时一次算好，查询只是字典查找；自定义数量按相邻档位的单价线性插值
+运营修改费率文件后自动重新加载，版本号由费率内容计算，各进程加载相同费率时版本号一致
+启用动态定价时，后端按供应商钱包池的剩余能量定期发布价格快照（加价/折扣系数），机器人与后端读取同一快照
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+PRICING_RATES_FILE = os.getenv(
+    "PRICING_RATES_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "pricing_rates.json")
+)
+PRICING_SNAPSHOT_FILE = os.getenv(
+    "PRICING_SNAPSHOT_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "pricing_snapshot.json")
+)
+PRICING_RELOAD_INTERVAL = float(os.getenv("PRICING_RELOAD_INTERVAL", "5"))  # 检查费率文件和快照变化的最小间隔（秒）
+PRICING_SNAPSHOT_MAX_AGE = float(os.getenv("PRICING_SNAPSHOT_MAX_AGE", "600"))  # 快照超过该时长未更新时恢复原价（秒）
+
+# 默认费率（费率文件中的字段覆盖同名默认值，dynamic_pricing 逐项覆盖）
+DEFAULT_RATES = {
+    "price_per_energy": "0.00001",  # 每单位能量的基础价格（TRX）
+    "day_multiplier": "0.8",  # 每租用一天的时间系数
+    "market_multiplier": "20",  # 市场价格调整系数
+    "durations": {"1h": 1, "1d": 24, "3d": 72, "7d": 168, "14d": 336},  # 租用时长 -> 小时数
+    "tiers": [65000, 135000, 270000, 540000, 1000000],  # 标准能量档位
+    "overrides": {},  # 运营指定的档位价格 {时长: {档位: 价格}}，优先于公式
+    "price_decimals": 2,  # 报价保留的小数位数
+    "dynamic_pricing": {
+        "enabled": False,
+        "curve": [[0, "0.9"], [0.6, "1.0"], [0.85, "1.3"], [1, "2.0"]],  # 钱包池利用率 -> 价格系数（分段线性）
+        "min_multiplier": "0.8",
+        "max_multiplier": "2.0",
+        "step": "0.05"  # 系数按步长取整，利用率小幅波动时报价不变
+    }
+}
+
+def parse_energy(value: Union[int, str]) -> int:
+    """解析能量数量：整数、数字字符串或 65K / 1.5M 形式"""
+    if isinstance(value, int):
+        return value
+    text = str(value).strip().upper()
+    try:
+        if text.endswith("K"):
+            return int(Decimal(text[:-1]) * 1000)
+        if text.endswith("M"):
+            return int(Decimal(text[:-1]) * 1000000)
+        return int(text)
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"无法解析能量数量: {value}")
+
+def surge_multiplier(utilisation: Optional[float], settings: Dict) -> Decimal:
+    """按钱包池利用率计算价格系数（限制在运营设置的上下限内并按步长取整）"""
+    if not settings.get("enabled") or utilisation is None:
+        return Decimal(1)
+
+    points = sorted((Decimal(str(point)), Decimal(str(value))) for point, value in settings["curve"])
+    utilisation = min(max(Decimal(str(utilisation)), Decimal(0)), Decimal(1))
+    index = bisect_left([point for point, _ in points], utilisation)
+    if index == 0:
+        multiplier = points[0][1]
+    elif index == len(points):
+        multiplier = points[-1][1]
+    else:
+        (low, low_value), (high, high_value) = points[index - 1], points[index]
+        multiplier = low_value + (high_value - low_value) * (utilisation - low) / (high - low)
+
+    step = Decimal(str(settings.get("step") or "0.01"))
+    multiplier = (multiplier / step).quantize(Decimal(1), rounding=ROUND_HALF_UP) * step
+    return clamp_multiplier(multiplier, settings)
+
+def check_dynamic_pricing(settings: Dict):
+    """校验动态定价设置（曲线、上下限与步长），设置无效时抛出异常"""
+    points = [(Decimal(str(point)), Decimal(str(value))) for point, value in settings["curve"]]
+    if not points:
+        raise ValueError("动态定价曲线至少需要一个点")
+    if len({point for point, _ in points}) != len(points):
+        raise ValueError("动态定价曲线的利用率不能重复")
+    if Decimal(str(settings["min_multiplier"])) > Decimal(str(settings["max_multiplier"])):
+        raise ValueError("动态定价系数下限不能大于上限")
+    if Decimal(str(settings["step"])) <= 0:
+        raise ValueError("动态定价步长必须大于0")
+
+def clamp_multiplier(multiplier: Decimal, settings: Dict) -> Decimal:
+    """价格系数限制在运营设置的上下限内"""
+    lower = Decimal(str(settings.get("min_multiplier", "1")))
+    upper = Decimal(str(settings.get("max_multiplier", "1")))
+    return _plain(min(max(multiplier, lower), upper))
+
+def _plain(value: Decimal) -> Decimal:
+    """去掉多余的0（1.20 -> 1.2，2.0 -> 2），避免科学计数法"""
+    value = value.normalize()
+    return value.quantize(Decimal(1)) if value == value.to_integral_value() else value
+
+def write_snapshot(path: str, snapshot: Dict):
+    """写入价格快照（先写临时文件再替换，读取方不会读到一半的内容）"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False, default=str)
+    os.replace(temp_path, path)
+
+def rates_version(rates: Dict) -> str:
+    """费率内容的版本号"""
+    canonical = json.dumps(rates, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:12]
+
+class QuoteMatrix:
+    """某一版本费率和价格系数下的报价矩阵（创建后不再修改，可在线程间共享）"""
+
+    def __init__(self, rates: Dict, multiplier: Decimal = Decimal(1), snapshot: Optional[Dict] = None):
+        self.rates_version = rates_version(rates)
+        self.multiplier = _plain(Decimal(multiplier))
+        self.version = self.rates_version if self.multiplier == 1 else f"{self.rates_version}x{self.multiplier}"
+        self.rates = rates
+        self.snapshot = snapshot  # 生成该矩阵所用的价格快照（未使用动态定价时为None）
+        self.currency = "TRX"
+        self._exponent = Decimal(1).scaleb(-int(rates["price_decimals"]))
+        self.durations: Dict[str, int] = {name: int(hours) for name, hours in rates["durations"].items()}
+        self.tiers: List[int] = sorted({int(tier) for tier in rates["tiers"]})
+        if not self.durations or not self.tiers:
+            raise ValueError("费率至少需要一个租用时长和一个能量档位")
+        if "dynamic_pricing" in rates:
+            check_dynamic_pricing(rates["dynamic_pricing"])
+
+        base = Decimal(str(rates["price_per_energy"])) * Decimal(str(rates["market_multiplier"])) * self.multiplier
+        day_multiplier = Decimal(str(rates["day_multiplier"]))
+        overrides = rates.get("overrides") or {}
+
+        self.prices: Dict[str, Dict[int, Decimal]] = {}
+        self._unit_prices: Dict[str, List[Decimal]] = {}  # 各档位的每单位能量价格（未舍入），用于插值
+        for name, hours in self.durations.items():
+            unit = base * day_multiplier * Decimal(hours) / Decimal(24)
+            fixed = {int(tier): Decimal(str(price)) * self.multiplier for tier, price in overrides.get(name, {}).items()}
+            row, units = {}, []
+            for tier in self.tiers:
+                raw = fixed.get(tier, unit * tier)
+                row[tier] = self._round(raw)
+                units.append(raw / tier)
+            self.prices[name] = row
+            self._unit_prices[name] = units
+
+    def _round(self, value: Decimal) -> Decimal:
+        return value.quantize(self._exponent, rounding=ROUND_HALF_UP)
+
+    def quote(self, energy_amount: int, duration: str) -> Decimal:
+        """报价：标准档位直接查表，其他数量按相邻档位的单价插值（超出范围时使用最近档位的单价）"""
+        row = self.prices.get(duration)
+        if row is None:
+            raise ValueError(f"不支持的租用时长: {duration}")
+        price = row.get(energy_amount)
+        if price is not None:
+            return price
+        if energy_amount <= 0:
+            raise ValueError(f"能量数量必须大于0: {energy_amount}")
+
+        units = self._unit_prices[duration]
+        index = bisect_left(self.tiers, energy_amount)
+        if index == 0:
+            unit = units[0]
+        elif index == len(self.tiers):
+            unit = units[-1]
+        else:
+            low, high = self.tiers[index - 1], self.tiers[index]
+            unit = units[index - 1] + (units[index] - units[index - 1]) * (energy_amount - low) / (high - low)
+        return self._round(unit * energy_amount)
+
+    def to_dict(self) -> Dict:
+        """报价矩阵（金额输出为字符串以保留精度）"""
+        return {
+            "version": self.version,
+            "rates_version": self.rates_version,
+            "multiplier": str(self.multiplier),
+            "snapshot": self.snapshot,
+            "currency": self.currency,
+            "durations": list(self.durations),
+            "tiers": self.tiers,
+            "quotes": {
+                name: {str(tier): str(price) for tier, price in row.items()}
+                for name, row in self.prices.items()
+            }
+        }
+
+class QuoteEngine:
+    """报价引擎：持有当前报价矩阵，费率文件或价格快照变化时重新生成（文件有误时保留当前费率）"""
+
+    def __init__(self, path: Optional[str] = PRICING_RATES_FILE, reload_interval: float = PRICING_RELOAD_INTERVAL,
+                 snapshot_path: Optional[str] = PRICING_SNAPSHOT_FILE, snapshot_max_age: float = PRICING_SNAPSHOT_MAX_AGE):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.snapshot_path = snapshot_path
+        self.snapshot_max_age = snapshot_max_age
+        self._lock = threading.Lock()
+        self._matrix: Optional[QuoteMatrix] = None
+        self._rates: Optional[Dict] = None
+        self._mtime = None
+        self._snapshot: Optional[Dict] = None
+        self._snapshot_mtime = None
+        self._checked_at = 0.0
+        self.reloads = 0
+
+    @property
+    def matrix(self) -> QuoteMatrix:
+        """当前报价矩阵（距上次检查超过 reload_interval 时检查费率文件和价格快照）"""
+        if self._matrix is None or time.monotonic() - self._checked_at >= self.reload_interval:
+            self.reload()
+        return self._matrix
+
+    @property
+    def version(self) -> str:
+        return self.matrix.version
+
+    def quote(self, energy_amount: Union[int, str], duration: str) -> Decimal:
+        return self.matrix.quote(parse_energy(energy_amount), duration)
+
+    def reload(self, force: bool = False) -> QuoteMatrix:
+        """费率文件或价格快照有变化（或 force=True）时重新生成报价矩阵"""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            mtime = self._file_mtime(self.path)
+            if self._rates is None or mtime != self._mtime or force:
+                try:
+                    rates = self._load_rates(mtime)
+                    QuoteMatrix(rates)  # 校验费率
+                    self._rates = rates
+                except (IOError, KeyError, TypeError, ValueError, InvalidOperation, ZeroDivisionError) as e:
+                    logger.error(f"加载费率失败，{'保留当前费率' if self._rates else '使用默认费率'}: {e}")
+                    self._rates = self._rates or dict(DEFAULT_RATES)
+                self._mtime = mtime
+
+            snapshot_mtime = self._file_mtime(self.snapshot_path)
+            if snapshot_mtime != self._snapshot_mtime or force:
+                self._snapshot = self._load_snapshot(snapshot_mtime)
+                self._snapshot_mtime = snapshot_mtime
+
+            snapshot, multiplier = self._current_multiplier()
+            if self._matrix is None or self._matrix.rates is not self._rates or self._matrix.multiplier != multiplier:
+                matrix = QuoteMatrix(self._rates, multiplier, snapshot)
+                if self._matrix is None or matrix.version != self._matrix.version:
+                    logger.info(f"报价矩阵已加载，版本 {matrix.version}")
+                    self.reloads += 1
+                self._matrix = matrix
+            return self._matrix
+
+    def _current_multiplier(self):
+        """未启用动态定价或快照已过期时使用原价；系数按当前费率的上下限再次限制"""
+        settings = self._rates.get("dynamic_pricing") or {}
+        snapshot = self._snapshot
+        if not settings.get("enabled") or snapshot is None:
+            return None, Decimal(1)
+        if time.time() - float(snapshot.get("published_at", 0)) > self.snapshot_max_age:
+            return None, Decimal(1)
+        return snapshot, clamp_multiplier(Decimal(str(snapshot["multiplier"])), settings)
+
+    @staticmethod
+    def _file_mtime(path: Optional[str]):
+        if not path:
+            return None
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load_rates(self, mtime) -> Dict:
+        rates = dict(DEFAULT_RATES)
+        if mtime is not None:
+            with open(self.path, "r", encoding="utf-8") as f:
+                loaded = json.load(f)
+            rates.update(loaded)
+            # 动态定价设置逐项合并，文件中只写部分字段时其余字段使用默认值
+            rates["dynamic_pricing"] = dict(DEFAULT_RATES["dynamic_pricing"], **(loaded.get("dynamic_pricing") or {}))
+        return rates
+
+    def _load_snapshot(self, mtime) -> Optional[Dict]:
+        if mtime is None:
+            return None
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            Decimal(str(snapshot["multiplier"]))
+            return snapshot
+        except (IOError, KeyError, TypeError, ValueError, InvalidOperation) as e:
+            logger.error(f"读取价格快照失败，按原价报价: {e}")
+            return None
+
+# 全局报价引擎实例
+quote_engine = QuoteEngine()
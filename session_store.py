@@ -0,0 +1,265 @@
+"""
+用户会话存储 - 有容量上限的LRU内存层 + 可选的SQLite/Redis持久层
+内存层只保留最近活跃的会话；持久层保存会话状态，重启后恢复，多个机器人进程可共享
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 会话存储配置
+SESSION_STORE_BACKEND = os.getenv("SESSION_STORE_BACKEND", "memory")  # memory / sqlite / redis
+SESSION_STORE_MAX_SIZE = int(os.getenv("SESSION_STORE_MAX_SIZE", "10000"))  # 内存层最多保留的会话数
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", "user_sessions.db")
+SESSION_STORE_REDIS_URL = os.getenv("SESSION_STORE_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379"))
+SESSION_STORE_REDIS_PREFIX = os.getenv("SESSION_STORE_REDIS_PREFIX", "trx_energy:session:")
+SESSION_STORE_TTL = int(os.getenv("SESSION_STORE_TTL", str(30 * 24 * 3600)))  # 持久层会话保留时间（秒）
+SESSION_STORE_LOCAL_TTL = float(os.getenv("SESSION_STORE_LOCAL_TTL", "0"))  # 多进程部署时内存层命中后重新读取持久层的间隔（秒），0表示不重新读取
+
+class SQLiteSessionBackend:
+    """SQLite持久层（单机部署；读写在线程中执行，不阻塞事件循环）"""
+    name = "sqlite"
+
+    def __init__(self, path: str = SESSION_STORE_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS user_sessions ("
+            "user_id INTEGER PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    async def load(self, user_id: int) -> Optional[str]:
+        return await asyncio.to_thread(self._load, user_id)
+
+    async def save(self, user_id: int, state: str):
+        await asyncio.to_thread(self._save, user_id, state)
+
+    async def count(self) -> int:
+        return await asyncio.to_thread(self._count)
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _load(self, user_id: int) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT state FROM user_sessions WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else None
+
+    def _save(self, user_id: int, state: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO user_sessions (user_id, state, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                (user_id, state, time.time())
+            )
+
+    def _count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM user_sessions").fetchone()[0]
+
+class RedisSessionBackend:
+    """Redis持久层（多进程共享，会话按 SESSION_STORE_TTL 过期；使用异步客户端）"""
+    name = "redis"
+
+    def __init__(self, url: str = SESSION_STORE_REDIS_URL, prefix: str = SESSION_STORE_REDIS_PREFIX,
+                 ttl: int = SESSION_STORE_TTL):
+        import redis.asyncio as aioredis
+
+        self._client = aioredis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self.prefix = prefix
+        self.ttl = ttl
+
+    async def load(self, user_id: int) -> Optional[str]:
+        value = await self._client.get(f"{self.prefix}{user_id}")
+        return value.decode("utf-8") if value is not None else None
+
+    async def save(self, user_id: int, state: str):
+        await self._client.set(f"{self.prefix}{user_id}", state, ex=self.ttl)
+
+    async def count(self) -> Optional[int]:
+        return None  # 避免在生产Redis上扫描键
+
+    async def close(self):
+        await self._client.aclose()
+
+class SessionStore:
+    """会话存储：LRU内存层，未命中时从持久层加载；状态变化后写回持久层
+
+    每个更新开始处理时调用 acquire 加载会话并固定在内存层，处理完成后调用 release 写回并解除固定；
+    处理期间的 get 只读内存层，正在处理的会话不会被淘汰，处理器的修改不会丢失
+    """
+
+    def __init__(self, factory: Callable[[int, Optional[dict]], object], backend=None,
+                 max_size: int = SESSION_STORE_MAX_SIZE, local_ttl: float = SESSION_STORE_LOCAL_TTL):
+        self.factory = factory  # (user_id, 状态字典或None) -> 会话对象
+        self.backend = backend
+        self.max_size = max_size
+        self.local_ttl = local_ttl
+        self._sessions = OrderedDict()  # user_id -> (会话, 最近一次读取或写入持久层的状态, 时间)
+        self._pinned: Dict[int, int] = {}  # user_id -> 正在处理的更新数
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.unloaded_gets = 0
+        self.backend_errors = 0
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def peek(self, user_id: int):
+        """只查内存层，不加载也不调整LRU顺序"""
+        entry = self._sessions.get(user_id)
+        return entry[0] if entry else None
+
+    async def acquire(self, user_id: int):
+        """更新开始处理时调用：加载会话（命中时按间隔重新读取持久层）并固定在内存层"""
+        self._pinned[user_id] = self._pinned.get(user_id, 0) + 1
+        entry = self._sessions.get(user_id)
+        if entry is None:
+            self.misses += 1
+            state = await self._load(user_id)
+            entry = self._sessions.get(user_id)  # 等待期间同一用户的其他更新可能已加载
+            if entry is None:
+                session = self.factory(user_id, json.loads(state) if state else None)
+                self._sessions[user_id] = (session, state, time.monotonic())
+                self._evict()
+                return session
+        else:
+            self.hits += 1
+
+        self._sessions.move_to_end(user_id)
+        session, persisted, synced_at = entry
+        if self.backend is not None and self.local_ttl and time.monotonic() - synced_at >= self.local_ttl:
+            # 其他进程可能已更新该会话
+            state = await self._load(user_id)
+            if state is not None and state != persisted:
+                session.apply_state(json.loads(state))
+            self._sessions[user_id] = (session, state or persisted, time.monotonic())
+        return session
+
+    async def release(self, user_id: int) -> bool:
+        """更新处理完成后调用：状态有变化时写回持久层并解除固定，返回是否写入"""
+        try:
+            entry = self._sessions.get(user_id)
+            return await self.save(entry[0]) if entry is not None else False
+        finally:
+            pins = self._pinned.get(user_id, 0) - 1
+            if pins > 0:
+                self._pinned[user_id] = pins
+            else:
+                self._pinned.pop(user_id, None)
+                self._evict()
+
+    def get(self, user_id: int):
+        """获取内存层中的会话（更新处理期间已由 acquire 加载，不访问持久层）"""
+        entry = self._sessions.get(user_id)
+        if entry is not None:
+            self._sessions.move_to_end(user_id)
+            return entry[0]
+
+        # 不在更新处理中调用时没有预先加载：返回临时会话，不放入内存层，避免以空状态覆盖持久层
+        self.unloaded_gets += 1
+        logger.warning(f"用户 {user_id} 的会话未预先加载，使用临时会话")
+        return self.factory(user_id, None)
+
+    async def save(self, session) -> bool:
+        """状态有变化时写回持久层，返回是否写入"""
+        if self.backend is None:
+            return False
+
+        user_id = session.user_id
+        state = json.dumps(session.to_state(), ensure_ascii=False, separators=(",", ":"))
+        entry = self._sessions.get(user_id)
+        if entry is not None and entry[1] == state:
+            return False
+
+        try:
+            await self.backend.save(user_id, state)
+        except Exception as e:
+            self.backend_errors += 1
+            logger.warning(f"保存用户 {user_id} 会话失败: {e}")
+            return False
+
+        if entry is not None and entry[0] is session:
+            self._sessions[user_id] = (session, state, time.monotonic())
+        return True
+
+    async def _load(self, user_id: int) -> Optional[str]:
+        if self.backend is None:
+            return None
+        try:
+            return await self.backend.load(user_id)
+        except Exception as e:
+            self.backend_errors += 1
+            logger.warning(f"加载用户 {user_id} 会话失败，使用新会话: {e}")
+            return None
+
+    def _evict(self):
+        """超出容量时淘汰最久未使用且没有正在处理的更新的会话（状态已在每次更新后写回持久层）"""
+        excess = len(self._sessions) - self.max_size
+        if excess <= 0:
+            return
+        victims = []
+        for user_id in self._sessions:
+            if user_id not in self._pinned:
+                victims.append(user_id)
+                if len(victims) == excess:
+                    break
+        for user_id in victims:
+            del self._sessions[user_id]
+        self.evictions += len(victims)
+
+    async def stats(self) -> Dict:
+        """占用与命中情况"""
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name if self.backend else "memory",
+            "size": len(self._sessions),
+            "max_size": self.max_size,
+            "pinned": len(self._pinned),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "unloaded_gets": self.unloaded_gets,
+            "backend_errors": self.backend_errors,
+            "persisted": await self._backend_count()
+        }
+
+    async def _backend_count(self) -> Optional[int]:
+        if self.backend is None:
+            return None
+        try:
+            return await self.backend.count()
+        except Exception:
+            return None
+
+    async def close(self):
+        if self.backend is not None:
+            await self.backend.close()
+
+def create_session_backend(kind: str = SESSION_STORE_BACKEND):
+    """按配置创建持久层，memory 或创建失败时返回None（仅内存）"""
+    try:
+        if kind == "sqlite":
+            return SQLiteSessionBackend()
+        if kind == "redis":
+            return RedisSessionBackend()
+    except Exception as e:
+        logger.error(f"会话持久层 {kind} 初始化失败，仅使用内存: {e}")
+        return None
+    if kind != "memory":
+        logger.warning(f"未知的会话存储类型: {kind}，仅使用内存")
+    return None
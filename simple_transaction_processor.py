@@ -2,6 +2,7 @@
 """
 简化的交易处理器
 立即处理pending订单，无需Redis/Celery
+新订单创建时由后端发出唤醒信号，定时轮询仅作为兜底
 """
 import sys
 import os
@@ -9,35 +10,72 @@ sys.path.append('backend')
 
 import asyncio
 import time
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from backend.app.models import Order
-from backend.app.services.tron_service import TronTransactionService
 
-# 数据库连接
-DATABASE_URL = "sqlite:///backend/trx_energy.db"
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# 数据库连接：未配置DATABASE_URL时使用后端目录下的SQLite数据库
+os.environ.setdefault("DATABASE_URL", "sqlite:///backend/trx_energy.db")
 
-async def process_pending_orders():
-    """处理所有pending状态的订单"""
+from app.database import SessionLocal
+from app.models import Order
+from app.services.tron_service import TronTransactionService, ORDER_CLAIM_BATCH_SIZE
+from app.services.stats_service import StatsService
+from app.services.deposit_watcher import DEPOSIT_POLL_INTERVAL, watch_deposits
+from app.utils.order_signal import OrderWakeupListener
+from app.utils.balance_events import install_balance_events
+
+# 兜底轮询间隔（秒）：唤醒信号丢失时最多等待这么久
+SAFETY_POLL_INTERVAL = float(os.getenv('SAFETY_POLL_INTERVAL', '60'))
+# 统计汇总间隔（秒）：未部署Celery beat时由处理器顺带执行
+STATS_ROLLUP_INTERVAL = float(os.getenv('STATS_ROLLUP_INTERVAL', '300'))
+
+def load_test_env():
+    """加载 .env.test 环境变量（启动时加载一次）"""
+    if os.path.exists('.env.test'):
+        with open('.env.test', 'r') as f:
+            for line in f:
+                if '=' in line:
+                    key, value = line.strip().split('=', 1)
+                    os.environ[key] = value
+
+def expire_overdue_orders() -> int:
+    """批量过期超时未处理的订单，返回过期数量"""
+    db = SessionLocal()
+    try:
+        return TronTransactionService(db).expire_overdue_orders()
+    finally:
+        db.close()
+
+def roll_up_stats():
+    """增量汇总管理后台统计数据并记录钱包池快照"""
+    db = SessionLocal()
+    try:
+        stats_service = StatsService(db)
+        stats_service.roll_up()
+        stats_service.snapshot_wallet_pool()
+    finally:
+        db.close()
+
+async def watch_chain_deposits():
+    """增量读取充值地址的新转入交易并入账"""
+    db = SessionLocal()
+    try:
+        counts = await watch_deposits(db)
+        if any(counts.values()):
+            print(f"Deposits: {counts}")
+    finally:
+        db.close()
+
+async def process_pending_orders() -> int:
+    """认领并处理一批pending状态的订单，返回认领数量"""
     db = SessionLocal()
     try:
-        # 设置环境变量
-        if os.path.exists('.env.test'):
-            with open('.env.test', 'r') as f:
-                for line in f:
-                    if '=' in line:
-                        key, value = line.strip().split('=', 1)
-                        os.environ[key] = value
-        
         # 创建交易服务
         tron_service = TronTransactionService(db)
         
-        # 查找所有pending订单
-        pending_orders = db.query(Order).filter(Order.status == "pending").all()
+        # 认领一批订单（多个处理器并行运行时不会重复处理同一订单）
+        order_ids = tron_service.claim_orders()
+        pending_orders = db.query(Order).filter(Order.id.in_(order_ids)).order_by(Order.created_at.asc()).all()
         
-        print(f"Found {len(pending_orders)} pending orders to process")
+        print(f"Claimed {len(pending_orders)} pending orders to process")
         
         for order in pending_orders:
             print(f"\nProcessing order: {order.id}")
@@ -62,9 +100,8 @@ async def process_pending_orders():
                     
             except Exception as e:
                 print(f"ERROR processing order {order.id}: {e}")
-                
-            # 等待一下再处理下一个订单
-            await asyncio.sleep(1)
+        
+        return len(order_ids)
             
     finally:
         db.close()
@@ -73,19 +110,52 @@ async def main():
     print("Simple Transaction Processor")
     print("=" * 40)
     
-    while True:
-        try:
-            await process_pending_orders()
-            
-            print(f"\nWaiting 10 seconds before next check...")
-            await asyncio.sleep(10)
-            
-        except KeyboardInterrupt:
-            print("\nStopping transaction processor...")
-            break
-        except Exception as e:
-            print(f"ERROR in main loop: {e}")
-            await asyncio.sleep(5)
+    load_test_env()
+    # 扣款与退款提交后通知机器人
+    install_balance_events()
+    
+    # 监听新订单唤醒信号
+    listener = OrderWakeupListener()
+    await listener.start()
+    last_rollup = 0.0
+    last_deposit_poll = 0.0
+    
+    try:
+        while True:
+            try:
+                # 定时汇总统计数据
+                if time.monotonic() - last_rollup >= STATS_ROLLUP_INTERVAL:
+                    roll_up_stats()
+                    last_rollup = time.monotonic()
+                
+                # 定时读取链上充值
+                if time.monotonic() - last_deposit_poll >= DEPOSIT_POLL_INTERVAL:
+                    try:
+                        await watch_chain_deposits()
+                    except Exception as e:
+                        print(f"ERROR watching deposits: {e}")
+                    last_deposit_poll = time.monotonic()
+                
+                # 先批量清理过期订单，认领的批次只包含未过期订单
+                expired = expire_overdue_orders()
+                if expired:
+                    print(f"Expired {expired} overdue orders")
+                
+                # 整批认领满说明可能还有积压，继续处理
+                while await process_pending_orders() >= ORDER_CLAIM_BATCH_SIZE:
+                    pass
+                
+                print(f"\nWaiting for new orders (safety poll every {SAFETY_POLL_INTERVAL:.0f}s)...")
+                await listener.wait(min(SAFETY_POLL_INTERVAL, DEPOSIT_POLL_INTERVAL))
+                
+            except KeyboardInterrupt:
+                print("\nStopping transaction processor...")
+                break
+            except Exception as e:
+                print(f"ERROR in main loop: {e}")
+                await asyncio.sleep(5)
+    finally:
+        listener.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,11 @@
+"""
+机器人模块单元测试公共设置（在项目根目录运行: python -m pytest -q tests/bot）
+"""
+import os
+import sys
+
+# 机器人模块位于项目根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# 导入 models 时创建的钱包存储不写入工作目录
+os.environ.setdefault("WALLET_STORE_PATH", ":memory:")
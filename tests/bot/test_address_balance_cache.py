@@ -0,0 +1,105 @@
+"""
+地址余额缓存测试
+"""
+import asyncio
+import threading
+from types import SimpleNamespace
+import pytest
+import address_balance_cache as address_balance_cache_module
+from address_balance_cache import AddressBalanceCache, balance_label
+from tron_api import AccountBalance
+
+ADDRESSES = ["TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t", "TG3XXyExBkPp9nzdajDZsozEu4BkaSJozs"]
+
+def _balance(address: str, trx: float = 10.5) -> AccountBalance:
+    return AccountBalance(address, trx, 0, 0, 0, 65000, 0, 0, 0, 600, 0)
+
+class StubFetcher:
+    """按地址返回余额（None表示未激活，异常表示网络错误），记录调用次数；gate 用于让查询停在上游"""
+    def __init__(self, results: dict):
+        self.results = results
+        self.calls = []
+        self.gate = None
+
+    def __call__(self, address: str):
+        self.calls.append(address)
+        if self.gate is not None:
+            self.gate.wait(5)
+        result = self.results[address]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    # 只替换被测模块的时钟，事件循环仍使用真实时间
+    monkeypatch.setattr(address_balance_cache_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+def test_ttl_and_error_ttl(clock):
+    """测试成功结果按TTL缓存，失败结果按较短的错误TTL缓存"""
+    async def run():
+        fetcher = StubFetcher({ADDRESSES[0]: _balance(ADDRESSES[0]), ADDRESSES[1]: IOError("超时")})
+        cache = AddressBalanceCache(fetcher, ttl=60, error_ttl=15)
+
+        balances = await cache.prefetch(ADDRESSES)
+        assert balances == {ADDRESSES[0]: _balance(ADDRESSES[0]), ADDRESSES[1]: None}
+        assert cache.failures == 1
+
+        clock[0] += 20
+        await cache.prefetch(ADDRESSES)
+        assert fetcher.calls == ADDRESSES + [ADDRESSES[1]]  # 只有失败的地址重新查询
+        clock[0] += 41
+        assert cache.get(ADDRESSES[0]) is None
+        assert await cache.fetch(ADDRESSES[0], refresh=False) == _balance(ADDRESSES[0])
+        assert fetcher.calls.count(ADDRESSES[0]) == 2
+
+    asyncio.run(run())
+
+def test_concurrent_lookups_coalesce(clock):
+    """测试同一地址的并发查询合并为一次上游请求"""
+    async def run():
+        fetcher = StubFetcher({ADDRESSES[0]: _balance(ADDRESSES[0])})
+        fetcher.gate = threading.Event()
+        cache = AddressBalanceCache(fetcher)
+
+        lookups = [asyncio.create_task(cache.fetch(ADDRESSES[0])) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        assert cache.stats()["inflight"] == 1
+        fetcher.gate.set()
+        assert await asyncio.gather(*lookups) == [_balance(ADDRESSES[0])] * 3
+        assert fetcher.calls == [ADDRESSES[0]]
+        assert (await cache.fetch(ADDRESSES[0])) == _balance(ADDRESSES[0])
+        assert cache.stats()["hits"] == 1 and cache.stats()["inflight"] == 0
+
+    asyncio.run(run())
+
+class FakeMessage:
+    def __init__(self):
+        self.markups = []
+
+    async def edit_reply_markup(self, reply_markup=None):
+        self.markups.append(reply_markup)
+
+def test_prefetch_skips_stale_view(clock):
+    """测试预取完成后原地更新列表；用户已切换页面时不更新"""
+    async def run():
+        fetcher = StubFetcher({address: _balance(address) for address in ADDRESSES})
+        cache = AddressBalanceCache(fetcher)
+        session = SimpleNamespace(view_seq=1)
+        message = FakeMessage()
+        build_keyboard = lambda: [balance_label(cache.get(address)) for address in ADDRESSES]
+
+        await cache.start_prefetch(session, message, ADDRESSES[:1], build_keyboard)
+        assert message.markups == [[" · 10.50 TRX · 65,000⚡", ""]]
+
+        fetcher.gate = threading.Event()
+        task = cache.start_prefetch(session, message, ADDRESSES, build_keyboard)
+        session.view_seq += 1  # 用户在预取完成前切换了页面
+        fetcher.gate.set()
+        await task
+        assert len(message.markups) == 1
+        assert cache.start_prefetch(session, message, ADDRESSES, build_keyboard) is None  # 全部已缓存
+
+    asyncio.run(run())
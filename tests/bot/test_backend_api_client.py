@@ -0,0 +1,50 @@
+"""
+后端API客户端测试
+"""
+import asyncio
+import json
+import httpx
+import pytest
+from backend_api_client import BackendAPIClient, QuoteChangedError
+
+def _backend(request: httpx.Request) -> httpx.Response:
+    """按后端路由应答：列表路由注册为 /api/orders/，不带斜杠时返回307（与FastAPI一致）"""
+    if request.url.path == "/api/orders":
+        return httpx.Response(307, headers={"location": f"/api/orders/?{request.url.query.decode()}"})
+    if request.url.path == "/api/orders/":
+        return httpx.Response(200, json=[{"id": "order-1", "user_id": int(request.url.params["user_id"])}])
+    return httpx.Response(404)
+
+def test_get_user_orders_uses_registered_route():
+    """测试订单列表请求直接命中路由（httpx默认不跟随重定向）"""
+    async def run():
+        client = BackendAPIClient("http://backend", transport=httpx.MockTransport(_backend), retries=0)
+        try:
+            assert await client.get_user_orders(7) == [{"id": "order-1", "user_id": 7}]
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+
+def test_create_order_reports_stale_quote():
+    """测试下单携带展示费用；后端报价已变化（409）时抛出 QuoteChangedError，其他错误仍返回None"""
+    def backend(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        if body["quoted_cost"] != "3.50":
+            return httpx.Response(409, json={"detail": "报价已变化"})
+        if body["energy_amount"] > 1000000:
+            return httpx.Response(400, json={"detail": "余额不足"})
+        return httpx.Response(200, json={"id": "order-1", "cost_trx": "3.50"})
+
+    async def run():
+        client = BackendAPIClient("http://backend", transport=httpx.MockTransport(backend), retries=0)
+        try:
+            order = await client.create_order(1, 65000, "1h", "T" * 34, idempotency_key="buy-1", quoted_cost="3.50")
+            assert order == {"id": "order-1", "cost_trx": "3.50"}
+            with pytest.raises(QuoteChangedError):
+                await client.create_order(1, 65000, "1h", "T" * 34, idempotency_key="buy-2", quoted_cost="3.00")
+            assert await client.create_order(1, 2000000, "1h", "T" * 34, quoted_cost="3.50") is None
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
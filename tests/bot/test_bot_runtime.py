@@ -0,0 +1,59 @@
+"""
+更新并发处理测试
+"""
+import asyncio
+from datetime import datetime
+from telegram import Chat, Message, Update, User
+from bot_runtime import PerChatUpdateProcessor
+
+def _update(update_id: int, chat_id: int) -> Update:
+    chat = Chat(chat_id, Chat.PRIVATE)
+    user = User(chat_id, "user", False)
+    return Update(update_id, message=Message(update_id, datetime.now(), chat, from_user=user))
+
+def test_chats_run_in_parallel_and_keep_order_within_chat():
+    """测试慢聊天排队的更新不占并发名额，其他聊天照常处理，同一聊天按顺序处理"""
+    async def run():
+        processor = PerChatUpdateProcessor(2)
+        release = asyncio.Event()
+        events = []
+
+        async def handler(name: str, wait: bool = False):
+            events.append(f"{name}开始")
+            if wait:
+                await release.wait()
+            events.append(f"{name}结束")
+
+        # 聊天1：首个更新执行慢查询，其后连续点击4次
+        tasks = [asyncio.create_task(processor.process_update(_update(1, 1), handler("A1", wait=True)))]
+        tasks += [asyncio.create_task(processor.process_update(_update(i, 1), handler(f"A{i}"))) for i in range(2, 6)]
+        await asyncio.sleep(0)
+        other = asyncio.create_task(processor.process_update(_update(6, 2), handler("B1")))
+        await asyncio.wait_for(other, 1)
+        assert events == ["A1开始", "B1开始", "B1结束"]
+        assert processor.stats()["queued_updates"] == 5
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert events[3:] == ["A1结束"] + [f"A{i}{state}" for i in range(2, 6) for state in ("开始", "结束")]
+        assert processor.stats() == {"max_concurrent_updates": 2, "active_chats": 0, "queued_updates": 0}
+
+    asyncio.run(run())
+
+def test_concurrency_limit_applies_across_chats():
+    """测试同时执行的更新数不超过上限"""
+    async def run():
+        processor = PerChatUpdateProcessor(2)
+        running = peak = 0
+
+        async def handler():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        await asyncio.gather(*(processor.process_update(_update(i, i), handler()) for i in range(1, 7)))
+        assert peak == 2
+
+    asyncio.run(run())
@@ -0,0 +1,137 @@
+"""
+倒计时消息编辑调度测试
+"""
+import asyncio
+from types import SimpleNamespace
+import pytest
+from telegram.error import RetryAfter
+import edit_scheduler as edit_scheduler_module
+from edit_scheduler import EditScheduler
+
+class FakeBot:
+    """记录编辑与删除；retry_after 不为空时下一次请求返回429"""
+    def __init__(self):
+        self.edits = []
+        self.deletes = []
+        self.retry_after = None
+
+    async def edit_message_text(self, chat_id, message_id, text, reply_markup=None):
+        if self.retry_after is not None:
+            retry_after, self.retry_after = self.retry_after, None
+            raise RetryAfter(retry_after)
+        self.edits.append((chat_id, message_id, text))
+
+    async def delete_message(self, chat_id, message_id):
+        self.deletes.append((chat_id, message_id))
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    # 只替换被测模块的时钟，事件循环仍使用真实时间
+    monkeypatch.setattr(edit_scheduler_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+def _scheduler(**kwargs) -> EditScheduler:
+    scheduler = EditScheduler(**kwargs)
+    # 不启动调度循环，由测试按时间逐步驱动
+    scheduler._task = asyncio.get_running_loop().create_future()
+    scheduler._wakeup = asyncio.Event()
+    return scheduler
+
+async def _step(scheduler: EditScheduler, clock, seconds: float = 0):
+    clock[0] += seconds
+    scheduler._schedule_due(clock[0])
+    scheduler._dispatch(clock[0])
+    await asyncio.sleep(0)
+
+def _render(seconds: int):
+    return f"剩余 {seconds} 秒", None
+
+def test_token_bucket_and_chat_interval(clock):
+    """测试全局每秒编辑数与单聊天最小间隔"""
+    async def run():
+        bot = FakeBot()
+        scheduler = _scheduler(rate=2, chat_interval=1, base_interval=5)
+        for chat_id in (1, 2, 3):
+            scheduler.add_countdown(bot, chat_id, 10, 60, _render)
+        scheduler.add_countdown(bot, 1, 11, 60, _render)
+
+        await _step(scheduler, clock, 5)
+        assert [edit[:2] for edit in bot.edits] == [(1, 10), (2, 10)]
+        await _step(scheduler, clock, 0.5)
+        assert [edit[:2] for edit in bot.edits[2:]] == [(3, 10)]  # 聊天1未满间隔
+        await _step(scheduler, clock, 0.5)
+        assert [edit[:2] for edit in bot.edits[3:]] == [(1, 11)]
+        assert bot.edits[0][2] == "剩余 55 秒"
+
+    asyncio.run(run())
+
+def test_pending_edits_coalesce(clock):
+    """测试同一消息未发出的编辑只保留最新内容"""
+    async def run():
+        bot = FakeBot()
+        scheduler = _scheduler(rate=5, chat_interval=20, base_interval=5)
+        scheduler.add_countdown(bot, 1, 10, 60, _render)
+
+        await _step(scheduler, clock, 5)
+        for _ in range(3):
+            await _step(scheduler, clock, 5)  # 聊天间隔内的刷新只替换待发送内容
+        assert scheduler.stats()["queue_depth"] == 1 and scheduler.coalesced == 2
+        await _step(scheduler, clock, 5)
+        assert bot.edits == [(1, 10, "剩余 55 秒"), (1, 10, "剩余 35 秒")]
+        assert scheduler.coalesced == 3
+
+    asyncio.run(run())
+
+def test_retry_after_pauses_and_requeues(clock):
+    """测试429时全局暂停、重新排队并放慢刷新间隔"""
+    async def run():
+        bot = FakeBot()
+        bot.retry_after = 3
+        scheduler = _scheduler(rate=5, chat_interval=1, base_interval=5)
+        scheduler.add_countdown(bot, 1, 10, 60, _render)
+
+        await _step(scheduler, clock, 5)
+        assert bot.edits == [] and scheduler.rate_limited == 1
+        assert scheduler.stats()["queue_depth"] == 1
+        assert scheduler.current_interval() == 10
+
+        await _step(scheduler, clock, 2)
+        assert bot.edits == []
+        await _step(scheduler, clock, 1)
+        assert bot.edits == [(1, 10, "剩余 55 秒")]
+        assert scheduler.current_interval() == 5
+
+    asyncio.run(run())
+
+def test_interval_stretches_with_load(clock):
+    """测试活跃倒计时超过发送能力时放慢刷新，不超过上限"""
+    async def run():
+        bot = FakeBot()
+        scheduler = _scheduler(rate=1, base_interval=5, max_interval=30)
+        for message_id in range(12):
+            scheduler.add_countdown(bot, 1, message_id, 300, _render)
+        assert scheduler.current_interval() == 15
+        for message_id in range(12, 60):
+            scheduler.add_countdown(bot, 1, message_id, 300, _render)
+        assert scheduler.current_interval() == 30
+
+    asyncio.run(run())
+
+def test_expired_countdown_deleted_and_chat_entries_pruned(clock):
+    """测试到期删除消息；取消的倒计时不留下单聊天间隔记录"""
+    async def run():
+        bot = FakeBot()
+        scheduler = _scheduler(rate=5, chat_interval=1, base_interval=5)
+        scheduler.add_countdown(bot, 1, 10, 5, _render)
+        scheduler.add_countdown(bot, 2, 20, 60, _render)
+
+        await _step(scheduler, clock, 5)
+        assert bot.deletes == [(1, 10)]
+        scheduler.cancel(2, 20)
+        assert scheduler._chat_ready_at == {2: clock[0] + 1}
+        await _step(scheduler, clock, 2)
+        assert scheduler._chat_ready_at == {}
+        assert scheduler.stats()["active_countdowns"] == 0
+
+    asyncio.run(run())
@@ -0,0 +1,68 @@
+"""
+下单幂等键测试
+"""
+import asyncio
+import models
+from backend_api_client import QuoteChangedError
+from models import UserSession
+
+ADDRESS = "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t"
+
+class StubBackend:
+    """记录每次下单携带的幂等键；results 依次返回（None 表示请求失败，异常则抛出）"""
+    def __init__(self, results: list):
+        self.results = list(results)
+        self.keys = []
+
+    async def create_order(self, **kwargs):
+        self.keys.append(kwargs["idempotency_key"])
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+def _order(order_id: str) -> dict:
+    return {"id": order_id, "tx_hash": "pending", "cost_trx": 3.5}
+
+def test_successful_order_retires_key(monkeypatch):
+    """测试两次成功的购买即使选择相同也使用不同的幂等键"""
+    backend = StubBackend([_order("order-1"), _order("order-2")])
+    monkeypatch.setattr(models, "backend_api", backend)
+    session = UserSession(user_id=1)
+
+    async def run():
+        first = await session.create_order(65000, "1h", ADDRESS)
+        second = await session.create_order(65000, "1h", ADDRESS)
+        assert [first["order"]["id"], second["order"]["id"]] == ["order-1", "order-2"]
+
+    asyncio.run(run())
+    assert backend.keys[0] != backend.keys[1]
+
+def test_failed_request_keeps_key(monkeypatch):
+    """测试请求失败后重新确认沿用原幂等键，成功后作废"""
+    backend = StubBackend([None, _order("order-1"), _order("order-2")])
+    monkeypatch.setattr(models, "backend_api", backend)
+    session = UserSession(user_id=1)
+
+    async def run():
+        for _ in range(3):
+            await session.create_order(65000, "1h", ADDRESS)
+
+    asyncio.run(run())
+    assert backend.keys[0] == backend.keys[1]
+    assert backend.keys[2] != backend.keys[1]
+
+def test_stale_quote_not_replaced_by_mock_order(monkeypatch):
+    """测试后端报价已变化时返回 quote_changed 而不是Mock订单，重新确认沿用原幂等键"""
+    backend = StubBackend([QuoteChangedError("报价已变化"), _order("order-1")])
+    monkeypatch.setattr(models, "backend_api", backend)
+    session = UserSession(user_id=1)
+
+    async def run():
+        result = await session.create_order(65000, "1h", ADDRESS, quoted_cost="3.00")
+        assert result["success"] is False and result["quote_changed"]
+        result = await session.create_order(65000, "1h", ADDRESS, quoted_cost="3.50")
+        assert result["order"]["id"] == "order-1"
+
+    asyncio.run(run())
+    assert backend.keys[0] == backend.keys[1]
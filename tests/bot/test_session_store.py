@@ -0,0 +1,91 @@
+"""
+会话存储测试
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+import session_store as session_store_module
+from session_store import SQLiteSessionBackend, SessionStore
+
+class FakeSession:
+    """只有一个持久化字段的测试会话"""
+    def __init__(self, user_id: int, state: dict = None):
+        self.user_id = user_id
+        self.selected_energy = "65K"
+        if state:
+            self.apply_state(state)
+
+    def to_state(self) -> dict:
+        return {"selected_energy": self.selected_energy} if self.selected_energy != "65K" else {}
+
+    def apply_state(self, state: dict):
+        self.selected_energy = state.get("selected_energy", "65K")
+
+def _store(tmp_path, **kwargs) -> SessionStore:
+    return SessionStore(FakeSession, backend=SQLiteSessionBackend(str(tmp_path / "sessions.db")), **kwargs)
+
+def test_persistence_round_trip(tmp_path):
+    """测试有变化的状态在处理完成后写回，重启后恢复；未变化时不写入"""
+    async def run():
+        store = _store(tmp_path)
+        session = await store.acquire(1)
+        session.selected_energy = "131K"
+        assert await store.release(1)
+        await store.acquire(1)
+        assert not await store.release(1)
+        await store.close()
+
+        restarted = _store(tmp_path)
+        assert (await restarted.acquire(1)).selected_energy == "131K"
+        await restarted.release(1)
+        assert (await restarted.stats())["persisted"] == 1
+        await restarted.close()
+
+    asyncio.run(run())
+
+def test_session_in_use_is_not_evicted(tmp_path):
+    """测试处理中的会话不被淘汰，处理器的修改在完成时写回，之后才按LRU淘汰"""
+    async def run():
+        store = _store(tmp_path, max_size=1)
+        first = await store.acquire(1)
+        await store.acquire(2)
+        await store.release(2)
+        assert store.get(1) is first
+        assert 2 not in store and store.evictions == 1
+
+        first.selected_energy = "200K"
+        await store.acquire(3)
+        assert await store.release(1)
+        await store.release(3)
+        assert 1 not in store and len(store) == 1
+
+        assert (await store.acquire(1)).selected_energy == "200K"
+        await store.release(1)
+        await store.close()
+
+    asyncio.run(run())
+
+def test_local_ttl_resyncs_from_backend(tmp_path, monkeypatch):
+    """测试多进程部署时命中内存层超过间隔后重新读取其他进程写入的状态"""
+    async def run():
+        now = [100.0]
+        # 只替换被测模块的时钟，事件循环仍使用真实时间
+        monkeypatch.setattr(session_store_module, "time", SimpleNamespace(monotonic=lambda: now[0], time=time.time))
+        bot_a = _store(tmp_path, local_ttl=5)
+        bot_b = _store(tmp_path, local_ttl=5)
+
+        session = await bot_a.acquire(1)
+        await bot_a.release(1)
+        (await bot_b.acquire(1)).selected_energy = "500K"
+        await bot_b.release(1)
+
+        now[0] += 1
+        assert (await bot_a.acquire(1)).selected_energy == "65K"  # 间隔内只读内存层
+        await bot_a.release(1)
+        now[0] += 5
+        assert (await bot_a.acquire(1)) is session and session.selected_energy == "500K"
+        assert not await bot_a.release(1)  # 与持久层一致，无需写回
+        await bot_a.close()
+        await bot_b.close()
+
+    asyncio.run(run())
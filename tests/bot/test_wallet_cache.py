@@ -0,0 +1,89 @@
+"""
+钱包地址列表缓存测试
+"""
+import asyncio
+from types import SimpleNamespace
+import pytest
+import wallet_cache as wallet_cache_module
+from wallet_cache import WalletListCache
+
+class StubLoader:
+    """按顺序返回预设结果（异常表示后端失败），记录调用次数；gate 用于让加载停在后端"""
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+        self.gate = None
+
+    async def __call__(self, user_id: int):
+        self.calls += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    # 只替换被测模块的时钟，事件循环仍使用真实时间
+    monkeypatch.setattr(wallet_cache_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+def test_concurrent_loads_coalesce(clock):
+    """测试同一用户的并发加载合并为一次后端请求"""
+    async def run():
+        loader = StubLoader((["TA"], True))
+        loader.gate = asyncio.Event()
+        cache = WalletListCache(loader)
+
+        lookups = [asyncio.create_task(cache.get(1)) for _ in range(3)]
+        await asyncio.sleep(0)
+        loader.gate.set()
+        assert await asyncio.gather(*lookups) == [["TA"]] * 3
+        assert loader.calls == 1
+        assert await cache.get(1) == ["TA"] and cache.stats()["hits"] == 1
+
+    asyncio.run(run())
+
+def test_empty_and_failed_results_use_short_ttl(clock):
+    """测试无地址与后端失败的结果按较短有效期缓存，过期后先返回旧值再后台刷新"""
+    async def run():
+        loader = StubLoader(([], True), IOError("后端不可用"), (["TA"], True))
+        cache = WalletListCache(loader, ttl=300, empty_ttl=60)
+
+        assert await cache.get(1) == []
+        clock[0] += 59
+        assert await cache.get(1) == [] and loader.calls == 1
+        clock[0] += 2
+        assert await cache.get(1) == []  # 已过期：返回旧值，后台刷新失败
+        await asyncio.sleep(0)
+        assert loader.calls == 2 and cache.load_failures == 1
+
+        clock[0] += 61
+        assert await cache.get(1) == []
+        await asyncio.sleep(0)
+        assert await cache.get(1) == ["TA"]
+        clock[0] += 299
+        assert await cache.get(1) == ["TA"] and loader.calls == 3
+
+    asyncio.run(run())
+
+def test_background_load_discarded_after_local_change(clock):
+    """测试后台加载期间本进程增删了地址时丢弃加载结果"""
+    async def run():
+        updates = []
+        loader = StubLoader((["TA"], True))
+        loader.gate = asyncio.Event()
+        cache = WalletListCache(loader, seed=lambda user_id: ["TA"], on_update=lambda *args: updates.append(args))
+
+        assert await cache.get(1) == ["TA"]  # 本地备份立即返回，后台向后端确认
+        cache.update(1, ["TA", "TB"])
+        loader.gate.set()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert loader.calls == 1 and cache.stats()["inflight"] == 0
+        assert await cache.get(1) == ["TA", "TB"]
+        assert updates == []
+
+    asyncio.run(run())
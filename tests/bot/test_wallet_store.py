@@ -0,0 +1,44 @@
+"""
+钱包地址本地存储测试
+"""
+import json
+from wallet_store import WalletStore
+
+def test_legacy_file_imported_once(tmp_path):
+    """测试首次启动导入旧版JSON文件并写入标记，之后不再导入"""
+    legacy = tmp_path / "user_wallets.json"
+    legacy.write_text(json.dumps({"1": ["TA", "TB", "TA"], "2": ["TC"]}))
+    path = str(tmp_path / "user_wallets.db")
+
+    store = WalletStore(path, legacy_file=str(legacy))
+    assert store.get(1) == ["TA", "TB"]
+    assert store.get(2) == ["TC"]
+    store.remove(2, "TC")
+    store.close()
+
+    legacy.write_text(json.dumps({"2": ["TD"]}))
+    restarted = WalletStore(path, legacy_file=str(legacy))
+    assert restarted.get(2) == []
+    assert restarted.migrate_legacy_file(str(legacy)) == 0
+    restarted.close()
+
+def test_add_remove_keep_order():
+    """测试追加、重复追加与删除，地址按添加顺序返回"""
+    store = WalletStore(":memory:", legacy_file=None)
+    assert store.add(1, "TA") and store.add(1, "TB")
+    assert not store.add(1, "TA")
+    assert store.remove(1, "TA") and not store.remove(1, "TA")
+    assert store.add(1, "TA")
+    assert store.get(1) == ["TB", "TA"]
+    assert store.get(2) == []
+
+def test_replace_skips_unchanged_list():
+    """测试列表未变化时不写入，变化时整体替换"""
+    store = WalletStore(":memory:", legacy_file=None)
+    assert store.replace(1, ["TA", "TB"])
+    writes = store._conn.total_changes
+    assert not store.replace(1, ["TA", "TB"])
+    assert store._conn.total_changes == writes
+
+    assert store.replace(1, ["TB", "TC", "TC"])
+    assert store.get(1) == ["TB", "TC"]
@@ -0,0 +1,133 @@
+"""
+钱包地址列表缓存 - 对有地址和无地址（含后端失败）的结果分别设置有效期，过期后先返回旧值并在后台刷新
+同一用户的并发加载合并为一次后端请求，后台刷新的并发数有上限；重启后优先使用本地存储的地址，避免集中请求后端
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+WALLET_CACHE_TTL = float(os.getenv("WALLET_CACHE_TTL", "300"))  # 有地址结果的有效期（秒）
+WALLET_CACHE_EMPTY_TTL = float(os.getenv("WALLET_CACHE_EMPTY_TTL", "60"))  # 无地址或后端失败结果的有效期（秒）
+WALLET_CACHE_MAX_SIZE = int(os.getenv("WALLET_CACHE_MAX_SIZE", "10000"))
+WALLET_REFRESH_CONCURRENCY = int(os.getenv("WALLET_REFRESH_CONCURRENCY", "4"))  # 同时进行的后端加载数
+
+class WalletListCache:
+    """按用户缓存钱包地址列表（LRU，容量有上限）"""
+
+    def __init__(self, loader: Callable[[int], Awaitable[Tuple[List[str], bool]]],
+                 seed: Callable[[int], List[str]] = None,
+                 on_update: Callable[[int, List[str]], None] = None,
+                 ttl: float = WALLET_CACHE_TTL, empty_ttl: float = WALLET_CACHE_EMPTY_TTL,
+                 max_size: int = WALLET_CACHE_MAX_SIZE, concurrency: int = WALLET_REFRESH_CONCURRENCY):
+        self.loader = loader  # user_id -> (地址列表, 后端是否成功)
+        self.seed = seed  # 冷启动时的本地地址
+        self.on_update = on_update  # 后台刷新得到新列表时回调
+        self.ttl = ttl
+        self.empty_ttl = empty_ttl
+        self.max_size = max_size
+        self.concurrency = concurrency
+        self._entries = OrderedDict()  # user_id -> [地址列表, 过期时间, 写入版本]
+        self._inflight: Dict[int, asyncio.Task] = {}
+        self._semaphore = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.seeded = 0
+        self.misses = 0
+        self.loads = 0
+        self.load_failures = 0
+
+    async def get(self, user_id: int) -> List[str]:
+        """获取地址列表（返回副本）"""
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            self._entries.move_to_end(user_id)
+            if time.monotonic() < entry[1]:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                self._refresh(user_id)
+            return list(entry[0])
+
+        seeded = self.seed(user_id) if self.seed else None
+        if seeded:
+            # 本地有备份：立即返回，后台向后端确认
+            self.seeded += 1
+            self._store(user_id, seeded, expires_at=0, generation=0)
+            self._refresh(user_id)
+            return list(seeded)
+
+        self.misses += 1
+        return list(await asyncio.shield(self._refresh(user_id)))
+
+    def update(self, user_id: int, addresses: List[str]):
+        """本进程修改地址后写入缓存（正在进行的后台刷新结果将被丢弃）"""
+        entry = self._entries.get(user_id)
+        generation = entry[2] + 1 if entry is not None else 1
+        ttl = self.ttl if addresses else self.empty_ttl
+        self._store(user_id, addresses, time.monotonic() + ttl, generation)
+
+    def invalidate(self, user_id: int):
+        self._entries.pop(user_id, None)
+
+    def _refresh(self, user_id: int) -> asyncio.Task:
+        """启动（或复用进行中的）后端加载"""
+        task = self._inflight.get(user_id)
+        if task is None or task.done():
+            # 写入版本在启动时记录：任务开始执行前本进程修改的地址同样会使加载结果作废
+            entry = self._entries.get(user_id)
+            task = asyncio.create_task(self._load(user_id, entry[2] if entry is not None else 0))
+            self._inflight[user_id] = task
+            task.add_done_callback(lambda done: self._inflight.pop(user_id, None) if self._inflight.get(user_id) is done else None)
+        return task
+
+    async def _load(self, user_id: int, generation: int) -> List[str]:
+        entry = self._entries.get(user_id)
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            try:
+                addresses, ok = await self.loader(user_id)
+            except Exception as e:
+                logger.warning(f"加载用户 {user_id} 钱包地址失败: {e}")
+                addresses, ok = (list(entry[0]) if entry is not None else []), False
+        self.loads += 1
+        if not ok:
+            self.load_failures += 1
+
+        current = self._entries.get(user_id)
+        if current is not None and current[2] != generation:
+            return list(current[0])  # 加载期间地址已被本进程修改
+
+        ttl = self.ttl if addresses and ok else self.empty_ttl
+        self._store(user_id, addresses, time.monotonic() + ttl, generation)
+        if self.on_update and (current is None or current[0] != addresses):
+            self.on_update(user_id, list(addresses))
+        return addresses
+
+    def _store(self, user_id: int, addresses: List[str], expires_at: float, generation: int):
+        self._entries[user_id] = [list(addresses), expires_at, generation]
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        """命中情况"""
+        lookups = self.hits + self.stale_hits + self.seeded + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "seeded": self.seeded,
+            "misses": self.misses,
+            "hit_rate": round((lookups - self.misses) / lookups, 4) if lookups else None,
+            "loads": self.loads,
+            "load_failures": self.load_failures,
+            "inflight": len(self._inflight)
+        }
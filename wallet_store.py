@@ -0,0 +1,117 @@
+"""
+用户钱包地址本地存储 - 按用户ID索引的SQLite表，替代整文件读写的 user_wallets.json
+每次增删只修改一个用户的一行记录，单条语句或单个事务内完成，多进程写入由SQLite加锁保证一致
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+WALLET_STORE_PATH = os.getenv("WALLET_STORE_PATH", "user_wallets.db")
+LEGACY_WALLET_FILE = "user_wallets.json"  # 旧版整文件存储，首次启动时导入
+
+class WalletStore:
+    """用户钱包地址存储（地址按添加顺序返回）"""
+
+    def __init__(self, path: str = WALLET_STORE_PATH, legacy_file: str = LEGACY_WALLET_FILE):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS user_wallets ("
+            "user_id INTEGER NOT NULL, address TEXT NOT NULL, position INTEGER NOT NULL, "
+            "PRIMARY KEY (user_id, address))"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS wallet_store_meta (key TEXT PRIMARY KEY, value TEXT)")
+        if legacy_file:
+            self.migrate_legacy_file(legacy_file)
+
+    def get(self, user_id: int) -> List[str]:
+        """获取用户的钱包地址列表"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT address FROM user_wallets WHERE user_id = ? ORDER BY position", (user_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def add(self, user_id: int, address: str) -> bool:
+        """追加地址，已存在时返回False"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO user_wallets (user_id, address, position) "
+                "SELECT ?, ?, COALESCE(MAX(position), 0) + 1 FROM user_wallets WHERE user_id = ?",
+                (user_id, address, user_id)
+            )
+        return cursor.rowcount == 1
+
+    def remove(self, user_id: int, address: str) -> bool:
+        """删除地址，不存在时返回False"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM user_wallets WHERE user_id = ? AND address = ?", (user_id, address)
+            )
+        return cursor.rowcount == 1
+
+    def replace(self, user_id: int, addresses: List[str]) -> bool:
+        """用后端返回的列表覆盖用户的地址（列表相同时不写入），返回是否有变化"""
+        addresses = list(dict.fromkeys(addresses))
+        with self._lock:
+            current = [row[0] for row in self._conn.execute(
+                "SELECT address FROM user_wallets WHERE user_id = ? ORDER BY position", (user_id,)
+            )]
+            if current == addresses:
+                return False
+            with self._transaction():
+                self._write_user(user_id, addresses)
+        return True
+
+    def _write_user(self, user_id: int, addresses: List[str]):
+        self._conn.execute("DELETE FROM user_wallets WHERE user_id = ?", (user_id,))
+        self._conn.executemany(
+            "INSERT INTO user_wallets (user_id, address, position) VALUES (?, ?, ?)",
+            [(user_id, address, position) for position, address in enumerate(addresses, start=1)]
+        )
+
+    @contextmanager
+    def _transaction(self):
+        """BEGIN IMMEDIATE 事务：立即获取写锁，避免并发写入时读到一半的数据"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def migrate_legacy_file(self, legacy_file: str) -> int:
+        """首次启动时导入旧版JSON文件（只导入一次，原文件保留作备份），返回导入的用户数"""
+        data = {}
+        if os.path.exists(legacy_file):
+            try:
+                with open(legacy_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (json.JSONDecodeError, IOError) as e:
+                logger.error(f"读取旧版钱包文件失败，跳过导入: {e}")
+                return 0
+
+        with self._lock, self._transaction():
+            # 在写锁内检查，多个进程同时启动时只导入一次
+            if self._conn.execute("SELECT 1 FROM wallet_store_meta WHERE key = 'legacy_migrated'").fetchone():
+                return 0
+            for user_id, addresses in data.items():
+                self._write_user(int(user_id), list(dict.fromkeys(addresses)))
+            self._conn.execute(
+                "INSERT INTO wallet_store_meta (key, value) VALUES ('legacy_migrated', ?)", (legacy_file,)
+            )
+
+        if data:
+            logger.info(f"已从 {legacy_file} 导入 {len(data)} 个用户的钱包地址")
+        return len(data)
+
+    def close(self):
+        self._conn.close()